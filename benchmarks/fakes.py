@@ -0,0 +1,115 @@
+from contextlib import contextmanager
+from operator import itemgetter
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+import pandas as pd
+
+from config.catalog import SchemaCatalog
+from connectors.mariadb_connector import MariaDBConnector
+from connectors.postgres_connector import COPY_READ_SIZE, CopyReader, PostgresConnector
+from models.migration import DatabaseConfig
+
+
+class FakeMariaDBConnector(MariaDBConnector):
+    """
+    MariaDBConnector serving synthetic rows from memory.
+
+    Rows are held as the tuples pymysql would return, so building the chunk
+    DataFrames costs what it costs against a real server, minus the network.
+    """
+
+    def __init__(self, catalog: SchemaCatalog, rows: Dict[Tuple[str, str], List[tuple]]):
+        super().__init__(DatabaseConfig(host="fake", user="fake", password="", database=catalog.databases[0]))
+        self.catalog = catalog
+        self.rows = rows
+
+    def connect(self) -> None:
+        pass
+
+    def disconnect(self) -> None:
+        pass
+
+    def select_database(self, database_name: str) -> None:
+        self.config.database = database_name
+
+    def iter_table_chunks(self, table_name: str, columns: List[str],
+                          chunk_size: Union[int, Callable[[], int]] = 500000,
+                          partition: Optional[str] = None, where: Optional[str] = None,
+                          limit: Optional[int] = None) -> Iterator[pd.DataFrame]:
+        # Row filters are SQL and can't be evaluated here, every row is served
+        table = self.catalog.table(self.config.database, table_name)
+        rows = self.rows.get((self.config.database, table_name), [])[:limit]
+        positions = [table.column_names.index(column) for column in columns]
+        project = None if positions == list(range(len(table.columns))) else itemgetter(*positions)
+
+        start = 0
+        while start < len(rows):
+            size = chunk_size() if callable(chunk_size) else chunk_size
+            chunk = rows[start:start + size]
+            start += size
+            if project is not None:
+                chunk = [project(row) if len(positions) > 1 else (project(row),) for row in chunk]
+            yield pd.DataFrame(chunk, columns=columns)
+
+    def read_table(self, table_name: str, columns: List[str], chunk_size: int = 500000,
+                   where: Optional[str] = None) -> pd.DataFrame:
+        chunks = list(self.iter_table_chunks(table_name, columns, chunk_size))
+        return pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(columns=columns)
+
+    def iter_rows(self, query: str, params=None) -> Iterator[tuple]:
+        return iter(())
+
+    def execute_query(self, query: str, params=None) -> Optional[pd.DataFrame]:
+        return None
+
+    def get_tables(self) -> List[str]:
+        return self.catalog.table_names(self.config.database)
+
+    def get_column_types(self, table_name: str) -> Dict[str, str]:
+        return self.catalog.column_types(self.config.database, table_name)
+
+
+class FakePostgresConnector(PostgresConnector):
+    """
+    PostgresConnector that encodes COPY data and discards it.
+
+    Every chunk goes through the same CSV encoding as a real COPY; only the
+    bytes that would have been sent are counted.
+    """
+
+    def __init__(self):
+        super().__init__("fake")
+        self.rows_copied = 0
+        self.bytes_copied = 0
+
+    def connect(self) -> None:
+        pass
+
+    def disconnect(self) -> None:
+        pass
+
+    def execute_query(self, query: str, params=None) -> Optional[List[tuple]]:
+        return []
+
+    def execute_transaction(self, statements: List[str]) -> None:
+        pass
+
+    @contextmanager
+    def transaction(self):
+        yield self
+
+    def create_tables(self, schema_definitions, workers: int = 4) -> List[str]:
+        return []
+
+    def apply_constraints(self, schema_definitions, workers: int = 4) -> List[str]:
+        return []
+
+    def copy_dataframe(self, table_name: str, df: pd.DataFrame) -> int:
+        if df.empty:
+            return 0
+        # Read the data as copy_expert does, so encoding is timed the same way
+        reader = CopyReader(df)
+        for data in iter(lambda: reader.read(COPY_READ_SIZE), ""):
+            self.bytes_copied += len(data)
+        self.rows_copied += len(df)
+        return len(df)
@@ -0,0 +1,304 @@
+"""
+Offline benchmarks of the migration pipeline
+
+Runs against synthetic data and in-process fake connectors, so no MariaDB or
+PostgreSQL server is needed:
+
+    python -m benchmarks.run
+    python -m benchmarks.run --rows 500000 --only copy_encode,end_to_end
+    python -m benchmarks.run --compare benchmarks/results/<commit>.json
+    python -m benchmarks.run --only startup
+
+Results are written as JSON to benchmarks/results/<commit>.json (or --output)
+and can be compared with the results of another commit with --compare.
+"""
+import argparse
+import configparser
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, Any, Callable, List, Optional
+
+import pandas as pd
+
+from benchmarks.fakes import FakeMariaDBConnector, FakePostgresConnector
+from benchmarks.synthetic import TYPE_MIXES, generate_catalog, generate_rows
+from config.table_sorter import TableSorter
+from connectors.postgres_connector import encode_copy
+from core.compiled_plan import PLAN_VERSION, CompiledPlan, CompiledTable
+from core.data_processor import DataProcessor, compile_kernels
+from models.migration import DatabaseConfig, MigrationConfig, PostgresConfig
+from utils.files import write_json_atomic
+
+RESULTS_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def _best_of(repeat: int, func: Callable[[], Any]) -> float:
+    """Fastest of several runs, in seconds"""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def _throughput(rows: int, seconds: float, nbytes: Optional[int] = None) -> Dict[str, Any]:
+    result = {"rows": rows, "seconds": round(seconds, 6), "rows_per_second": round(rows / seconds, 1)}
+    if nbytes is not None:
+        result["bytes"] = nbytes
+        result["mb_per_second"] = round(nbytes / seconds / 1024 ** 2, 2)
+    return result
+
+
+def _frames(args, type_mix: str) -> Dict[str, Any]:
+    catalog = generate_catalog(tables=1, columns=args.columns, type_mix=type_mix, row_width=args.row_width,
+                               foreign_keys=0, seed=args.seed)
+    table = catalog.tables()[0]
+    rows = generate_rows(table, args.rows, args.null_ratio, seed=args.seed)
+    return {"catalog": catalog, "table": table, "rows": rows}
+
+
+def bench_decode(args) -> Dict[str, Any]:
+    """Building chunk DataFrames from the row tuples the driver returns"""
+    results = {}
+    for type_mix in TYPE_MIXES:
+        data = _frames(args, type_mix)
+        mariadb = FakeMariaDBConnector(data["catalog"], {("bench", data["table"].name): data["rows"]})
+        columns = data["table"].column_names
+        seconds = _best_of(args.repeat, lambda: list(
+            mariadb.iter_table_chunks(data["table"].name, columns, args.chunk_size)))
+        results[type_mix] = _throughput(args.rows, seconds)
+    return results
+
+
+# type_config.ini types the synthetic columns are converted to
+_BENCH_TYPES = {"tinyint": "boolean", "decimal": "float", "double": "float", "datetime": "timestamp"}
+
+
+def _processor(catalog, table) -> DataProcessor:
+    """DataProcessor with a compiled plan converting every column it can, and the ids to UUIDs"""
+    types = {c.name: _BENCH_TYPES[c.data_type] for c in table.columns if c.data_type in _BENCH_TYPES}
+    kernels = compile_kernels(table.name, table.column_names, {table.name: types}, {table.name: {"id": table.name}},
+                              catalog.column_types(table.database, table.name))
+    compiled = CompiledTable(table.database, table.name, tuple(table.column_names), kernels)
+    plan = CompiledPlan(version=PLAN_VERSION, config_digest="", catalog_fingerprints=None,
+                        databases=(table.database,), tables={(table.database, table.name): compiled},
+                        levels=(((table.database, table.name),),))
+    return DataProcessor(None, plan)
+
+
+def bench_transform(args) -> Dict[str, Any]:
+    """DataProcessor.process_table_data on chunk DataFrames, with compiled kernels"""
+    results = {}
+    for type_mix in TYPE_MIXES:
+        data = _frames(args, type_mix)
+        processor = _processor(data["catalog"], data["table"])
+        df = pd.DataFrame(data["rows"], columns=data["table"].column_names)
+        # The chunk is left as read, so every run converts the same values
+        seconds = _best_of(args.repeat, lambda: processor.process_table_data(data["table"].name, df, data["table"].database))
+        results[type_mix] = _throughput(args.rows, seconds)
+    return results
+
+
+def bench_copy_encode(args) -> Dict[str, Any]:
+    """Encoding chunks as COPY CSV data"""
+    results = {}
+    for type_mix in TYPE_MIXES:
+        data = _frames(args, type_mix)
+        df = pd.DataFrame(data["rows"], columns=data["table"].column_names)
+        nbytes = len(encode_copy(df).getvalue())
+        seconds = _best_of(args.repeat, lambda: encode_copy(df))
+        results[type_mix] = _throughput(args.rows, seconds, nbytes)
+    return results
+
+
+def bench_sort(args) -> Dict[str, Any]:
+    """TableSorter levels of large foreign key graphs"""
+    results = {}
+    for tables in (args.tables // 10, args.tables):
+        catalog = generate_catalog(tables=tables, columns=1, foreign_keys=args.foreign_keys,
+                                   cycle_ratio=args.cycle_ratio, seed=args.seed)
+        sorter = TableSorter(None, None, configparser.ConfigParser(), catalog)
+        levels = []
+
+        def sort():
+            levels[:] = sorter.get_global_migration_levels(["bench"])
+
+        seconds = _best_of(args.repeat, sort)
+        results[str(tables)] = {
+            "tables": tables,
+            "foreign_keys": len(catalog.foreign_keys()),
+            "levels": len(levels),
+            "seconds": round(seconds, 6),
+        }
+    return results
+
+
+def bench_end_to_end(args) -> Dict[str, Any]:
+    """MigrationManager.run() over fake connectors, one worker"""
+    # Imported here, the manager reads maria_config.ini from the working directory
+    from core.migrator import MigrationManager
+
+    tables = max(1, args.e2e_tables)
+    catalog = generate_catalog(tables=tables, columns=args.columns, row_width=args.row_width,
+                               foreign_keys=args.foreign_keys, cycle_ratio=0, seed=args.seed)
+    rows_per_table = max(1, args.rows // tables)
+    rows = {("bench", t.name): generate_rows(t, rows_per_table, args.null_ratio, seed=args.seed)
+            for t in catalog.tables()}
+    config = MigrationConfig(
+        mariadb_config=DatabaseConfig(host="fake", user="fake", password="", database="bench"),
+        postgres_config=PostgresConfig(connection_string="fake"),
+        tables_to_export={}, columns_to_export={}, schema_definitions={}, type_conversions={},
+        uuid_config={}, constraints={}, mariadb_databases=["bench"],
+    )
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        try:
+            with open("maria_config.ini", "w") as f:
+                f.write(f"[export_settings]\nchunk_size = {args.chunk_size}\n\n"
+                        "[performance]\nworkers = 1\n\n[metrics]\ndisplay = false\njsonl =\nprometheus =\n")
+            postgres = FakePostgresConnector()
+
+            def run():
+                manager = MigrationManager(config)
+                manager.mariadb = FakeMariaDBConnector(catalog, rows)
+                manager.postgres = postgres
+                manager.catalog = catalog
+                manager.run(no_download=True)
+
+            # The manager prints its progress, which is not what is measured
+            stdout, sys.stdout = sys.stdout, open(os.devnull, "w")
+            try:
+                seconds = _best_of(args.repeat, run)
+            finally:
+                sys.stdout.close()
+                sys.stdout = stdout
+        finally:
+            os.chdir(cwd)
+
+    total_rows = rows_per_table * tables
+    return _throughput(total_rows, seconds, postgres.bytes_copied // args.repeat)
+
+
+# Loads a subcommand's handler the way the CLI does, then reports whether pandas came with it
+_LOAD_COMMAND = (
+    "import sys; from migres.cli import COMMANDS, load_handler; "
+    "load_handler(COMMANDS[sys.argv[1]]['handler']); print('pandas' in sys.modules)"
+)
+
+
+def bench_startup(args) -> Dict[str, Any]:
+    """Cold start of the CLI, and of every subcommand up to running its handler"""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    from migres.cli import COMMANDS
+
+    def cold_start(command: List[str]) -> Dict[str, Any]:
+        best, output = float("inf"), ""
+        for _ in range(max(args.repeat, 5)):
+            started = time.perf_counter()
+            output = subprocess.run([sys.executable] + command, cwd=root, capture_output=True, text=True).stdout
+            best = min(best, time.perf_counter() - started)
+        lines = output.strip().splitlines()
+        return {"seconds": round(best, 4), "imports_pandas": bool(lines) and lines[-1] == "True"}
+
+    results = {
+        "--version": {"seconds": cold_start(["-m", "migres.cli", "--version"])["seconds"]},
+        "--help": {"seconds": cold_start(["-m", "migres.cli", "--help"])["seconds"]},
+    }
+    for name in COMMANDS:
+        results[name] = cold_start(["-c", _LOAD_COMMAND, name])
+    return results
+
+
+BENCHMARKS = {
+    "decode": bench_decode,
+    "transform": bench_transform,
+    "copy_encode": bench_copy_encode,
+    "sort": bench_sort,
+    "end_to_end": bench_end_to_end,
+    "startup": bench_startup,
+}
+
+
+def _commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _compare(results: Dict[str, Any], baseline: Dict[str, Any]) -> None:
+    """Print the change of every measured time against a baseline run"""
+    print(f"\nCompared with {baseline.get('commit', 'baseline')}:")
+
+    def walk(name: str, current: Any, previous: Any) -> None:
+        if isinstance(current, dict) and isinstance(previous, dict):
+            if "seconds" in current and "seconds" in previous and previous["seconds"]:
+                change = (current["seconds"] - previous["seconds"]) / previous["seconds"] * 100
+                print(f"  {name}: {previous['seconds']:.4f}s -> {current['seconds']:.4f}s ({change:+.1f}%)")
+                return
+            for key in current:
+                if key in previous:
+                    walk(f"{name}.{key}" if name else key, current[key], previous[key])
+
+    walk("", results["results"], baseline.get("results", {}))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Offline benchmarks with synthetic data")
+    parser.add_argument("--only", help="Comma-separated benchmarks to run: " + ", ".join(BENCHMARKS))
+    parser.add_argument("--rows", type=int, default=100000, help="Rows per benchmark table")
+    parser.add_argument("--columns", type=int, default=8, help="Data columns per table")
+    parser.add_argument("--row-width", type=int, default=200, help="Approximate bytes per row")
+    parser.add_argument("--null-ratio", type=float, default=0.1, help="Share of NULL values")
+    parser.add_argument("--chunk-size", type=int, default=50000, help="Rows per chunk")
+    parser.add_argument("--tables", type=int, default=5000, help="Tables in the largest sorted graph")
+    parser.add_argument("--foreign-keys", type=int, default=3, help="Maximum foreign keys per table")
+    parser.add_argument("--cycle-ratio", type=float, default=0.01, help="Share of tables closing a cycle")
+    parser.add_argument("--e2e-tables", type=int, default=10, help="Tables in the end-to-end run")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per benchmark, the fastest counts")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Results file, by default benchmarks/results/<commit>.json")
+    parser.add_argument("--compare", help="Results file of an earlier run to compare with")
+    args = parser.parse_args(argv)
+
+    names = args.only.split(",") if args.only else list(BENCHMARKS)
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"Unknown benchmarks: {', '.join(unknown)}")
+
+    commit = _commit()
+    results = {
+        "commit": commit,
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "platform": platform.platform(),
+        "parameters": {k: v for k, v in vars(args).items() if k not in ("output", "compare", "only")},
+        "results": {},
+    }
+    for name in names:
+        print(f"Running {name}...")
+        results["results"][name] = BENCHMARKS[name](args)
+        print(json.dumps(results["results"][name], indent=2))
+
+    output = args.output or os.path.join(RESULTS_DIRECTORY, f"{commit}.json")
+    write_json_atomic(output, results)
+    print(f"Results written to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            _compare(results, json.load(f))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+import random
+import string
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Dict, Any, Callable, List, Optional
+
+from config.catalog import SchemaCatalog
+from models.catalog import ColumnInfo, ForeignKeyInfo, TableInfo
+
+# Column types drawn for each table, by type mix
+TYPE_MIXES = {
+    "numeric": ["int", "bigint", "decimal", "double", "tinyint"],
+    "text": ["varchar", "varchar", "text", "char"],
+    "mixed": ["int", "varchar", "datetime", "decimal", "text", "tinyint", "double"],
+    "binary": ["int", "varchar", "blob"],
+}
+
+# Bytes a value of each fixed-size type takes in a row
+_FIXED_WIDTHS = {"int": 4, "bigint": 8, "decimal": 8, "double": 8, "tinyint": 1, "datetime": 8}
+
+_EPOCH = datetime(2020, 1, 1)
+
+
+def _text(rng: random.Random, width: int) -> str:
+    return "".join(rng.choices(string.ascii_letters + string.digits, k=max(1, int(rng.uniform(0.5, 1.5) * width))))
+
+
+# Value generators by MariaDB type, shaped like the values pymysql returns
+_VALUES: Dict[str, Callable[[random.Random, int], Any]] = {
+    "int": lambda rng, width: rng.randint(-2 ** 31, 2 ** 31 - 1),
+    "bigint": lambda rng, width: rng.randint(-2 ** 63, 2 ** 63 - 1),
+    "tinyint": lambda rng, width: rng.randint(0, 1),
+    "decimal": lambda rng, width: Decimal(rng.randint(0, 10 ** 8)) / 100,
+    "double": lambda rng, width: rng.random() * 1e6,
+    "datetime": lambda rng, width: _EPOCH + timedelta(seconds=rng.randint(0, 10 ** 8)),
+    "varchar": _text,
+    "char": _text,
+    "text": lambda rng, width: _text(rng, width * 4),
+    "blob": lambda rng, width: rng.randbytes(width * 4) if hasattr(rng, "randbytes")
+    else bytes(rng.getrandbits(8) for _ in range(width * 4)),
+}
+
+
+def generate_catalog(tables: int = 50, columns: int = 8, type_mix: str = "mixed", row_width: int = 200,
+                     foreign_keys: int = 2, cycle_ratio: float = 0.01, database: str = "bench",
+                     seed: int = 0) -> SchemaCatalog:
+    """
+    Build the catalog of a synthetic schema
+
+    Every table has an "id" primary key, columns drawn from a type mix and
+    foreign key columns referencing earlier tables, so the graph is mostly a
+    DAG; a share of the tables also references a later table, closing cycles.
+
+    Args:
+        tables: Number of tables
+        columns: Data columns per table, besides the key and foreign keys
+        type_mix: Key of TYPE_MIXES the column types are drawn from
+        row_width: Approximate bytes of data per row; variable-width columns
+            share what the fixed-width columns leave
+        foreign_keys: Maximum foreign keys per table
+        cycle_ratio: Share of tables that reference a later table
+        database: Name of the synthetic database
+        seed: Random seed, the same seed gives the same schema
+
+    Returns:
+        SchemaCatalog of the synthetic database
+    """
+    rng = random.Random(seed)
+    catalog = SchemaCatalog([database])
+    types = TYPE_MIXES[type_mix]
+    names = [f"t{i:05d}" for i in range(tables)]
+
+    for i, name in enumerate(names):
+        data_types = [rng.choice(types) for _ in range(columns)]
+        variable = [t for t in data_types if t not in _FIXED_WIDTHS]
+        fixed = sum(_FIXED_WIDTHS.get(t, 0) for t in data_types)
+        width = max(1, (row_width - fixed) // max(1, len(variable)))
+
+        table = TableInfo(database=database, name=name, engine="InnoDB", primary_key=["id"])
+        table.columns.append(ColumnInfo("id", "int", "int(11)", nullable=False, extra="auto_increment"))
+        for j, data_type in enumerate(data_types):
+            table.columns.append(ColumnInfo(f"c{j}_{data_type}", data_type, data_type,
+                                            max_length=width if data_type not in _FIXED_WIDTHS else None))
+
+        referenced = rng.sample(names[:i], min(i, rng.randint(0, foreign_keys)))
+        if i + 1 < tables and rng.random() < cycle_ratio:
+            referenced.append(rng.choice(names[i + 1:]))
+        for target in referenced:
+            column = f"{target}_id"
+            table.columns.append(ColumnInfo(column, "int", "int(11)"))
+            table.foreign_keys.append(ForeignKeyInfo(
+                f"fk_{name}_{target}", database, name, [column], database, target, ["id"]))
+
+        table.avg_row_length = row_width + 4 * (1 + len(referenced))
+        catalog.add_table(table)
+
+    return catalog
+
+
+def generate_rows(table: TableInfo, rows: int, null_ratio: float = 0.1, parent_rows: Optional[int] = None,
+                  seed: int = 0) -> List[tuple]:
+    """
+    Generate the rows of a synthetic table as MariaDB would return them
+
+    Args:
+        table: Catalog entry of the table, from generate_catalog()
+        rows: Number of rows
+        null_ratio: Share of NULL values in nullable columns
+        parent_rows: Rows of the referenced tables, foreign keys point at ids
+            up to this number (by default rows)
+        seed: Random seed
+
+    Returns:
+        List of row tuples in column order
+    """
+    rng = random.Random(f"{seed}:{table.name}")
+    parent_rows = parent_rows or rows
+    foreign_key_columns = {c for fk in table.foreign_keys for c in fk.columns}
+
+    generated = [list(range(1, rows + 1))]
+    for column in table.columns[1:]:
+        if column.name in foreign_key_columns:
+            make = lambda rng, width: rng.randint(1, parent_rows)
+        else:
+            make = _VALUES[column.data_type]
+        width = column.max_length or 0
+        generated.append([
+            None if column.nullable and rng.random() < null_ratio else make(rng, width)
+            for _ in range(rows)
+        ])
+
+    return list(zip(*generated))
@@ -0,0 +1,44 @@
+import time
+
+from core.migrator import MigrationManager
+from models.migration import MigrationConfig
+from utils.env_loader import load_environment
+
+
+def compile_plan():
+    """Compile the configuration and source schema into the plan `migres run` loads
+
+    Returns:
+        int: Exit code (0 for success, 1 for failure)
+    """
+    if not load_environment():
+        print("Error: Could not find .env file in the current directory")
+        return 1
+
+    try:
+        config = MigrationConfig.load_from_files(
+            "maria_config.ini", "type_config.ini", "uuid_config.ini",
+            "table_schema.ini", "constraints.ini"
+        )
+    except ValueError as e:
+        print(f"Error: {str(e)}")
+        return 1
+
+    manager = MigrationManager(config)
+    started = time.perf_counter()
+    try:
+        plan = manager.get_plan(recompile=True)
+    except Exception as e:
+        print(f"Error compiling plan: {str(e)}")
+        return 1
+    finally:
+        manager.mariadb.disconnect()
+
+    kernels = sum(len(table.kernels) for table in plan.tables.values())
+    print(f"Compiled {len(plan.tables)} tables in {len(plan.levels)} levels with {kernels} column conversions "
+          f"in {time.perf_counter() - started:.2f}s")
+    if plan.catalog_fingerprints is None:
+        print("Warning: no table fingerprints in the catalog, so the plan is not saved")
+    else:
+        print(f"Plan written to {manager.maria_config.get('plan', 'artifact', fallback='.migres/plan.pickle')}")
+    return 1 if plan.warnings else 0
@@ -1,8 +1,78 @@
+import os
+import configparser
 from pathlib import Path
 
+from utils.env_loader import load_environment
 
-def init_configs():
-    """Create template config files in current directory"""
+
+def generate_table_schema(schema_path="table_schema.ini"):
+    """Generate table_schema.ini from the MariaDB schema
+    
+    Column types are translated to PostgreSQL, with types set in
+    type_config.ini taking precedence.
+    
+    Returns:
+        int: Exit code (0 for success, 1 for failure)
+    """
+    # Only --from-source needs the database drivers and pandas
+    from config.catalog import SchemaCatalog
+    from config.schema_parser import SchemaParser
+    from connectors.mariadb_connector import MariaDBConnector
+    from models.migration import DatabaseConfig, database_names
+    
+    if not load_environment():
+        print("Error: Could not find .env file in the current directory")
+        return 1
+    
+    host = os.getenv("MARIADB_HOST")
+    user = os.getenv("MARIADB_USER")
+    password = os.getenv("MARIADB_PASSWORD")
+    databases = database_names(os.environ)
+    
+    if not all([host, user, password]) or not databases:
+        print("Error: Missing MariaDB configuration in .env file")
+        print("Required variables: MARIADB_HOST, MARIADB_USER, MARIADB_PASSWORD, MARIADB_DATABASE1")
+        return 1
+    
+    type_config = configparser.ConfigParser()
+    type_config.read("type_config.ini")
+    type_overrides = {section: dict(type_config.items(section)) for section in type_config.sections()}
+    
+    connector = MariaDBConnector(DatabaseConfig(host=host, user=user, password=password, database=databases[0]))
+    try:
+        connector.connect()
+        catalog = SchemaCatalog.load(connector, databases)
+    except Exception as e:
+        print(f"Error reading MariaDB schema: {str(e)}")
+        return 1
+    finally:
+        connector.disconnect()
+    
+    schema = SchemaParser()
+    for db_name in databases:
+        generated = SchemaParser.from_catalog(catalog, db_name, type_overrides)
+        for table in generated.get_tables():
+            if schema.config.has_section(table):
+                print(f"Warning: table {table} exists in several databases, keeping the first")
+                continue
+            schema.config[table] = generated.config[table]
+    
+    schema.write(schema_path)
+    print(f"Created {schema_path} with {len(schema.get_tables())} tables")
+    return 0
+
+
+def init_configs(from_source=False):
+    """Create template config files in current directory
+    
+    Args:
+        from_source: Generate table_schema.ini from the MariaDB schema instead
+            of writing the example template
+    """
+    if from_source and not Path("table_schema.ini").exists():
+        if generate_table_schema() != 0:
+            return 1
+    
     config_templates = {
         "type_config.ini": """
 [posts]
@@ -12,6 +82,8 @@ created_at = timestamp
 [videos]
 duration = float
 censor = boolean
+# JSON text validated on the way; invalid rows go to .migres/rejects
+metadata = jsonb
 """,
         
         "uuid_config.ini": """
@@ -28,11 +100,32 @@ user_id = user
 [tables]
 logs_table
 temp_data
+# Globs match many tables; an exact name overrides a glob
+events_2019_*
+events_2019_summary = include
 
 [columns]
 users.password_hash
 users.session_token
 posts.internal_id
+*.legacy_*
+
+[selection]
+# Comma-separated globs, or "re:" regular expressions taking the rest of the line.
+# Table rules are applied by the INFORMATION_SCHEMA queries, so excluded
+# tables are never introspected
+exclude_tables = tmp_*, backup_*
+    re:^shard_[0-9]+_old$
+
+[filters]
+# Only rows matching a MariaDB WHERE condition are migrated. Tables referencing
+# a filtered table only get the rows whose foreign keys point to migrated rows
+posts = created_at >= NOW() - INTERVAL 2 YEAR
+users = deleted_at IS NULL
+
+[sample]
+# Seed of `migres run --sample`, another seed picks other rows
+seed = 0
 
 [migration]
 # Tables that must be migrated first despite foreign key relationships
@@ -41,6 +134,81 @@ force_early = audit_logs
 force_late = temp_data
 # Custom ordering for specific tables (higher priority tables first)
 custom_order = categories, tags, comments
+
+[export_settings]
+# Rows extracted from MariaDB per chunk
+chunk_size = 500000
+
+[performance]
+# Tables loaded concurrently, each worker with its own connections
+workers = 4
+# Partitions of a partitioned table read concurrently
+partition_workers = 4
+# Tables of one source database loaded concurrently, at most workers
+database_workers = 4
+
+[target_schemas]
+# PostgreSQL schema each source database is loaded into, created if missing;
+# databases not listed load into the connection's default schema
+# tenant_a = tenant_a
+
+[memory]
+# Bytes of chunks held at once by all workers, a size or a share of RAM (or off)
+limit = 50%
+# Share of the limit from which chunks are read smaller and no table is started
+high_watermark = 0.75
+min_chunk_size = 10000
+
+[maintenance]
+# After loading: move serial/identity sequences past the loaded ids and
+# ANALYZE each table (VACUUM (FREEZE, ANALYZE) with vacuum = true), largest
+# tables first on up to workers connections
+analyze = true
+vacuum = false
+sync_sequences = true
+workers = 4
+
+[probe]
+# Rates measured by `migres probe`, used by `migres plan` until runs are recorded
+path = .migres/probe.json
+
+[plan]
+# Used by `migres plan` to recommend chunk_size and workers
+chunk_memory = 256MB
+memory_budget = 4GB
+max_workers = 16
+# Plan compiled by `migres compile` and reused by `migres run`
+artifact = .migres/plan.pickle
+
+[large_objects]
+# Tables whose average row reaches min_avg_row_size are read rows_per_fetch
+# rows at a time and loaded in chunks of at most max_in_flight bytes
+min_avg_row_size = 1MB
+max_in_flight = 256MB
+rows_per_fetch = 100
+
+[metrics]
+# Progress, per-stage throughput and ETA, printed and written every interval seconds
+interval = 10
+display = true
+jsonl = .migres/metrics.jsonl
+prometheus = .migres/metrics.prom
+
+[download]
+# Local Parquet export, skipped with `migres run --no-download`
+directory = exports
+compression = zstd
+row_group_size = 100000
+max_rows_per_file = 1000000
+
+[spill_cache]
+# Used by `migres run --spill-cache` and `migres load --from-cache`
+directory = .migres/spill
+max_size = 50GB
+
+[download_partitions]
+# Partition a table's export by a column, optionally by year/month/day
+posts = created_at:month
 """,
         
         "table_schema.ini": """
@@ -59,6 +227,14 @@ primary_key = id
 foreign_keys = 
     user_id -> auth.users(id)
 indexes = created_at
+# Partitioning, for very large tables. A partitioned table's primary key
+# must include the partition key.
+# partition_by = range(created_at)
+# partition_interval = 1 month
+# partition_start = 2015-01-01
+# partition_end = 2027-01-01
+# Other methods: list(column) with one "name: value, value" line per
+# partition in partition_values, or hash(column) with partition_count
 
 [videos]
 # Column definitions
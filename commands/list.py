@@ -1,8 +1,9 @@
 import os
 from pathlib import Path
 
+from config.catalog_cache import CatalogCache
 from connectors.mariadb_connector import MariaDBConnector
-from models.migration import DatabaseConfig
+from models.migration import DatabaseConfig, database_names
 from utils.env_loader import load_environment
 
 def list_mariadb_tables():
@@ -23,40 +24,34 @@ def list_mariadb_tables():
         return 1
     
     # Find all MariaDB database environment variables
-    db_vars = [var for var in os.environ if var.startswith("MARIADB_DATABASE")]
+    db_names = database_names(os.environ)
     
-    if not db_vars:
+    if not db_names:
         print("Error: No MariaDB databases defined in .env file")
         print("Define at least one database with MARIADB_DATABASE1, MARIADB_DATABASE2, etc.")
         return 1
     
-    # Connect to each database and list tables
-    for db_var in sorted(db_vars):
-        db_name = os.getenv(db_var)
-        if not db_name:
-            continue
-        
+    # Load the catalog of every database, reusing the on-disk cache
+    try:
+        db_config = DatabaseConfig(host=host, user=user, password=password, database=db_names[0])
+        connector = MariaDBConnector(db_config)
+        connector.connect()
+        catalog = CatalogCache().load_catalog(connector, db_names)
+        connector.disconnect()
+    except Exception as e:
+        print(f"Error connecting to MariaDB: {str(e)}")
+        return 1
+    
+    for db_name in db_names:
         print(f"\nDatabase: {db_name}")
         print("-" * 40)
         
-        try:
-            # Create a temporary config
-            db_config = DatabaseConfig(host=host, user=user, password=password, database=db_name)
-            connector = MariaDBConnector(db_config)
-            connector.connect()
-            
-            # Get tables
-            tables = connector.get_tables()
-            
-            if not tables:
-                print("No tables found")
-            else:
-                for i, table in enumerate(sorted(tables), 1):
-                    print(f"{i}. {table}")
-            
-            connector.disconnect()
-            
-        except Exception as e:
-            print(f"Error connecting to database {db_name}: {str(e)}")
+        tables = catalog.table_names(db_name)
+        
+        if not tables:
+            print("No tables found")
+        else:
+            for i, table in enumerate(sorted(tables), 1):
+                print(f"{i}. {table}")
     
     return 0
@@ -0,0 +1,37 @@
+from core.migrator import MigrationManager
+from models.migration import MigrationConfig
+from utils.env_loader import load_environment
+
+
+def load_from_cache(no_download=True, check_source=False):
+    """Load PostgreSQL from the spill cache without reading MariaDB
+
+    Args:
+        no_download: If True, don't export the replayed data to Parquet
+        check_source: If True, skip cached tables whose source has changed
+
+    Returns:
+        int: Exit code (0 for success, 1 for failure)
+    """
+    if not load_environment():
+        print("Error: Could not find .env file in the current directory")
+        return 1
+
+    try:
+        config = MigrationConfig.load_from_files(
+            "maria_config.ini", "type_config.ini", "uuid_config.ini",
+            "table_schema.ini", "constraints.ini"
+        )
+    except ValueError as e:
+        print(f"Error: {str(e)}")
+        return 1
+
+    try:
+        MigrationManager(config, use_spill_cache=True).load_from_cache(no_download, check_source)
+    except Exception as e:
+        print(f"Error loading from cache: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return 1
+
+    return 0
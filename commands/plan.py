@@ -0,0 +1,93 @@
+import json
+
+from core.migrator import MigrationManager
+from core.planner import MigrationPlanner
+from models.migration import MigrationConfig
+from utils.env_loader import load_environment
+
+
+def _size(nbytes):
+    for unit in ["B", "KB", "MB", "GB"]:
+        if nbytes < 1024:
+            return f"{nbytes:.1f} {unit}"
+        nbytes /= 1024
+    return f"{nbytes:.1f} TB"
+
+
+def _duration(seconds):
+    seconds = int(seconds)
+    return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m{seconds % 60:02d}s"
+
+
+def plan_migration(report_path=None, workers=None, chunk_size=None, no_download=False, spill_cache=False):
+    """Estimate the cost of a migration without moving any data
+
+    Args:
+        report_path: Where to write the JSON plan, if anywhere
+        workers: Workers to estimate with instead of the configured ones
+        chunk_size: Chunk size to estimate with instead of the configured one
+        no_download: Estimate a run without the Parquet export
+        spill_cache: Estimate a run that fills the spill cache
+
+    Returns:
+        int: Exit code (0 for success, 1 for failure)
+    """
+    if not load_environment():
+        print("Error: Could not find .env file in the current directory")
+        return 1
+
+    try:
+        config = MigrationConfig.load_from_files(
+            "maria_config.ini", "type_config.ini", "uuid_config.ini",
+            "table_schema.ini", "constraints.ini"
+        )
+    except ValueError as e:
+        print(f"Error: {str(e)}")
+        return 1
+
+    manager = MigrationManager(config)
+    try:
+        planner = MigrationPlanner(manager, no_download=no_download, spill_cache=spill_cache)
+        plan = planner.plan(workers, chunk_size)
+    except Exception as e:
+        print(f"Error planning migration: {str(e)}")
+        return 1
+    finally:
+        manager.mariadb.disconnect()
+
+    settings, total, recommended = plan["settings"], plan["total"], plan["recommended"]
+    print(f"Throughput from {plan['throughput']}\n")
+    print(f"{'Table':<40} {'Rows':>12} {'Size':>10} {'Time':>10} {'Memory':>10}")
+    for table in sorted(plan["tables"], key=lambda t: t["total_seconds"], reverse=True):
+        name = f"{table['database']}.{table['table']}"
+        print(f"{name:<40} {table['rows']:>12,} {_size(table['bytes'] + table['large_object_bytes']):>10} "
+              f"{_duration(table['total_seconds']):>10} {_size(table['memory']):>10}")
+
+    print(f"\nSchedule with {settings['workers']} workers and chunk_size = {settings['chunk_size']}:")
+    for unit in plan["schedule"][:20]:
+        print(f"  {_duration(unit['start'])} - {_duration(unit['end'])}  {' + '.join(unit['unit'])}")
+    if len(plan["schedule"]) > 20:
+        print(f"  ... {len(plan['schedule']) - 20} more units")
+
+    print(f"\nEstimated time:  {_duration(total['elapsed_seconds'])} "
+          f"({_duration(total['serial_seconds'])} without parallelism)")
+    print(f"Data:            {total['rows']:,} rows, {_size(total['bytes'])}")
+    print(f"Peak memory:     {_size(total['peak_memory'])}")
+    if spill_cache:
+        print(f"Spill cache:     {_size(total['spill_bytes'])}")
+    if not no_download:
+        print(f"Parquet export:  {_size(total['export_bytes'])}")
+
+    print("\nRecommended [export_settings] / [performance] settings:")
+    print(f"  chunk_size = {recommended['chunk_size']}")
+    print(f"  workers = {recommended['workers']}")
+    print(f"  partition_workers = {recommended['partition_workers']}")
+    print(f"  (estimated {_duration(recommended['elapsed_seconds'])}, "
+          f"peak memory {_size(recommended['peak_memory'])})")
+
+    if report_path:
+        with open(report_path, "w") as f:
+            json.dump(plan, f, indent=2, default=str)
+        print(f"\nPlan written to {report_path}")
+
+    return 0
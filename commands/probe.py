@@ -0,0 +1,57 @@
+from core.migrator import MigrationManager
+from core.probe import ThroughputProbe
+from models.migration import MigrationConfig
+from utils.env_loader import load_environment
+
+
+def probe_servers(tables=3, rows=200000, fetch_sizes=None, buffer_sizes=None, writers=None, report_path=None):
+    """Measure the read, COPY and round trip rates the servers sustain
+
+    Args:
+        tables: Number of the largest exported tables read
+        rows: Rows read from each table at each fetch size
+        fetch_sizes: Rows fetched at a time from MariaDB to compare
+        buffer_sizes: Rows sent by each COPY to compare
+        writers: Concurrent COPY connections to compare
+        report_path: Where to write the measurements instead of the configured path
+
+    Returns:
+        int: Exit code (0 for success, 1 for failure)
+    """
+    if not load_environment():
+        print("Error: Could not find .env file in the current directory")
+        return 1
+
+    try:
+        config = MigrationConfig.load_from_files(
+            "maria_config.ini", "type_config.ini", "uuid_config.ini",
+            "table_schema.ini", "constraints.ini"
+        )
+    except ValueError as e:
+        print(f"Error: {str(e)}")
+        return 1
+
+    manager = MigrationManager(config)
+    options = {"fetch_sizes": fetch_sizes, "buffer_sizes": buffer_sizes, "writers": writers}
+    probe = ThroughputProbe(manager, tables=tables, rows=rows,
+                            **{name: value for name, value in options.items() if value})
+    report_path = report_path or manager.maria_config.get("probe", "path", fallback=".migres/probe.json")
+    try:
+        report = probe.run()
+        probe.save(report, report_path)
+    except Exception as e:
+        print(f"Error probing servers: {str(e)}")
+        return 1
+    finally:
+        manager.mariadb.disconnect()
+        manager.postgres.disconnect()
+
+    latency, recommended = report["latency_ms"], report["recommended"]
+    print(f"\nRound trip: MariaDB {latency['mariadb']:.2f} ms, PostgreSQL {latency['postgres']:.2f} ms")
+    print(f"Measurements written to {report_path}, `migres plan` estimates with them\n")
+    print("Recommended settings for maria_config.ini:")
+    if recommended["chunk_size"]:
+        print(f"[export_settings]\nchunk_size = {recommended['chunk_size']}")
+    if recommended["workers"]:
+        print(f"[performance]\nworkers = {recommended['workers']}")
+    return 0
@@ -1,2 +1,49 @@
-def run_migration(no_download=False):
-    pass
\ No newline at end of file
+from config.sampling import parse_sample_rate
+from core.exporter import parquet_available
+from core.migrator import MigrationManager
+from models.migration import MigrationConfig
+from utils.env_loader import load_environment
+
+
+def run_migration(no_download=False, spill_cache=False, profile=False, sample=None):
+    """Run the full migration
+
+    Args:
+        no_download: If True, migrate without exporting Parquet files locally
+        spill_cache: If True, keep extracted data in the local spill cache so it
+            can be replayed with `migres load --from-cache`
+        profile: If True, profile CPU time and memory of every stage and
+            write a report of the hottest functions and biggest allocators
+        sample: Migrate a deterministic sample, such as "1%", of the tables
+            nothing references, with every row they reference
+
+    Returns:
+        int: Exit code (0 for success, 1 for failure)
+    """
+    if not load_environment():
+        print("Error: Could not find .env file in the current directory")
+        return 1
+
+    try:
+        sample = parse_sample_rate(sample) if sample is not None else None
+        config = MigrationConfig.load_from_files(
+            "maria_config.ini", "type_config.ini", "uuid_config.ini",
+            "table_schema.ini", "constraints.ini"
+        )
+    except ValueError as e:
+        print(f"Error: {str(e)}")
+        return 1
+
+    if not no_download and not parquet_available():
+        print("Warning: pyarrow is not installed (pip install pyarrow), migrating without the Parquet export")
+        no_download = True
+
+    try:
+        MigrationManager(config, use_spill_cache=spill_cache, profile=profile, sample=sample).run(no_download)
+    except Exception as e:
+        print(f"Error running migration: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return 1
+
+    return 0
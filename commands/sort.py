@@ -5,6 +5,8 @@ from dotenv import load_dotenv
 
 from connectors.mariadb_connector import MariaDBConnector
 from connectors.postgres_connector import PostgresConnector
+from config.catalog_cache import CatalogCache
+from config.selection import SelectionRules
 from config.table_sorter import TableSorter
 from models.migration import DatabaseConfig
 
@@ -66,8 +68,10 @@ def sort_tables():
         # Connect to MariaDB
         mariadb_connector.connect()
         
-        # Create table sorter
-        sorter = TableSorter(mariadb_connector, postgres_connector, maria_config)
+        # Create table sorter backed by the cached schema catalog
+        cache = CatalogCache(maria_config.get("catalog_cache", "path", fallback=".migres/catalog.json"))
+        catalog = cache.load_catalog(mariadb_connector, [database], SelectionRules.from_config(maria_config))
+        sorter = TableSorter(mariadb_connector, postgres_connector, maria_config, catalog, cache)
         
         # Get migration order
         print(f"Analyzing database '{database}' for optimal migration order...")
@@ -0,0 +1,61 @@
+import json
+
+from config.sampling import parse_sample_rate
+from core.migrator import MigrationManager
+from core.verifier import MigrationVerifier
+from models.migration import MigrationConfig
+from utils.env_loader import load_environment
+
+
+def verify_migration(report_path="verify_report.json", workers=4, sample=None):
+    """Compare migrated tables between MariaDB and PostgreSQL
+
+    Args:
+        report_path: Where to write the JSON report
+        workers: Number of tables to verify concurrently
+        sample: Sample rate, such as "1%", the target was loaded with. By
+            default the rate of the last `migres run`, from the saved plan
+
+    Returns:
+        int: Exit code (0 if every table matched, 1 otherwise)
+    """
+    if not load_environment():
+        print("Error: Could not find .env file in the current directory")
+        return 1
+
+    try:
+        sample = parse_sample_rate(sample) if sample is not None else None
+        config = MigrationConfig.load_from_files(
+            "maria_config.ini", "type_config.ini", "uuid_config.ini",
+            "table_schema.ini", "constraints.ini"
+        )
+    except ValueError as e:
+        print(f"Error: {str(e)}")
+        return 1
+
+    manager = MigrationManager(config)
+    # The source side is read with the sample the target was loaded with,
+    # which also keeps the saved plan current instead of compiling it again
+    manager.sample = sample if sample is not None else manager.saved_sample()
+    if manager.sample is not None:
+        print(f"Comparing with a {manager.sample:.4%} sample of the source")
+    verifier = MigrationVerifier(manager, workers=workers)
+
+    print("Verifying migrated tables...")
+    try:
+        report = verifier.run()
+    except Exception as e:
+        print(f"Error verifying migration: {str(e)}")
+        return 1
+    finally:
+        manager.mariadb.disconnect()
+
+    with open(report_path, "w") as f:
+        json.dump(report, f, indent=2, default=str)
+
+    summary = report["summary"]
+    print(f"\nVerified {summary['tables']} tables: {summary['passed']} passed, "
+          f"{summary['failed']} failed, {summary['errors']} errors")
+    print(f"Report written to {report_path}")
+
+    return 0 if summary["failed"] == 0 and summary["errors"] == 0 else 1
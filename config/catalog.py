@@ -0,0 +1,270 @@
+import hashlib
+import logging
+import math
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+
+from models.catalog import ColumnInfo, IndexInfo, ForeignKeyInfo, PartitionInfo, TableInfo
+
+
+def _int(value: Any) -> Optional[int]:
+    """Convert a possibly NULL (None/NaN) INFORMATION_SCHEMA number to int"""
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    return int(value)
+
+
+def _datetime(value: Any) -> Optional[datetime]:
+    """Convert an INFORMATION_SCHEMA timestamp (None, NaT or Timestamp) to datetime"""
+    if value is None or value != value:
+        return None
+    return value.to_pydatetime() if hasattr(value, "to_pydatetime") else value
+
+
+def _str(value: Any) -> Optional[str]:
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    return str(value)
+
+
+class SchemaCatalog:
+    """
+    In-memory snapshot of the source schema.
+
+    Tables, columns, primary keys, indexes, foreign keys and size statistics
+    of every configured database are loaded with one query per
+    INFORMATION_SCHEMA view, instead of one round trip per table. The
+    migrator, TableSorter, schema generation and the table listing all read
+    from this snapshot.
+    """
+
+    def __init__(self, databases: List[str], selection=None):
+        self.databases = list(databases)
+        # SelectionRules pushed into every INFORMATION_SCHEMA query, if any
+        self.selection = selection
+        self._tables: Dict[Tuple[str, str], TableInfo] = {}
+        # Definition fingerprints, only set when loaded through CatalogCache
+        self.fingerprints: Dict[Tuple[str, str], str] = {}
+        self.logger = logging.getLogger(__name__)
+
+    @classmethod
+    def load(cls, mariadb, databases: List[str],
+             tables: Optional[List[Tuple[str, str]]] = None, selection=None) -> "SchemaCatalog":
+        """Load the catalog of the given databases
+
+        Args:
+            mariadb: MariaDBConnector to query INFORMATION_SCHEMA with
+            databases: Names of the databases to load
+            tables: Only load these (database, table) pairs
+            selection: SelectionRules of the exported tables; other tables
+                are filtered out by the queries themselves
+
+        Returns:
+            SchemaCatalog holding every selected base table of the databases
+        """
+        catalog = cls(databases, selection)
+        if databases and tables != []:
+            catalog._load(mariadb, tables)
+        return catalog
+
+    def _query(self, mariadb, query: str,
+               tables: Optional[List[Tuple[str, str]]] = None) -> List[Dict[str, Any]]:
+        placeholders = ", ".join(["%s"] * len(self.databases))
+        params = list(self.databases)
+
+        table_filter = ""
+        if tables:
+            table_filter = "AND (TABLE_SCHEMA, TABLE_NAME) IN ({})".format(
+                ", ".join(["(%s, %s)"] * len(tables)))
+            for db_name, table_name in tables:
+                params.extend([db_name, table_name])
+        if self.selection is not None:
+            predicate, selection_params = self.selection.table_predicate()
+            table_filter += f" {predicate}"
+            params.extend(selection_params)
+
+        result = mariadb.execute_query(query.format(schemas=placeholders, tables=table_filter), tuple(params))
+        if result is None or result.empty:
+            return []
+        return result.to_dict("records")
+
+    def _load(self, mariadb, tables: Optional[List[Tuple[str, str]]] = None) -> None:
+        for row in self._query(mariadb, """
+        SELECT
+            TABLE_SCHEMA, TABLE_NAME, ENGINE, TABLE_ROWS, AVG_ROW_LENGTH,
+            DATA_LENGTH, INDEX_LENGTH, CREATE_TIME, UPDATE_TIME
+        FROM
+            INFORMATION_SCHEMA.TABLES
+        WHERE
+            TABLE_SCHEMA IN ({schemas})
+            AND TABLE_TYPE = 'BASE TABLE'
+            {tables}
+        """, tables):
+            self.add_table(TableInfo(
+                database=row["TABLE_SCHEMA"],
+                name=row["TABLE_NAME"],
+                engine=_str(row["ENGINE"]),
+                rows=_int(row["TABLE_ROWS"]) or 0,
+                avg_row_length=_int(row["AVG_ROW_LENGTH"]) or 0,
+                data_length=_int(row["DATA_LENGTH"]) or 0,
+                index_length=_int(row["INDEX_LENGTH"]) or 0,
+                create_time=_datetime(row["CREATE_TIME"]),
+                update_time=_datetime(row["UPDATE_TIME"]),
+            ))
+
+        for row in self._query(mariadb, """
+        SELECT
+            TABLE_SCHEMA, TABLE_NAME, COLUMN_NAME, DATA_TYPE, COLUMN_TYPE, IS_NULLABLE,
+            COLUMN_DEFAULT, CHARACTER_MAXIMUM_LENGTH, CHARACTER_OCTET_LENGTH,
+            NUMERIC_PRECISION, NUMERIC_SCALE, EXTRA
+        FROM
+            INFORMATION_SCHEMA.COLUMNS
+        WHERE
+            TABLE_SCHEMA IN ({schemas})
+            {tables}
+        ORDER BY
+            TABLE_SCHEMA, TABLE_NAME, ORDINAL_POSITION
+        """, tables):
+            table = self.table(row["TABLE_SCHEMA"], row["TABLE_NAME"])
+            if table is None:
+                continue  # Views
+            table.columns.append(ColumnInfo(
+                name=row["COLUMN_NAME"],
+                data_type=row["DATA_TYPE"].lower(),
+                column_type=row["COLUMN_TYPE"].lower(),
+                nullable=row["IS_NULLABLE"] == "YES",
+                default=_str(row["COLUMN_DEFAULT"]),
+                max_length=_int(row["CHARACTER_MAXIMUM_LENGTH"]),
+                octet_length=_int(row["CHARACTER_OCTET_LENGTH"]),
+                numeric_precision=_int(row["NUMERIC_PRECISION"]),
+                numeric_scale=_int(row["NUMERIC_SCALE"]),
+                extra=_str(row["EXTRA"]) or "",
+            ))
+
+        indexes: Dict[Tuple[str, str, str], IndexInfo] = {}
+        for row in self._query(mariadb, """
+        SELECT
+            TABLE_SCHEMA, TABLE_NAME, INDEX_NAME, NON_UNIQUE, COLUMN_NAME, CARDINALITY
+        FROM
+            INFORMATION_SCHEMA.STATISTICS
+        WHERE
+            TABLE_SCHEMA IN ({schemas})
+            {tables}
+        ORDER BY
+            TABLE_SCHEMA, TABLE_NAME, INDEX_NAME, SEQ_IN_INDEX
+        """, tables):
+            table = self.table(row["TABLE_SCHEMA"], row["TABLE_NAME"])
+            if table is None:
+                continue
+            if row["INDEX_NAME"] == "PRIMARY":
+                table.primary_key.append(row["COLUMN_NAME"])
+                continue
+
+            key = (table.database, table.name, row["INDEX_NAME"])
+            if key not in indexes:
+                indexes[key] = IndexInfo(name=row["INDEX_NAME"], columns=[],
+                                         unique=not _int(row["NON_UNIQUE"]),
+                                         cardinality=_int(row["CARDINALITY"]))
+                table.indexes.append(indexes[key])
+            indexes[key].columns.append(row["COLUMN_NAME"])
+
+        foreign_keys: Dict[Tuple[str, str, str], ForeignKeyInfo] = {}
+        for row in self._query(mariadb, """
+        SELECT
+            CONSTRAINT_NAME, TABLE_SCHEMA, TABLE_NAME, COLUMN_NAME,
+            REFERENCED_TABLE_SCHEMA, REFERENCED_TABLE_NAME, REFERENCED_COLUMN_NAME
+        FROM
+            INFORMATION_SCHEMA.KEY_COLUMN_USAGE
+        WHERE
+            TABLE_SCHEMA IN ({schemas})
+            AND REFERENCED_TABLE_NAME IS NOT NULL
+            {tables}
+        ORDER BY
+            TABLE_SCHEMA, TABLE_NAME, CONSTRAINT_NAME, ORDINAL_POSITION
+        """, tables):
+            table = self.table(row["TABLE_SCHEMA"], row["TABLE_NAME"])
+            if table is None:
+                continue
+
+            key = (table.database, table.name, row["CONSTRAINT_NAME"])
+            if key not in foreign_keys:
+                foreign_keys[key] = ForeignKeyInfo(
+                    name=row["CONSTRAINT_NAME"],
+                    database=table.database,
+                    table=table.name,
+                    columns=[],
+                    referenced_database=row["REFERENCED_TABLE_SCHEMA"],
+                    referenced_table=row["REFERENCED_TABLE_NAME"],
+                    referenced_columns=[],
+                )
+                table.foreign_keys.append(foreign_keys[key])
+            foreign_keys[key].columns.append(row["COLUMN_NAME"])
+            foreign_keys[key].referenced_columns.append(row["REFERENCED_COLUMN_NAME"])
+
+        partitions: Dict[Tuple[str, str, str], PartitionInfo] = {}
+        for row in self._query(mariadb, """
+        SELECT
+            TABLE_SCHEMA, TABLE_NAME, PARTITION_NAME, PARTITION_METHOD, PARTITION_EXPRESSION,
+            PARTITION_DESCRIPTION, PARTITION_ORDINAL_POSITION, TABLE_ROWS, DATA_LENGTH
+        FROM
+            INFORMATION_SCHEMA.PARTITIONS
+        WHERE
+            TABLE_SCHEMA IN ({schemas})
+            AND PARTITION_NAME IS NOT NULL
+            {tables}
+        ORDER BY
+            TABLE_SCHEMA, TABLE_NAME, PARTITION_ORDINAL_POSITION, SUBPARTITION_ORDINAL_POSITION
+        """, tables):
+            table = self.table(row["TABLE_SCHEMA"], row["TABLE_NAME"])
+            if table is None:
+                continue
+
+            # Subpartitions are read through their partition, so add them up
+            key = (table.database, table.name, row["PARTITION_NAME"])
+            if key not in partitions:
+                partitions[key] = PartitionInfo(
+                    name=row["PARTITION_NAME"],
+                    method=_str(row["PARTITION_METHOD"]),
+                    expression=_str(row["PARTITION_EXPRESSION"]),
+                    description=_str(row["PARTITION_DESCRIPTION"]),
+                    ordinal=_int(row["PARTITION_ORDINAL_POSITION"]) or 0,
+                )
+                table.partitions.append(partitions[key])
+            partitions[key].rows += _int(row["TABLE_ROWS"]) or 0
+            partitions[key].data_length += _int(row["DATA_LENGTH"]) or 0
+
+        self.logger.info(f"Loaded catalog of {len(self._tables)} tables from {len(self.databases)} databases")
+
+    def add_table(self, table: TableInfo) -> None:
+        self._tables[(table.database, table.name)] = table
+
+    def table(self, db_name: str, table_name: str) -> Optional[TableInfo]:
+        """Get a table, or None if it is not in the catalog"""
+        return self._tables.get((db_name, table_name))
+
+    def tables(self, db_name: Optional[str] = None) -> List[TableInfo]:
+        """Get the tables of one database, or of all databases"""
+        return [t for t in self._tables.values() if db_name is None or t.database == db_name]
+
+    def table_names(self, db_name: str) -> List[str]:
+        return [t.name for t in self.tables(db_name)]
+
+    def columns(self, db_name: str, table_name: str) -> List[str]:
+        table = self.table(db_name, table_name)
+        return table.column_names if table else []
+
+    def column_types(self, db_name: str, table_name: str) -> Dict[str, str]:
+        """Map each column of a table to its MariaDB DATA_TYPE, in table order"""
+        table = self.table(db_name, table_name)
+        return {c.name: c.data_type for c in table.columns} if table else {}
+
+    def database_fingerprint(self, db_name: str) -> Optional[str]:
+        """Digest of the definitions of every table in a database, if known"""
+        tables = sorted((k, v) for k, v in self.fingerprints.items() if k[0] == db_name)
+        if not tables:
+            return None
+        return hashlib.md5(repr(tables).encode()).hexdigest()
+
+    def foreign_keys(self, db_name: Optional[str] = None) -> List[ForeignKeyInfo]:
+        """Get the foreign keys declared by the tables of one or all databases"""
+        return [fk for table in self.tables(db_name) for fk in table.foreign_keys]
@@ -0,0 +1,224 @@
+import hashlib
+import json
+import logging
+import os
+from dataclasses import asdict
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+
+from config.catalog import SchemaCatalog, _datetime, _int
+from models.catalog import ColumnInfo, IndexInfo, ForeignKeyInfo, PartitionInfo, TableInfo
+from utils.files import write_json_atomic
+
+CACHE_VERSION = 2
+
+# Above this many changed tables a full reload is cheaper than a long IN list
+MAX_PARTIAL_RELOAD = 500
+
+# One round trip returns the statistics of every table and a checksum of its
+# definition: columns, indexes, foreign keys and partitions. {tables} filters
+# the selected tables inside each subquery, so the others are never scanned.
+FINGERPRINT_QUERY = """
+SELECT
+    t.TABLE_SCHEMA, t.TABLE_NAME, t.ENGINE, t.TABLE_ROWS, t.AVG_ROW_LENGTH,
+    t.DATA_LENGTH, t.INDEX_LENGTH, t.CREATE_TIME, t.UPDATE_TIME,
+    c.CHECKSUM AS COLUMNS_CHECKSUM, s.CHECKSUM AS INDEXES_CHECKSUM, r.CHECKSUM AS FKS_CHECKSUM,
+    p.CHECKSUM AS PARTITIONS_CHECKSUM
+FROM
+    INFORMATION_SCHEMA.TABLES t
+    LEFT JOIN (
+        SELECT TABLE_SCHEMA, TABLE_NAME, MD5(GROUP_CONCAT(
+            CONCAT_WS(':', COLUMN_NAME, COLUMN_TYPE, IS_NULLABLE, IFNULL(COLUMN_DEFAULT, ''), EXTRA)
+            ORDER BY ORDINAL_POSITION SEPARATOR '|')) AS CHECKSUM
+        FROM INFORMATION_SCHEMA.COLUMNS
+        WHERE TABLE_SCHEMA IN ({schemas}) {tables}
+        GROUP BY TABLE_SCHEMA, TABLE_NAME
+    ) c ON c.TABLE_SCHEMA = t.TABLE_SCHEMA AND c.TABLE_NAME = t.TABLE_NAME
+    LEFT JOIN (
+        SELECT TABLE_SCHEMA, TABLE_NAME, MD5(GROUP_CONCAT(
+            CONCAT_WS(':', INDEX_NAME, SEQ_IN_INDEX, COLUMN_NAME, NON_UNIQUE)
+            ORDER BY INDEX_NAME, SEQ_IN_INDEX SEPARATOR '|')) AS CHECKSUM
+        FROM INFORMATION_SCHEMA.STATISTICS
+        WHERE TABLE_SCHEMA IN ({schemas}) {tables}
+        GROUP BY TABLE_SCHEMA, TABLE_NAME
+    ) s ON s.TABLE_SCHEMA = t.TABLE_SCHEMA AND s.TABLE_NAME = t.TABLE_NAME
+    LEFT JOIN (
+        SELECT CONSTRAINT_SCHEMA AS TABLE_SCHEMA, TABLE_NAME, MD5(GROUP_CONCAT(
+            CONCAT_WS(':', CONSTRAINT_NAME, UNIQUE_CONSTRAINT_SCHEMA, REFERENCED_TABLE_NAME)
+            ORDER BY CONSTRAINT_NAME SEPARATOR '|')) AS CHECKSUM
+        FROM INFORMATION_SCHEMA.REFERENTIAL_CONSTRAINTS
+        WHERE CONSTRAINT_SCHEMA IN ({schemas}) {tables}
+        GROUP BY CONSTRAINT_SCHEMA, TABLE_NAME
+    ) r ON r.TABLE_SCHEMA = t.TABLE_SCHEMA AND r.TABLE_NAME = t.TABLE_NAME
+    LEFT JOIN (
+        SELECT TABLE_SCHEMA, TABLE_NAME, MD5(GROUP_CONCAT(
+            CONCAT_WS(':', PARTITION_NAME, IFNULL(SUBPARTITION_NAME, ''), PARTITION_METHOD,
+                      IFNULL(PARTITION_DESCRIPTION, ''))
+            ORDER BY PARTITION_ORDINAL_POSITION, SUBPARTITION_ORDINAL_POSITION SEPARATOR '|')) AS CHECKSUM
+        FROM INFORMATION_SCHEMA.PARTITIONS
+        WHERE TABLE_SCHEMA IN ({schemas}) AND PARTITION_NAME IS NOT NULL {tables}
+        GROUP BY TABLE_SCHEMA, TABLE_NAME
+    ) p ON p.TABLE_SCHEMA = t.TABLE_SCHEMA AND p.TABLE_NAME = t.TABLE_NAME
+WHERE
+    t.TABLE_SCHEMA IN ({schemas})
+    AND t.TABLE_TYPE = 'BASE TABLE'
+    {outer_tables}
+"""
+
+
+def _table_to_dict(table: TableInfo) -> Dict[str, Any]:
+    data = asdict(table)
+    for key in ("create_time", "update_time"):
+        data[key] = data[key].isoformat() if data[key] else None
+    return data
+
+
+def _table_from_dict(data: Dict[str, Any]) -> TableInfo:
+    data = dict(data)
+    for key in ("create_time", "update_time"):
+        data[key] = datetime.fromisoformat(data[key]) if data[key] else None
+    data["columns"] = [ColumnInfo(**c) for c in data["columns"]]
+    data["indexes"] = [IndexInfo(**i) for i in data["indexes"]]
+    data["foreign_keys"] = [ForeignKeyInfo(**fk) for fk in data["foreign_keys"]]
+    data["partitions"] = [PartitionInfo(**p) for p in data["partitions"]]
+    return TableInfo(**data)
+
+
+class CatalogCache:
+    """
+    On-disk cache of the schema catalog and computed migration orders.
+
+    Each run fetches only a fingerprint of every table: CREATE_TIME plus
+    checksums of its columns, indexes, foreign keys and partitions, computed on the
+    server in a single query. Tables whose fingerprint is unchanged are
+    served from the cache and only changed tables are introspected again.
+    The same query refreshes row counts, sizes and UPDATE_TIME, which change
+    with the data rather than the definition.
+    """
+
+    def __init__(self, path: str = ".migres/catalog.json"):
+        self.path = path
+        self.logger = logging.getLogger(__name__)
+        self._data = self._read()
+
+    def _read(self) -> Dict[str, Any]:
+        empty = {"version": CACHE_VERSION, "tables": {}, "orders": {}}
+        if not os.path.exists(self.path):
+            return empty
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"Ignoring unreadable catalog cache {self.path}: {str(e)}")
+            return empty
+        return data if data.get("version") == CACHE_VERSION else empty
+
+    def save(self) -> None:
+        write_json_atomic(self.path, self._data)
+
+    def _fingerprints(self, mariadb, databases: List[str], selection=None) -> List[Dict[str, Any]]:
+        # The checksums are built with GROUP_CONCAT, which is truncated at 1KB by default
+        mariadb.execute_query("SET SESSION group_concat_max_len = 16777216")
+        placeholders = ", ".join(["%s"] * len(databases))
+        predicate, outer_predicate, params = "", "", []
+        if selection is not None:
+            predicate, params = selection.table_predicate()
+            outer_predicate, _ = selection.table_predicate("t.TABLE_NAME")
+        query = FINGERPRINT_QUERY.format(schemas=placeholders, tables=predicate, outer_tables=outer_predicate)
+        result = mariadb.execute_query(query, (tuple(databases) + tuple(params)) * 5)
+        if result is None or result.empty:
+            return []
+        return result.to_dict("records")
+
+    def load_catalog(self, mariadb, databases: List[str], selection=None) -> SchemaCatalog:
+        """Get the catalog of the given databases, introspecting only changed tables
+
+        Args:
+            mariadb: MariaDBConnector to query INFORMATION_SCHEMA with
+            databases: Names of the databases to load
+            selection: SelectionRules of the exported tables, pushed into the
+                queries so other tables are left out of the catalog
+
+        Returns:
+            SchemaCatalog with a fingerprint for every table
+        """
+        cached_tables = self._data["tables"]
+        catalog = SchemaCatalog(databases, selection)
+        changed: List[Tuple[str, str]] = []
+        stats: Dict[Tuple[str, str], Dict[str, Any]] = {}
+
+        for row in self._fingerprints(mariadb, databases, selection):
+            key = (row["TABLE_SCHEMA"], row["TABLE_NAME"])
+            create_time = _datetime(row["CREATE_TIME"])
+            fingerprint = hashlib.md5("|".join(str(v) for v in [
+                create_time, row["COLUMNS_CHECKSUM"], row["INDEXES_CHECKSUM"], row["FKS_CHECKSUM"],
+                row["PARTITIONS_CHECKSUM"],
+            ]).encode()).hexdigest()
+            catalog.fingerprints[key] = fingerprint
+            stats[key] = {
+                "engine": row["ENGINE"],
+                "rows": _int(row["TABLE_ROWS"]) or 0,
+                "avg_row_length": _int(row["AVG_ROW_LENGTH"]) or 0,
+                "data_length": _int(row["DATA_LENGTH"]) or 0,
+                "index_length": _int(row["INDEX_LENGTH"]) or 0,
+                "update_time": _datetime(row["UPDATE_TIME"]),
+            }
+
+            cached = cached_tables.get(".".join(key))
+            if cached and cached["fingerprint"] == fingerprint:
+                catalog.add_table(_table_from_dict(cached["table"]))
+            else:
+                changed.append(key)
+
+        if changed:
+            self.logger.info(f"Introspecting {len(changed)} new or changed tables")
+            partial = len(changed) <= MAX_PARTIAL_RELOAD
+            fresh = SchemaCatalog.load(mariadb, databases, changed if partial else None, selection)
+            for key in changed:
+                table = fresh.table(*key)
+                if table is not None:
+                    catalog.add_table(table)
+
+        # Statistics are always current, whether or not the definition was cached
+        for key, values in stats.items():
+            table = catalog.table(*key)
+            if table is not None:
+                for name, value in values.items():
+                    setattr(table, name, value)
+
+        removed = set(cached_tables) - {".".join(key) for key in catalog.fingerprints}
+        removed = {name for name in removed if name.split(".", 1)[0] in databases}
+        if selection is not None:
+            # Deselected tables are only missing from this catalog, not from the source
+            removed = {name for name in removed if selection.include_table(name.split(".", 1)[1])}
+        if changed or removed:
+            for name in removed:
+                del cached_tables[name]
+            for key in changed:
+                table = catalog.table(*key)
+                if table is not None:
+                    cached_tables[".".join(key)] = {
+                        "fingerprint": catalog.fingerprints[key],
+                        "table": _table_to_dict(table),
+                    }
+            self.save()
+
+        return catalog
+
+    def get_order(self, scope: str, key: str) -> Optional[Any]:
+        """Get a cached migration order
+
+        Args:
+            scope: What the order covers, such as a database name
+            key: Digest of the schema and settings the order was computed from
+
+        Returns:
+            The cached order, or None if it was computed from different inputs
+        """
+        cached = self._data["orders"].get(scope)
+        return cached["order"] if cached and cached["key"] == key else None
+
+    def set_order(self, scope: str, key: str, order: Any) -> None:
+        """Store a migration order, replacing the previous one of the same scope"""
+        self._data["orders"][scope] = {"key": key, "order": order}
+        self.save()
@@ -2,7 +2,6 @@ import os
 import configparser
 from pathlib import Path
 from typing import Dict, Any
-from pydantic import BaseSettings
 
 class ConfigManager:
     def __init__(self):
@@ -26,12 +25,26 @@ class ConfigManager:
                 self.configs[config_name].write(configfile)
 
 
-class DBSettings(BaseSettings):
-    mariadb_host: str = os.getenv("MARIADB_HOST")
-    mariadb_user: str = os.getenv("MARIADB_USER")
-    mariadb_password: str = os.getenv("MARIADB_PASSWORD")
-    MARIADB_DATABASE: str = os.getenv("MARIADB_DATABASE")
-    supabase_connection: str = os.getenv("SUPABASE_CONNECTION_STRING")
+def _db_settings_class():
+    from pydantic import BaseSettings
 
-    class Config:
-        env_file = ".env"
\ No newline at end of file
+    class DBSettings(BaseSettings):
+        mariadb_host: str = os.getenv("MARIADB_HOST")
+        mariadb_user: str = os.getenv("MARIADB_USER")
+        mariadb_password: str = os.getenv("MARIADB_PASSWORD")
+        MARIADB_DATABASE: str = os.getenv("MARIADB_DATABASE")
+        supabase_connection: str = os.getenv("SUPABASE_CONNECTION_STRING")
+
+        class Config:
+            env_file = ".env"
+
+    DBSettings.__qualname__ = "DBSettings"
+    return DBSettings
+
+
+def __getattr__(name: str):
+    # pydantic is only imported by code that uses DBSettings
+    if name == "DBSettings":
+        globals()[name] = _db_settings_class()
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
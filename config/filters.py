@@ -0,0 +1,238 @@
+import hashlib
+import re
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+Table = Tuple[str, str]
+
+# Words allowed in a filter besides the table's columns and function names
+SQL_WORDS = {
+    "and", "or", "not", "xor", "is", "null", "true", "false", "unknown", "in", "between", "like", "rlike",
+    "regexp", "escape", "exists", "case", "when", "then", "else", "end", "interval", "binary", "collate",
+    "as", "div", "mod", "distinct", "all", "any", "some",
+    "microsecond", "second", "minute", "hour", "day", "week", "month", "quarter", "year",
+    "current_date", "current_time", "current_timestamp", "localtime", "localtimestamp",
+    "char", "date", "datetime", "time", "signed", "unsigned", "decimal", "integer", "json",
+}
+
+# Filters are inserted into queries as they are, so statement separators and
+# comments, which could end or hide the rest of the query, are refused
+_FORBIDDEN = re.compile(r";|--|/\*|\*/|#")
+_STRINGS = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.|\"\")*\"")
+_IDENTIFIERS = re.compile(r"`([^`]+)`|\b([A-Za-z_][A-Za-z0-9_$]*)\b(\s*\()?")
+
+
+def with_filter(fingerprint: Optional[str], where: Optional[str]) -> Optional[str]:
+    """Fingerprint of a table read with a filter, so filtered and full reads are told apart"""
+    if not where or fingerprint is None:
+        return fingerprint
+    return hashlib.md5(f"{fingerprint}|{where}".encode()).hexdigest()
+
+
+def _identifiers(predicate: str) -> List[str]:
+    """Names a predicate refers to, leaving out literals, keywords and function calls"""
+    names = []
+    for match in _IDENTIFIERS.finditer(_STRINGS.sub("''", predicate)):
+        quoted, word, call = match.groups()
+        if quoted:
+            names.append(quoted)
+        elif not call and word.lower() not in SQL_WORDS and not re.fullmatch(r"\d.*", word):
+            names.append(word)
+    return names
+
+
+def _column_list(columns: List[str]) -> str:
+    return ", ".join(f"`{c}`" for c in columns)
+
+
+class RowFilters:
+    """
+    Per-table row filters from the [filters] section of maria_config.ini
+
+    Each entry maps a table, or "database.table", to a MariaDB WHERE
+    condition, such as `posts = created_at >= NOW() - INTERVAL 2 YEAR`.
+    Filters are checked against the catalog and then applied by every query
+    reading the table.
+
+    A filtered table restricts the tables referencing it: their rows are
+    limited to those whose foreign key is NULL or points to a row that is
+    loaded, so the foreign keys still hold in PostgreSQL. Foreign keys
+    inside a cycle are not followed.
+    """
+
+    def __init__(self, filters: Dict[str, str]):
+        self.filters = {key: " ".join(where.split()) for key, where in filters.items() if where and where.strip()}
+
+    @classmethod
+    def from_config(cls, maria_config) -> "RowFilters":
+        if not maria_config.has_section("filters"):
+            return cls({})
+        # Read raw, a LIKE pattern's % is not an interpolation
+        return cls({key: maria_config.get("filters", key, raw=True) for key in maria_config.options("filters")})
+
+    def __bool__(self) -> bool:
+        return bool(self.filters)
+
+    def get(self, db_name: str, table_name: str) -> Optional[str]:
+        """The filter set for a table itself, by qualified or plain name"""
+        return self.filters.get(f"{db_name}.{table_name}".lower(), self.filters.get(table_name.lower()))
+
+    def validate(self, catalog) -> None:
+        """
+        Check every filter names a table of the catalog and only its columns
+
+        Raises:
+            ValueError: Listing every invalid filter
+        """
+        tables = {}
+        for table in catalog.tables():
+            tables.setdefault(table.name.lower(), []).append(table)
+            tables[f"{table.database}.{table.name}".lower()] = [table]
+
+        errors = []
+        for key, where in self.filters.items():
+            if _FORBIDDEN.search(_STRINGS.sub("''", where)):
+                errors.append(f"[filters] {key}: comments and ';' are not allowed")
+                continue
+            if where.count("(") != where.count(")"):
+                errors.append(f"[filters] {key}: unbalanced parentheses")
+                continue
+            if key not in tables:
+                errors.append(f"[filters] {key}: unknown table")
+                continue
+            for table in tables[key]:
+                columns = {c.lower() for c in table.column_names}
+                unknown = sorted({n for n in _identifiers(where) if n.lower() not in columns})
+                if unknown:
+                    errors.append(f"[filters] {key}: unknown columns {', '.join(unknown)} "
+                                  f"in {table.database}.{table.name}")
+        if errors:
+            raise ValueError("Invalid row filters:\n  " + "\n  ".join(errors))
+
+    def resolve(self, catalog, cycles: Optional[Set[Tuple[Table, Table]]] = None) -> Dict[Table, str]:
+        """
+        Work out the condition every table is read with
+
+        Args:
+            catalog: SchemaCatalog of the exported tables
+            cycles: (table, referenced table) pairs of foreign keys inside
+                cycles, which are not followed
+
+        Returns:
+            Dictionary mapping (database, table) pairs to their full WHERE
+            condition, for the tables that have one
+        """
+        cycles = cycles or set()
+
+        def condition(key: Table, select) -> Optional[str]:
+            conditions = []
+            own = self.get(*key)
+            if own:
+                conditions.append(f"({own})")
+            for fk in catalog.table(*key).foreign_keys:
+                parent = (fk.referenced_database or key[0], fk.referenced_table)
+                if parent == key or (key, parent) in cycles:
+                    continue
+                rows = select(parent, fk.referenced_columns)
+                if rows is None:
+                    continue
+                nulls = " OR ".join(f"`{c}` IS NULL" for c in fk.columns)
+                conditions.append(f"({nulls} OR ({_column_list(fk.columns)}) IN {rows})")
+            return " AND ".join(conditions) or None
+
+        return SemiJoins(catalog, condition).resolve((table.database, table.name) for table in catalog.tables())
+
+
+class SemiJoins:
+    """
+    Writes conditions that keep the rows matching the rows read from other tables
+
+    A table's condition selects from the tables it depends on with
+    IN (SELECT ...) semi-joins. Inlining the condition of each of those
+    tables, and of the tables they depend on in turn, repeats a table once
+    per path reaching it and grows exponentially with the depth of the
+    schema. Instead, the subquery of a semi-join defines the rows read from
+    every table it depends on once, as a common table expression, and the
+    expressions select from each other by name.
+
+    Args:
+        catalog: SchemaCatalog of the exported tables
+        condition: Callable taking a table and a select(table, columns)
+            callable, and returning the table's condition or None. select
+            returns a subquery of the columns of the rows read from the
+            table, or None when the table is read in full
+    """
+
+    def __init__(self, catalog, condition: Callable[[Table, Callable], Optional[str]]):
+        self.catalog = catalog
+        self.condition = condition
+        # Tables each conditional table selects from, and the columns selected from every table
+        self.depends: Dict[Table, List[Table]] = {}
+        self.columns: Dict[Table, List[str]] = {}
+        self._visiting: Set[Table] = set()
+
+    def _discover(self, key: Table) -> bool:
+        """Whether a table has a condition, noting the tables and columns it selects from"""
+        if key in self.depends:
+            return True
+        if key in self._visiting or self.catalog.table(*key) is None:
+            return False
+        self._visiting.add(key)
+        depends: List[Table] = []
+
+        def select(other: Table, columns: List[str]) -> Optional[str]:
+            if not self._discover(other):
+                return None
+            if other not in depends:
+                depends.append(other)
+            selected = self.columns.setdefault(other, [])
+            selected.extend(c for c in columns if c not in selected)
+            return "()"
+
+        conditional = self.condition(key, select) is not None
+        self._visiting.discard(key)
+        if conditional:
+            self.depends[key] = depends
+        return conditional
+
+    def _selector(self, key: Table, source: Callable[[Table, List[str]], str]) -> Callable:
+        """select callable for the condition of a table, giving the tables it depends on from source"""
+        def select(other: Table, columns: List[str]) -> Optional[str]:
+            return source(other, columns) if other in self.depends[key] else None
+        return select
+
+    def _subquery(self, key: Table, columns: List[str]) -> str:
+        """Subquery of the columns of the rows read from a table, with what it depends on as CTEs"""
+        order: List[Table] = []
+
+        def visit(table: Table) -> None:
+            if table not in order:
+                for other in self.depends[table]:
+                    visit(other)
+                order.append(table)
+
+        visit(key)
+        names = {table: f"`k{i}`" for i, table in enumerate(order)}
+
+        def source(other: Table, selected: List[str]) -> str:
+            return f"(SELECT {_column_list(selected)} FROM {names[other]})"
+
+        expressions = []
+        for table in order:
+            where = self.condition(table, self._selector(table, source))
+            expressions.append(f"{names[table]} AS (SELECT {_column_list(self.columns[table])} "
+                               f"FROM `{table[0]}`.`{table[1]}` WHERE {where})")
+        return f"(WITH {', '.join(expressions)} SELECT {_column_list(columns)} FROM {names[key]})"
+
+    def resolve(self, keys: Iterable[Table]) -> Dict[Table, str]:
+        """
+        Conditions of the given tables
+
+        Returns:
+            Dictionary mapping (database, table) pairs to their WHERE
+            condition, for the tables that have one
+        """
+        resolved = {}
+        for key in keys:
+            if self._discover(key):
+                resolved[key] = self.condition(key, self._selector(key, self._subquery))
+        return resolved
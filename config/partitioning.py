@@ -0,0 +1,254 @@
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# table_schema.ini keys describing how a table is partitioned
+PARTITION_KEYS = [
+    "partition_by", "partition_interval", "partition_start", "partition_end",
+    "partition_values", "partition_count", "partition_default",
+]
+
+PARTITION_METHODS = ("range", "list", "hash")
+
+_INTERVAL_UNITS = {
+    "day": lambda n: pd.DateOffset(days=n),
+    "week": lambda n: pd.DateOffset(weeks=n),
+    "month": lambda n: pd.DateOffset(months=n),
+    "year": lambda n: pd.DateOffset(years=n),
+}
+
+_NAME_FORMATS = {"day": "%Y_%m_%d", "week": "%Y_%m_%d", "month": "%Y_%m", "year": "%Y"}
+
+
+def _quote(name: str) -> str:
+    return f'"{name.lower()}"'
+
+
+def _literal(value: Any) -> str:
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+@dataclass
+class ChildPartition:
+    """One child table of a partitioned table
+
+    Range children cover [lower, upper), list children the given values and
+    hash children one remainder. The default child has none of them.
+    """
+    name: str
+    lower: Any = None
+    upper: Any = None
+    values: List[str] = field(default_factory=list)
+    remainder: Optional[int] = None
+    default: bool = False
+
+
+@dataclass
+class PartitionSpec:
+    """
+    Partitioning of a target table, read from its table_schema.ini section.
+
+    range: partition_by = range(created_at), with partition_interval
+           (such as "1 month", or a number for integer keys) and the
+           partition_start / partition_end of the covered key range
+    list:  partition_by = list(region), with one "name: value, value" line
+           per child in partition_values
+    hash:  partition_by = hash(user_id), with partition_count children
+    Range and list tables also get a default child for rows outside the
+    listed bounds, unless partition_default = false.
+    """
+    table: str
+    method: str
+    key: str
+    interval: Optional[str] = None
+    start: Optional[str] = None
+    end: Optional[str] = None
+    values: Dict[str, List[str]] = field(default_factory=dict)
+    count: int = 0
+    default: bool = True
+    children: List[ChildPartition] = field(default_factory=list)
+
+    @classmethod
+    def from_section(cls, table: str, section: Dict[str, str]) -> Optional["PartitionSpec"]:
+        """Read the partitioning of a table
+
+        Args:
+            table: Table name
+            section: Keys and values of the table's table_schema.ini section
+
+        Returns:
+            PartitionSpec, or None if the table is not partitioned
+
+        Raises:
+            ValueError: If the partitioning settings are incomplete or invalid
+        """
+        partition_by = section.get("partition_by")
+        if not partition_by:
+            return None
+
+        match = re.fullmatch(r"\s*(\w+)\s*\(\s*(\w+)\s*\)\s*", partition_by)
+        if not match or match.group(1).lower() not in PARTITION_METHODS:
+            raise ValueError(f"{table}: partition_by must look like range(column), "
+                             f"list(column) or hash(column), got '{partition_by}'")
+
+        spec = cls(
+            table=table,
+            method=match.group(1).lower(),
+            key=match.group(2),
+            interval=section.get("partition_interval"),
+            start=section.get("partition_start"),
+            end=section.get("partition_end"),
+            count=int(section.get("partition_count") or 0),
+            default=str(section.get("partition_default", "true")).lower() not in ("false", "no", "0"),
+        )
+        for line in (section.get("partition_values") or "").strip().split("\n"):
+            if line.strip():
+                name, _, values = line.partition(":")
+                spec.values[name.strip()] = [v.strip() for v in values.split(",") if v.strip()]
+
+        spec.children = spec._build_children()
+        return spec
+
+    @property
+    def time_based(self) -> bool:
+        """Whether a range key is a date or timestamp rather than a number"""
+        return self.method == "range" and not re.fullmatch(r"\s*-?\d+\s*", self.interval or "")
+
+    def _build_children(self) -> List[ChildPartition]:
+        if self.method == "hash":
+            if self.count < 1:
+                raise ValueError(f"{self.table}: hash partitioning needs partition_count")
+            return [ChildPartition(f"{self.table}_p{i}", remainder=i) for i in range(self.count)]
+
+        if self.method == "list":
+            if not self.values:
+                raise ValueError(f"{self.table}: list partitioning needs partition_values")
+            children = [ChildPartition(f"{self.table}_{name}", values=values)
+                        for name, values in self.values.items()]
+        else:
+            children = self._range_children()
+
+        if self.default:
+            children.append(ChildPartition(f"{self.table}_default", default=True))
+        return children
+
+    def _range_children(self) -> List[ChildPartition]:
+        if not (self.interval and self.start and self.end):
+            raise ValueError(f"{self.table}: range partitioning needs partition_interval, "
+                             f"partition_start and partition_end")
+
+        children = []
+        if not self.time_based:
+            step, lower, end = int(self.interval), int(self.start), int(self.end)
+            if step < 1:
+                raise ValueError(f"{self.table}: partition_interval must be positive")
+            while lower < end:
+                upper = min(lower + step, end)
+                children.append(ChildPartition(f"{self.table}_p{lower}", lower=lower, upper=upper))
+                lower = upper
+            return children
+
+        match = re.fullmatch(r"\s*(\d+)\s*(day|week|month|year)s?\s*", self.interval.lower())
+        if not match:
+            raise ValueError(f"{self.table}: partition_interval must be a number or look like "
+                             f"'1 month', got '{self.interval}'")
+        count, unit = int(match.group(1)), match.group(2)
+        offset = _INTERVAL_UNITS[unit](count)
+
+        lower, end = pd.Timestamp(self.start), pd.Timestamp(self.end)
+        while lower < end:
+            upper = min(lower + offset, end)
+            name = f"{self.table}_p{lower.strftime(_NAME_FORMATS[unit])}"
+            children.append(ChildPartition(name, lower=lower, upper=upper))
+            lower = upper
+        return children
+
+    def _bound_value(self, value: Any) -> str:
+        if self.time_based:
+            return _literal(value.isoformat(sep=" "))
+        return str(value)
+
+    def partition_clause(self) -> str:
+        """The PARTITION BY clause of the parent table"""
+        return f"PARTITION BY {self.method.upper()} ({_quote(self.key)})"
+
+    def bound_clause(self, child: ChildPartition) -> str:
+        """The FOR VALUES clause attaching a child to the parent"""
+        if child.default:
+            return "DEFAULT"
+        if self.method == "hash":
+            return f"FOR VALUES WITH (MODULUS {self.count}, REMAINDER {child.remainder})"
+        if self.method == "list":
+            return f"FOR VALUES IN ({', '.join(_literal(v) for v in child.values)})"
+        return f"FOR VALUES FROM ({self._bound_value(child.lower)}) TO ({self._bound_value(child.upper)})"
+
+    def check_clause(self, child: ChildPartition) -> Optional[str]:
+        """A CHECK expression equal to the child's partition constraint
+
+        Adding it before ATTACH PARTITION lets PostgreSQL skip the scan that
+        validates the child's rows. There is none for default and hash
+        children, whose constraints cannot be written as plain SQL.
+        """
+        if child.default or self.method == "hash":
+            return None
+        key = _quote(self.key)
+        if self.method == "list":
+            return f"{key} IS NOT NULL AND {key} IN ({', '.join(_literal(v) for v in child.values)})"
+        return (f"{key} IS NOT NULL AND {key} >= {self._bound_value(child.lower)} "
+                f"AND {key} < {self._bound_value(child.upper)}")
+
+    def route(self, df: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+        """Split a chunk of rows by the child partition they belong to
+
+        Args:
+            df: Rows of the partitioned table
+
+        Returns:
+            Dictionary mapping child names to their rows
+
+        Raises:
+            ValueError: For range and list tables, if rows fall outside every
+                child and there is no default child
+        """
+        if self.method == "hash":
+            raise ValueError("Rows of hash partitioned tables are routed by PostgreSQL")
+
+        column = next((c for c in df.columns if c.lower() == self.key.lower()), None)
+        if column is None:
+            raise ValueError(f"{self.table}: partition key {self.key} is not among the loaded columns")
+
+        children = [c for c in self.children if not c.default]
+        positions = np.full(len(df), -1)
+        values = df[column]
+
+        if self.method == "list":
+            lookup = {value: i for i, child in enumerate(children) for value in child.values}
+            mapped = values.map(lambda v: lookup.get(str(v), -1) if v is not None and v == v else -1)
+            positions = mapped.to_numpy(dtype=int)
+        elif children:
+            if self.time_based:
+                keys = pd.to_datetime(values, errors="coerce").to_numpy(dtype="datetime64[ns]")
+                lowers = np.array([c.lower.to_datetime64() for c in children], dtype="datetime64[ns]")
+                end = children[-1].upper.to_datetime64()
+                valid = ~np.isnat(keys) & (keys >= lowers[0]) & (keys < end)
+            else:
+                keys = pd.to_numeric(values, errors="coerce").to_numpy(dtype=float)
+                lowers = np.array([c.lower for c in children], dtype=float)
+                end = children[-1].upper
+                valid = ~np.isnan(keys) & (keys >= lowers[0]) & (keys < end)
+            # Children are contiguous, so the last lower bound at or below a key finds its child
+            positions = np.where(valid, np.searchsorted(lowers, keys, side="right") - 1, -1)
+
+        routed = {}
+        for position, rows in df.groupby(positions, sort=False):
+            if position >= 0:
+                routed[children[position].name] = rows
+            elif self.default:
+                routed[f"{self.table}_default"] = rows
+            else:
+                raise ValueError(f"{self.table}: {len(rows)} rows fall outside every partition "
+                                 f"and partition_default is off")
+        return routed
@@ -0,0 +1,95 @@
+from typing import Dict, List, Optional, Set, Tuple
+
+from config.filters import SemiJoins
+
+Table = Tuple[str, str]
+
+# Resolution of the sampling hash, the smallest rate is one in a million
+_BUCKETS = 1000000
+
+
+def parse_sample_rate(value: str) -> float:
+    """
+    Parse a sample rate such as "1%" or "0.01"
+
+    Raises:
+        ValueError: If the rate is not above 0 and at most 100%
+    """
+    text = str(value).strip()
+    try:
+        rate = float(text[:-1]) / 100 if text.endswith("%") else float(text)
+    except ValueError:
+        raise ValueError(f"Invalid sample rate: {value}")
+    if not 0 < rate <= 1:
+        raise ValueError(f"Sample rate must be above 0 and at most 100%: {value}")
+    return rate
+
+
+class ReferentialSampler:
+    """
+    Picks a sample of the source that satisfies every foreign key
+
+    Root tables, which no other exported table references, are sampled by a
+    hash of their primary key, so the same rate and seed always pick the same
+    rows. Every other table gets exactly the rows the sampled tables reference,
+    following the foreign keys up to the tables nothing is referenced from.
+    The key sets are pushed into the source queries as IN (SELECT ...)
+    semi-joins, which the server evaluates without sending the keys back, and
+    each table a subquery depends on is defined once in it, see SemiJoins.
+
+    Tables in a foreign key cycle, including self references, can't be closed
+    table by table, so they are read in full, together with the rows they
+    reference.
+    """
+
+    def __init__(self, rate: float, seed: int = 0):
+        self.rate = rate
+        self.seed = seed
+
+    def _hash_condition(self, columns: List[str]) -> str:
+        values = ", ".join(f"`{c}`" for c in columns)
+        return f"MOD(CRC32(CONCAT_WS('|', {int(self.seed)}, {values})), {_BUCKETS}) < {round(self.rate * _BUCKETS)}"
+
+    def resolve(self, catalog, filters: Dict[Table, str], cycles: Set[Tuple[Table, Table]]) -> Dict[Table, str]:
+        """
+        Work out the condition every table is read with
+
+        Args:
+            catalog: SchemaCatalog of the exported tables
+            filters: Row filters of the tables, see RowFilters.resolve
+            cycles: (table, referenced table) pairs of foreign keys inside cycles
+
+        Returns:
+            Dictionary mapping (database, table) pairs to their full WHERE
+            condition, combining the row filter and the sample
+        """
+        in_cycle = {table for edge in cycles for table in edge}
+        referenced_by: Dict[Table, List] = {}
+        for table in catalog.tables():
+            key = (table.database, table.name)
+            for fk in table.foreign_keys:
+                parent = (fk.referenced_database or table.database, fk.referenced_table)
+                if parent != key and catalog.table(*parent) is not None:
+                    referenced_by.setdefault(parent, []).append((key, fk))
+
+        def condition(key: Table, select) -> Optional[str]:
+            table = catalog.table(*key)
+            conditions = [f"({filters[key]})"] if filters.get(key) else []
+
+            if key in in_cycle:
+                pass
+            elif key not in referenced_by:
+                conditions.append(self._hash_condition(table.primary_key or table.column_names))
+            else:
+                # Nothing references back into a table outside cycles, so the tables selected from end
+                references = []
+                for child, fk in referenced_by[key]:
+                    columns = ", ".join(f"`{c}`" for c in fk.referenced_columns)
+                    child_columns = ", ".join(f"`{c}`" for c in fk.columns)
+                    rows = select(child, fk.columns) or f"(SELECT {child_columns} FROM `{child[0]}`.`{child[1]}`)"
+                    references.append(f"({columns}) IN {rows}")
+                conditions.append(f"({' OR '.join(references)})")
+
+            return " AND ".join(conditions) or None
+
+        return SemiJoins(catalog, condition).resolve((table.database, table.name) for table in catalog.tables())
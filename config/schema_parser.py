@@ -2,6 +2,8 @@ import configparser
 from pathlib import Path
 from typing import Dict, List, Any, Optional, Tuple
 
+from config.partitioning import PARTITION_KEYS, PartitionSpec
+
 def parse_table_schema():
     """
     Parse table schema configuration including column definitions and constraints
@@ -38,6 +40,8 @@ def parse_table_schema():
                         schema[table]["foreign_keys"].append(fk_def.strip())
             elif key == "indexes":
                 schema[table]["indexes"] = [idx.strip() for idx in value.split(',')]
+            elif key in PARTITION_KEYS:
+                schema[table].setdefault("partitioning", {})[key] = value
             else:
                 # This is a column definition
                 schema[table]["columns"][key] = value
@@ -52,12 +56,133 @@ def parse_table_schema():
     
     return schema 
 
+# MariaDB DATA_TYPE to PostgreSQL type, for types that need no size information
+_POSTGRES_TYPES = {
+    "tinyint": "SMALLINT",
+    "smallint": "SMALLINT",
+    "mediumint": "INTEGER",
+    "int": "INTEGER",
+    "bigint": "BIGINT",
+    "float": "REAL",
+    "double": "DOUBLE PRECISION",
+    "date": "DATE",
+    "datetime": "TIMESTAMP",
+    "timestamp": "TIMESTAMP",
+    "time": "INTERVAL",
+    "year": "SMALLINT",
+    "json": "JSONB",
+    "tinytext": "TEXT",
+    "text": "TEXT",
+    "mediumtext": "TEXT",
+    "longtext": "TEXT",
+    "enum": "TEXT",
+    "set": "TEXT",
+    "binary": "BYTEA",
+    "varbinary": "BYTEA",
+    "tinyblob": "BYTEA",
+    "blob": "BYTEA",
+    "mediumblob": "BYTEA",
+    "longblob": "BYTEA",
+    "bit": "BIGINT",
+}
+
+
+def postgres_column_type(column) -> str:
+    """
+    Translate a MariaDB column into a PostgreSQL column definition
+    
+    Args:
+        column: ColumnInfo from the schema catalog
+        
+    Returns:
+        str: PostgreSQL type, with NOT NULL and identity clauses where needed
+    """
+    unsigned = "unsigned" in column.column_type
+    
+    if column.data_type in ("decimal", "numeric") and column.numeric_precision:
+        pg_type = f"NUMERIC({column.numeric_precision}, {column.numeric_scale or 0})"
+    elif column.data_type in ("char", "varchar") and column.max_length:
+        pg_type = f"VARCHAR({column.max_length})"
+    elif unsigned and column.data_type == "int":
+        pg_type = "BIGINT"
+    elif unsigned and column.data_type == "bigint":
+        pg_type = "NUMERIC(20)"
+    else:
+        pg_type = _POSTGRES_TYPES.get(column.data_type, "TEXT")
+    
+    if not column.nullable:
+        pg_type += " NOT NULL"
+    if column.auto_increment and pg_type.split()[0] in ("SMALLINT", "INTEGER", "BIGINT"):
+        pg_type += " GENERATED BY DEFAULT AS IDENTITY"
+    
+    return pg_type
+
+
 class SchemaParser:
     """Parser for table schema and constraints configuration"""
     
-    def __init__(self, schema_file_path: str):
+    def __init__(self, schema_file_path: Optional[str] = None):
         self.config = configparser.ConfigParser()
-        self.config.read(schema_file_path)
+        if schema_file_path:
+            self.config.read(schema_file_path)
+    
+    @classmethod
+    def from_definitions(cls, schema_definitions: Dict[str, Dict[str, str]]) -> "SchemaParser":
+        """Create a parser from table_schema.ini already read into a dictionary"""
+        parser = cls()
+        parser.config.read_dict(schema_definitions)
+        return parser
+    
+    @classmethod
+    def from_catalog(cls, catalog, db_name: str,
+                     type_overrides: Optional[Dict[str, Dict[str, str]]] = None) -> "SchemaParser":
+        """Generate a schema from the source catalog instead of table_schema.ini
+        
+        Args:
+            catalog: Loaded SchemaCatalog
+            db_name: Database whose tables to describe
+            type_overrides: Per-table column types from type_config.ini
+            
+        Returns:
+            SchemaParser describing every table of the database
+        """
+        parser = cls()
+        type_overrides = type_overrides or {}
+        
+        for table in catalog.tables(db_name):
+            section = table.name
+            parser.config.add_section(section)
+            overrides = type_overrides.get(table.name, {})
+            
+            for column in table.columns:
+                pg_type = overrides.get(column.name.lower())
+                parser.config.set(section, column.name,
+                                  pg_type.upper() if pg_type else postgres_column_type(column))
+            
+            if table.primary_key:
+                parser.config.set(section, "primary_key", ", ".join(table.primary_key))
+            
+            foreign_keys = [
+                f"{', '.join(fk.columns)} -> {fk.referenced_table}({', '.join(fk.referenced_columns)})"
+                for fk in table.foreign_keys
+            ]
+            if foreign_keys:
+                parser.config.set(section, "foreign_keys", "\n" + "\n".join(foreign_keys))
+            
+            # The ini format only expresses single-column indexes and unique constraints
+            indexes = [i.columns[0] for i in table.indexes if len(i.columns) == 1 and not i.unique]
+            unique = [i.columns[0] for i in table.indexes if len(i.columns) == 1 and i.unique]
+            if indexes:
+                parser.config.set(section, "indexes", ", ".join(indexes))
+            if unique:
+                parser.config.set(section, "unique", ", ".join(unique))
+        
+        return parser
+    
+    def write(self, schema_file_path: str) -> None:
+        """Save the schema in table_schema.ini format"""
+        with open(schema_file_path, 'w') as f:
+            self.config.write(f)
         
     def get_tables(self) -> List[str]:
         """Get all table names defined in the schema"""
@@ -75,7 +200,7 @@ class SchemaParser:
         column_defs = {}
         for key, value in self.config.items(table_name):
             # Skip special keys that define constraints
-            if key not in ['primary_key', 'foreign_keys', 'indexes', 'unique']:
+            if key not in ['primary_key', 'foreign_keys', 'indexes', 'unique'] + PARTITION_KEYS:
                 column_defs[key] = value
                 
         return column_defs
@@ -138,6 +263,12 @@ class SchemaParser:
             
         return [constraint.strip() for constraint in unique_str.split(',')]
         
+    def get_partition_spec(self, table_name: str) -> Optional[PartitionSpec]:
+        """Get the partitioning of a table, or None if it is not partitioned"""
+        if not self.config.has_section(table_name):
+            return None
+        return PartitionSpec.from_section(table_name, dict(self.config.items(table_name)))
+        
     def generate_create_table_sql(self, table_name: str) -> str:
         """Generate SQL to create the table with all constraints"""
         if not self.config.has_section(table_name):
@@ -169,7 +300,18 @@ class SchemaParser:
             columns.append(f"    UNIQUE ({constraint})")
             
         sql += ",\n".join(columns)
-        sql += "\n);"
+        sql += "\n)"
+        
+        # Partitioned tables only get their hash children here. Range and list
+        # children are created by the loader and attached once loaded.
+        spec = self.get_partition_spec(table_name)
+        if spec:
+            sql += f" {spec.partition_clause()}"
+        sql += ";"
+        if spec and spec.method == "hash":
+            for child in spec.children:
+                sql += (f"\nCREATE TABLE IF NOT EXISTS {child.name} "
+                        f"PARTITION OF {table_name} {spec.bound_clause(child)};")
         
         # Add indexes (these are created separately after the table)
         index_sql = ""
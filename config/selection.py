@@ -0,0 +1,237 @@
+import re
+from typing import Dict, List, Optional, Tuple
+
+# Characters that make a [tables] or [columns] entry a glob rather than a name
+GLOB_CHARACTERS = set("*?[")
+
+# Prefix of a regular expression in the [selection] lists
+REGEX_PREFIX = "re:"
+
+
+def is_pattern(entry: str) -> bool:
+    return entry.startswith(REGEX_PREFIX) or bool(GLOB_CHARACTERS & set(entry))
+
+
+def glob_to_regex(pattern: str) -> str:
+    """
+    Translate a glob into an anchored regular expression
+
+    The result only uses syntax shared by Python and MariaDB's PCRE, so the
+    same expression is matched locally and with REGEXP on the server.
+    """
+    parts = ["^"]
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == "*":
+            parts.append(".*")
+        elif char == "?":
+            parts.append(".")
+        elif char == "[" and "]" in pattern[i + 2:]:
+            end = pattern.index("]", i + 2)
+            body = pattern[i + 1:end]
+            if body.startswith("!"):
+                body = "^" + body[1:]
+            parts.append("[" + body.replace("\\", "\\\\") + "]")
+            i = end
+        else:
+            parts.append(re.escape(char))
+        i += 1
+    parts.append("$")
+    return "".join(parts)
+
+
+def _like(pattern: str) -> Optional[str]:
+    """The LIKE pattern equivalent to a glob, if there is one"""
+    if "[" in pattern:
+        return None
+    escaped = pattern.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return escaped.replace("*", "%").replace("?", "_")
+
+
+class PatternMatcher:
+    """
+    Glob and regular expression rules compiled into one expression
+
+    Globs match the whole name and regular expressions (prefixed with "re:")
+    match anywhere in it, as REGEXP does. Matching ignores case, like the
+    INFORMATION_SCHEMA collation and the option names of configparser.
+    """
+
+    def __init__(self, patterns: List[str]):
+        self.patterns = list(dict.fromkeys(patterns))
+        self._expressions = [self._expression(p) for p in self.patterns]
+        try:
+            self._regex = re.compile("|".join(f"(?:{e})" for e in self._expressions), re.IGNORECASE) \
+                if self.patterns else None
+        except re.error as e:
+            raise ValueError(f"Invalid selection pattern in {self.patterns}: {str(e)}")
+
+    @staticmethod
+    def _expression(pattern: str) -> str:
+        if pattern.startswith(REGEX_PREFIX):
+            return pattern[len(REGEX_PREFIX):]
+        return glob_to_regex(pattern)
+
+    def __bool__(self) -> bool:
+        return bool(self.patterns)
+
+    def match(self, name: str) -> bool:
+        return self._regex is not None and self._regex.search(name) is not None
+
+    def sql(self, column: str) -> Tuple[str, List[str]]:
+        """
+        SQL condition matching the same names
+
+        Returns:
+            Condition on the column and its parameters, LIKE where the glob
+            allows it and REGEXP otherwise
+        """
+        conditions, params = [], []
+        for pattern, expression in zip(self.patterns, self._expressions):
+            like = None if pattern.startswith(REGEX_PREFIX) else _like(pattern)
+            if like is not None:
+                conditions.append(f"{column} LIKE %s")
+                params.append(like)
+            else:
+                conditions.append(f"{column} REGEXP %s")
+                params.append(expression)
+        return "(" + " OR ".join(conditions) + ")", params
+
+
+def _split(value: Optional[str]) -> List[str]:
+    """Entries of a [selection] list: comma-separated, a regular expression takes the rest of its line"""
+    entries = []
+    for line in (value or "").splitlines():
+        line = line.strip()
+        while line:
+            if line.startswith(REGEX_PREFIX):
+                entries.append(line)
+                break
+            entry, _, line = line.partition(",")
+            if entry.strip():
+                entries.append(entry.strip())
+            line = line.strip()
+    return entries
+
+
+class _Rules:
+    """Include and exclude rules of tables, or of "table.column" names"""
+
+    def __init__(self, names: Dict[str, bool], include: List[str], exclude: List[str], default: bool):
+        # Exact names decide first, then exclude patterns, then include patterns
+        self.names = {name.lower(): included for name, included in names.items()}
+        self.include = PatternMatcher(include)
+        self.exclude = PatternMatcher(exclude)
+        self.default = default
+
+    def included(self, name: str) -> bool:
+        explicit = self.names.get(name.lower())
+        if explicit is not None:
+            return explicit
+        if self.exclude.match(name):
+            return False
+        if self.include.match(name):
+            return True
+        return self.default
+
+    def key(self) -> List:
+        return [sorted(self.names.items()), self.include.patterns, self.exclude.patterns, self.default]
+
+
+def _section_rules(maria_config, section: str) -> Tuple[Dict[str, bool], List[str], List[str]]:
+    names, include, exclude = {}, [], []
+    if not maria_config.has_section(section):
+        return names, include, exclude
+    for entry in maria_config.options(section):
+        setting = maria_config.get(section, entry)
+        # A bare entry (as written by --maria-exclude) excludes
+        if setting not in (None, "include", "exclude"):
+            continue
+        included = setting == "include"
+        if is_pattern(entry):
+            (include if included else exclude).append(entry)
+        else:
+            names[entry] = included
+    return names, include, exclude
+
+
+class SelectionRules:
+    """
+    Which tables and columns are exported
+
+    Built from maria_config.ini: exact names and globs in [tables] and
+    [columns] (set to include or exclude, a bare entry excludes), the
+    include_tables, exclude_tables, include_columns and exclude_columns lists
+    of [selection], which also take "re:" regular expressions, and the
+    export_all_tables and export_all_columns defaults. Column rules name
+    "table.column". An exact name overrides any pattern, and an exclude
+    pattern overrides an include pattern.
+    """
+
+    def __init__(self, tables: _Rules, columns: _Rules):
+        self.tables = tables
+        self.columns = columns
+
+    @classmethod
+    def from_config(cls, maria_config) -> "SelectionRules":
+        def rules(kind: str, default_option: str) -> _Rules:
+            names, include, exclude = _section_rules(maria_config, kind)
+            include += _split(maria_config.get("selection", f"include_{kind}", raw=True, fallback=None))
+            exclude += _split(maria_config.get("selection", f"exclude_{kind}", raw=True, fallback=None))
+            default = maria_config.getboolean("export_settings", default_option, fallback=True)
+            return _Rules(names, include, exclude, default)
+
+        return cls(rules("tables", "export_all_tables"), rules("columns", "export_all_columns"))
+
+    def include_table(self, table: str) -> bool:
+        return self.tables.included(table)
+
+    def include_column(self, table: str, column: str) -> bool:
+        return self.columns.included(f"{table}.{column}")
+
+    def key(self) -> List:
+        """Everything the selection depends on, for cache keys"""
+        return [self.tables.key(), self.columns.key()]
+
+    def table_predicate(self, column: str = "TABLE_NAME") -> Tuple[str, List[str]]:
+        """
+        SQL condition selecting the same tables as include_table
+
+        Used to filter the INFORMATION_SCHEMA queries, so excluded tables are
+        never introspected. Comparisons follow the case-insensitive collation
+        of INFORMATION_SCHEMA.
+
+        Args:
+            column: Column holding the table name
+
+        Returns:
+            " AND ..." condition and its parameters, empty when every table is selected
+        """
+        rules = self.tables
+        if not rules.names and not rules.include and not rules.exclude and rules.default:
+            return "", []
+
+        conditions, params = [], []
+        excluded = [name for name, included in rules.names.items() if not included]
+        if excluded:
+            conditions.append(f"{column} NOT IN ({', '.join(['%s'] * len(excluded))})")
+            params += excluded
+        if rules.exclude:
+            sql, pattern_params = rules.exclude.sql(column)
+            conditions.append(f"NOT {sql}")
+            params += pattern_params
+        if not rules.default:
+            if not rules.include:
+                conditions.append("FALSE")
+            else:
+                sql, pattern_params = rules.include.sql(column)
+                conditions.append(sql)
+                params += pattern_params
+
+        condition = " AND ".join(conditions) or "TRUE"
+        included = [name for name, included in rules.names.items() if included]
+        if included:
+            condition = f"{column} IN ({', '.join(['%s'] * len(included))}) OR ({condition})"
+            params = included + params
+        return f"AND ({condition})", params
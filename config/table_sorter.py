@@ -1,18 +1,29 @@
+import hashlib
+import json
 import logging
 import os
-from typing import Dict, List, Set, Tuple
+from typing import Callable, Dict, List, Optional, Set, Tuple
 import configparser
 
+from config.catalog import SchemaCatalog
+from config.selection import SelectionRules
+
 class TableSorter:
     """
     Handles the sorting of tables for migration based on their dependencies.
-    Uses a topological sort algorithm to determine the correct order.
+    Foreign key cycles are collapsed into single units and the resulting
+    graph is sorted into levels of tables that can be loaded concurrently.
     """
     
-    def __init__(self, mariadb_connector, postgres_connector, maria_config):
+    def __init__(self, mariadb_connector, postgres_connector, maria_config, catalog=None,
+                 cache=None):
         self.mariadb = mariadb_connector
         self.postgres = postgres_connector
         self.maria_config = maria_config
+        self.catalog = catalog
+        self.cache = cache
+        # (table, referenced_table) pairs inside foreign key cycles, set when sorting
+        self.deferred_foreign_keys: List[Tuple[str, str]] = []
         self.logger = logging.getLogger(__name__)
     
     def get_migration_order(self, db_name: str) -> List[str]:
@@ -25,49 +36,170 @@ class TableSorter:
         Returns:
             List of table names in the order they should be migrated
         """
+        return [table for level in self.get_migration_levels(db_name) for unit in level for table in unit]
+    
+    def get_migration_levels(self, db_name: str) -> List[List[List[str]]]:
+        """
+        Determine which tables can be migrated together, level by level.
+        
+        Every level only depends on the levels before it, so its units can be
+        loaded concurrently. A unit is a single table, or the tables of a
+        foreign key cycle, which are loaded together with the foreign keys
+        between them deferred (see deferred_foreign_keys).
+        
+        Args:
+            db_name: The database name to analyze
+                
+        Returns:
+            List of levels, each a list of units, each a list of table names
+        """
         # Get all tables
-        try:
-            self.mariadb.select_database(db_name)
-            all_tables = self.mariadb.get_tables()
-        except Exception as e:
-            self.logger.error(f"Error getting tables: {str(e)}")
-            # Fallback: try to get tables with a direct query
-            query = "SHOW TABLES"
-            result = self.mariadb.execute_query(query)
-            if result is not None and not result.empty:
-                all_tables = result.iloc[:, 0].tolist()
-            else:
-                self.logger.error("Could not retrieve tables from database")
+        if self.catalog is not None:
+            all_tables = self.catalog.table_names(db_name)
+        else:
+            all_tables = self._get_tables(db_name)
+            if all_tables is None:
                 return []
         
+        return self._sort_levels(db_name, [db_name], all_tables,
+                                 lambda tables: self._build_dependency_graph(db_name, tables))
+    
+    def get_global_migration_levels(self, databases: List[str]) -> List[List[List[Tuple[str, str]]]]:
+        """
+        Determine the migration levels of several databases as one graph.
+        
+        Foreign keys between the databases are edges like any other, so a
+        level can hold tables of different databases and a table is never
+        loaded before a table it references in another database.
+        
+        Args:
+            databases: Names of the databases to analyze
+                
+        Returns:
+            List of levels, each a list of units, each a list of
+            (database, table) pairs
+        """
+        if self.catalog is None:
+            self.catalog = SchemaCatalog.load(self.mariadb, databases)
+        
+        all_tables = [(db_name, table) for db_name in databases for table in self.catalog.table_names(db_name)]
+        return self._sort_levels(",".join(databases), databases, all_tables,
+                                 self._build_global_dependency_graph)
+    
+    def _sort_levels(self, scope: str, databases: List[str], all_tables: List,
+                     build_graph: Callable[[List], Dict]) -> List[List[List]]:
+        """
+        Sort tables into levels, applying the ordering and exclusion settings.
+        
+        Args:
+            scope: Name the order is cached under
+            databases: Databases the tables belong to
+            all_tables: Table names, or (database, table) pairs
+            build_graph: Builds the dependency graph of the tables to sort
+            
+        Returns:
+            List of levels, each a list of units, each a list of tables
+        """
+        qualified = bool(all_tables) and isinstance(all_tables[0], tuple)
+        
         # Get configuration overrides
         force_early = self._get_force_early_tables()
         force_late = self._get_force_late_tables()
         custom_order = self._get_custom_order_tables()
         
+        # Reuse the order computed for the same schema and settings
+        order_key = self._order_cache_key(databases, force_early, force_late, custom_order)
+        if order_key:
+            cached = self.cache.get_order(scope, order_key)
+            if cached is not None:
+                self.logger.info(f"Using cached migration order for {scope}")
+                levels = cached["levels"]
+                self.deferred_foreign_keys = [tuple(fk) for fk in cached["deferred_foreign_keys"]]
+                if qualified:
+                    # JSON turns the (database, table) pairs into lists
+                    levels = [[[tuple(t) for t in unit] for unit in level] for level in levels]
+                    self.deferred_foreign_keys = [tuple(tuple(t) for t in fk) for fk in self.deferred_foreign_keys]
+                return levels
+        
+        if qualified:
+            # Settings name tables as "table", matching every database, or "database.table"
+            force_early = self._qualify(force_early, all_tables)
+            force_late = self._qualify(force_late, all_tables)
+            custom_order = self._qualify(custom_order, all_tables)
+        
         # Remove tables that have explicit ordering from topology sort
-        tables_to_sort = [t for t in all_tables if t not in force_early and t not in force_late 
-                        and t not in custom_order]
+        explicit = set(force_early) | set(force_late) | set(custom_order)
+        tables_to_sort = [t for t in all_tables if t not in explicit]
         
         # Get dependency graph
-        dependencies = self._build_dependency_graph(db_name, tables_to_sort)
+        dependencies = build_graph(tables_to_sort)
         
-        # Perform topological sort
-        sorted_tables = self._topological_sort(tables_to_sort, dependencies)
+        # Sort the cycles of the graph into levels
+        sorted_levels = self._topological_levels(tables_to_sort, dependencies)
         
         # Get excluded tables from config
-        excluded_tables = []
-        if self.maria_config.has_section('tables'):
-            excluded_tables = [table for table in self.maria_config.options('tables')]
+        selection = SelectionRules.from_config(self.maria_config)
+        
+        def excluded(table) -> bool:
+            return not selection.include_table(table[1] if qualified else table)
+        
+        # Explicitly ordered tables each get a level of their own
+        levels = [[[table]] for table in force_early]
+        levels += sorted_levels
+        levels += [[[table]] for table in custom_order + force_late]
         
         # Filter out excluded tables from the final order
-        final_order = [table for table in (force_early + sorted_tables + custom_order + force_late) 
-                      if table not in excluded_tables]
+        levels = [[[t for t in unit if not excluded(t)] for unit in level] for level in levels]
+        levels = [[unit for unit in level if unit] for level in levels]
+        levels = [level for level in levels if level]
+        
+        if order_key:
+            self.cache.set_order(scope, order_key, {
+                "levels": levels,
+                "deferred_foreign_keys": self.deferred_foreign_keys,
+            })
         
-        # Log the migration order
-        self.log_migration_order(final_order)
+        return levels
+    
+    def explicit_tables(self, all_tables: List[Tuple[str, str]]) -> Set[Tuple[str, str]]:
+        """The (database, table) pairs placed by force_early, custom_order or force_late"""
+        entries = self._get_force_early_tables() + self._get_custom_order_tables() + self._get_force_late_tables()
+        return set(self._qualify(entries, all_tables))
+    
+    def _qualify(self, entries: List[str], all_tables: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+        """Resolve "table" and "database.table" setting entries to (database, table) pairs"""
+        return [
+            (db_name, table) for entry in entries for db_name, table in all_tables
+            if entry in (table, f"{db_name}.{table}")
+        ]
+    
+    def _order_cache_key(self, databases: List[str], force_early: List[str], force_late: List[str],
+                         custom_order: List[str]) -> Optional[str]:
+        """Digest of everything the migration order of some databases depends on"""
+        if self.cache is None or self.catalog is None:
+            return None
+        schema_fingerprints = [self.catalog.database_fingerprint(db_name) for db_name in databases]
+        if None in schema_fingerprints:
+            return None
         
-        return final_order
+        selection = SelectionRules.from_config(self.maria_config).key()[0]
+        inputs = ["levels", schema_fingerprints, force_early, force_late, custom_order, selection]
+        return hashlib.md5(json.dumps(inputs).encode()).hexdigest()
+        
+    def _get_tables(self, db_name: str) -> Optional[List[str]]:
+        """Query the tables of a database when no catalog is available"""
+        try:
+            self.mariadb.select_database(db_name)
+            return self.mariadb.get_tables()
+        except Exception as e:
+            self.logger.error(f"Error getting tables: {str(e)}")
+            # Fallback: try to get tables with a direct query
+            query = "SHOW TABLES"
+            result = self.mariadb.execute_query(query)
+            if result is not None and not result.empty:
+                return result.iloc[:, 0].tolist()
+            self.logger.error("Could not retrieve tables from database")
+            return None
         
     def _get_force_early_tables(self) -> List[str]:
         """Get tables that should be migrated first"""
@@ -102,6 +234,15 @@ class TableSorter:
         """
         dependencies = {table: set() for table in tables}
         
+        if self.catalog is not None:
+            for fk in self.catalog.foreign_keys(db_name):
+                if fk.referenced_database != db_name:
+                    continue
+                # Only include tables that are in our list to sort
+                if fk.table in dependencies and fk.referenced_table in dependencies:
+                    dependencies[fk.table].add(fk.referenced_table)
+            return dependencies
+        
         # Query to get foreign key relationships
         query = """
         SELECT 
@@ -127,48 +268,128 @@ class TableSorter:
         
         return dependencies
     
-    def _topological_sort(self, tables: List[str], dependencies: Dict[str, Set[str]]) -> List[str]:
+    def _build_global_dependency_graph(
+            self, tables: List[Tuple[str, str]]) -> Dict[Tuple[str, str], Set[Tuple[str, str]]]:
+        """
+        Build the dependency graph of tables from several databases.
+        
+        Returns:
+            Dictionary mapping (database, table) pairs to the pairs they depend on
+        """
+        dependencies = {table: set() for table in tables}
+        for fk in self.catalog.foreign_keys():
+            table = (fk.database, fk.table)
+            referenced_table = (fk.referenced_database, fk.referenced_table)
+            # Only include tables that are in our list to sort
+            if table in dependencies and referenced_table in dependencies:
+                dependencies[table].add(referenced_table)
+        return dependencies
+    
+    def _strongly_connected_components(self, tables: List[str],
+                                       dependencies: Dict[str, Set[str]]) -> List[List[str]]:
         """
-        Perform topological sort on tables based on their dependencies.
+        Find the strongly connected components of the dependency graph.
+        
+        Iterative version of Tarjan's algorithm, linear in the number of
+        tables and foreign keys and not limited by the recursion depth.
         
         Args:
             tables: List of table names
             dependencies: Dictionary mapping table names to sets of tables they depend on
             
         Returns:
-            List of table names in topologically sorted order
-        """
-        # Track visited and temporary marks for cycle detection
-        permanent_marks = set()
-        temporary_marks = set()
-        result = []
-        
-        def visit(table):
-            """Recursive function to visit nodes in the dependency graph"""
-            if table in permanent_marks:
-                return
-            if table in temporary_marks:
-                # Circular dependency detected
-                self.logger.warning(f"Circular dependency detected involving table: {table}")
-                return
+            List of components, dependencies before the tables depending on them
+        """
+        index: Dict[str, int] = {}
+        lowlink: Dict[str, int] = {}
+        stack: List[str] = []
+        on_stack: Set[str] = set()
+        components = []
+        
+        for root in tables:
+            if root in index:
+                continue
             
-            temporary_marks.add(table)
+            index[root] = lowlink[root] = len(index)
+            stack.append(root)
+            on_stack.add(root)
+            work = [(root, iter(dependencies.get(root, ())))]
             
-            # Visit dependencies first
-            for dependency in dependencies.get(table, set()):
-                visit(dependency)
+            while work:
+                table, edges = work[-1]
+                for dependency in edges:
+                    if dependency not in index:
+                        # Descend into the dependency, resume this table's edges afterwards
+                        index[dependency] = lowlink[dependency] = len(index)
+                        stack.append(dependency)
+                        on_stack.add(dependency)
+                        work.append((dependency, iter(dependencies.get(dependency, ()))))
+                        break
+                    if dependency in on_stack:
+                        lowlink[table] = min(lowlink[table], index[dependency])
+                else:
+                    work.pop()
+                    if work:
+                        parent = work[-1][0]
+                        lowlink[parent] = min(lowlink[parent], lowlink[table])
+                    
+                    if lowlink[table] == index[table]:
+                        component = []
+                        while True:
+                            member = stack.pop()
+                            on_stack.remove(member)
+                            component.append(member)
+                            if member == table:
+                                break
+                        components.append(sorted(component))
+        
+        return components
+    
+    def _topological_levels(self, tables: List[str],
+                            dependencies: Dict[str, Set[str]]) -> List[List[List[str]]]:
+        """
+        Group tables into dependency levels, loading each cycle as one unit.
+        
+        Foreign keys inside a cycle, including self references, are recorded
+        in deferred_foreign_keys since they cannot be satisfied table by table.
+        
+        Args:
+            tables: List of table names
+            dependencies: Dictionary mapping table names to sets of tables they depend on
+            
+        Returns:
+            List of levels, each a list of units, each a list of table names
+        """
+        components = self._strongly_connected_components(tables, dependencies)
+        component_of = {table: i for i, component in enumerate(components) for table in component}
+        
+        # Components come dependencies first, so each level is known before it is needed
+        component_levels = []
+        self.deferred_foreign_keys = []
+        for i, component in enumerate(components):
+            level = 0
+            for table in component:
+                for dependency in dependencies.get(table, ()):
+                    j = component_of[dependency]
+                    if j == i:
+                        self.deferred_foreign_keys.append((table, dependency))
+                    else:
+                        level = max(level, component_levels[j] + 1)
+            component_levels.append(level)
             
-            temporary_marks.remove(table)
-            permanent_marks.add(table)
-            result.append(table)
+            if len(component) > 1:
+                names = ", ".join(".".join(t) if isinstance(t, tuple) else t for t in component[:10])
+                if len(component) > 10:
+                    names += f" and {len(component) - 10} more"
+                self.logger.warning(f"Circular dependency between tables {names}, "
+                                    f"loading them as one unit with their foreign keys deferred")
         
-        # Visit each table
-        for table in tables:
-            if table not in permanent_marks:
-                visit(table)
+        levels: List[List[List[str]]] = [[] for _ in range(max(component_levels, default=-1) + 1)]
+        for component, level in zip(components, component_levels):
+            levels[level].append(component)
         
-        # Reverse the result to get correct order (dependencies first)
-        return list(reversed(result))
+        self.deferred_foreign_keys.sort()
+        return [sorted(level) for level in levels]
     
     def log_migration_order(self, table_order: List[str]) -> None:
         """
@@ -183,10 +404,8 @@ class TableSorter:
         if os.path.exists('maria_config.ini'):
             config.read('maria_config.ini')
         
-        # Get excluded tables from [tables] section
-        excluded_tables = []
-        if config.has_section('tables'):
-            excluded_tables = [table for table in config.options('tables')]
+        # Get excluded tables from the [tables] and [selection] sections
+        selection = SelectionRules.from_config(config)
         
         # Ensure the migration section exists
         if not config.has_section('migration'):
@@ -196,9 +415,9 @@ class TableSorter:
             config.remove_section('migration')
             config.add_section('migration')
         
-        # Add each table on a new line, excluding tables in the [tables] section
+        # Add each table on a new line, leaving out excluded tables
         for table in table_order:
-            if table not in excluded_tables:
+            if selection.include_table(table):
                 config.set('migration', table)
         
         # Write the updated config back to the file
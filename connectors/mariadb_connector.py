@@ -1,6 +1,7 @@
 import pymysql
+import pymysql.cursors
 import pandas as pd
-from typing import Dict, Any, List, Optional
+from typing import Callable, Dict, Any, Iterator, List, Optional, Union
 from models.migration import DatabaseConfig
 import pymysql
 import os
@@ -30,13 +31,15 @@ class MariaDBConnector:
         if self.connection and self.connection.open:
             self.connection.close()
             
-    def read_table(self, table_name: str, columns: List[str], chunk_size: int = 500000) -> pd.DataFrame:
+    def read_table(self, table_name: str, columns: List[str], chunk_size: int = 500000,
+                   where: Optional[str] = None) -> pd.DataFrame:
         """Read a table in chunks and return as DataFrame
         
         Args:
             table_name: Name of the table to read
             columns: List of column names to select
             chunk_size: Number of rows to fetch in each chunk
+            where: Only read the rows matching this condition
             
         Returns:
             DataFrame containing the table data
@@ -47,6 +50,8 @@ class MariaDBConnector:
         # Construct the query
         columns_str = ", ".join(columns)
         query = f"SELECT {columns_str} FROM {table_name}"
+        if where:
+            query += f" WHERE {where}"
         
         # Create cursor and execute query
         cursor = self.connection.cursor()
@@ -66,6 +71,75 @@ class MariaDBConnector:
         # Convert to DataFrame
         df = pd.DataFrame(data, columns=columns)
         return df
+
+    def iter_table_chunks(self, table_name: str, columns: List[str],
+                          chunk_size: Union[int, Callable[[], int]] = 500000,
+                          partition: Optional[str] = None, where: Optional[str] = None,
+                          limit: Optional[int] = None) -> Iterator[pd.DataFrame]:
+        """Stream a table as a sequence of DataFrames
+        
+        Uses an unbuffered server-side cursor, so at most one chunk of rows is
+        held in memory at a time.
+        
+        Args:
+            table_name: Name of the table to read
+            columns: List of column names to select
+            chunk_size: Number of rows in each DataFrame, or a function called
+                before each fetch returning it, so chunks can shrink mid-table
+            partition: Only read this partition of the table
+            where: Only read the rows matching this condition
+            limit: Read at most this many rows
+            
+        Yields:
+            DataFrame for each chunk of the table
+        """
+        if not self.connection or not self.connection.open:
+            self.connect()
+            
+        columns_str = ", ".join(f"`{column}`" for column in columns)
+        query = f"SELECT {columns_str} FROM `{table_name}`"
+        if partition:
+            query += f" PARTITION (`{partition}`)"
+        if where:
+            query += f" WHERE {where}"
+        if limit is not None:
+            query += f" LIMIT {int(limit)}"
+        
+        cursor = self.connection.cursor(pymysql.cursors.SSCursor)
+        try:
+            cursor.execute(query)
+            while True:
+                chunk = cursor.fetchmany(chunk_size() if callable(chunk_size) else chunk_size)
+                if not chunk:
+                    break
+                yield pd.DataFrame(chunk, columns=columns)
+        finally:
+            # Closing an unbuffered cursor drains any unread rows
+            cursor.close()
+        
+    def iter_rows(self, query: str, params=None) -> Iterator[tuple]:
+        """Stream the rows of a query one at a time
+        
+        Uses an unbuffered server-side cursor, for rows too large to fetch
+        many at once.
+        
+        Args:
+            query: SQL query to execute
+            params: Parameters for the query
+            
+        Yields:
+            Each result row as a tuple
+        """
+        if not self.connection or not self.connection.open:
+            self.connect()
+            
+        cursor = self.connection.cursor(pymysql.cursors.SSCursor)
+        try:
+            cursor.execute(query, params)
+            for row in cursor:
+                yield row
+        finally:
+            cursor.close()
         
     def execute_query(self, query: str, params=None) -> Optional[pd.DataFrame]:
         """Execute a SQL query and return results as DataFrame
@@ -137,6 +211,45 @@ class MariaDBConnector:
         
         return tables
 
+    def get_column_types(self, table_name: str) -> Dict[str, str]:
+        """
+        Get the columns of a table in the current database with their types
+
+        Args:
+            table_name: Name of the table
+
+        Returns:
+            Dictionary mapping column names to their MariaDB DATA_TYPE, in table order
+        """
+        query = """
+        SELECT
+            COLUMN_NAME, DATA_TYPE
+        FROM
+            INFORMATION_SCHEMA.COLUMNS
+        WHERE
+            TABLE_SCHEMA = DATABASE()
+            AND TABLE_NAME = %s
+        ORDER BY
+            ORDINAL_POSITION
+        """
+        result = self.execute_query(query, (table_name,))
+        if result is None or result.empty:
+            return {}
+
+        return dict(zip(result['COLUMN_NAME'], result['DATA_TYPE']))
+
+    def get_columns(self, table_name: str) -> List[str]:
+        """
+        Get all column names of a table in the current database
+
+        Args:
+            table_name: Name of the table
+
+        Returns:
+            List of column names in table order
+        """
+        return list(self.get_column_types(table_name))
+
     @classmethod
     def test_connection(cls):
         """Test MariaDB connection using credentials from .env file"""
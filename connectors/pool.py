@@ -0,0 +1,65 @@
+import threading
+from dataclasses import replace
+from typing import List, Optional, Tuple
+
+from connectors.mariadb_connector import MariaDBConnector
+from connectors.postgres_connector import PostgresConnector
+
+
+class ThreadConnections:
+    """
+    Opens one MariaDB and one PostgreSQL connection per worker thread.
+
+    Connections are created on a thread's first use and reused by that
+    thread afterwards. close() disconnects every connection opened.
+    """
+
+    def __init__(self, config, database: Optional[str] = None, schema: Optional[str] = None):
+        """
+        Args:
+            config: MigrationConfig with the connection settings
+            database: MariaDB database the connections are opened on, by
+                default the configured one
+            schema: PostgreSQL schema the connections load into, by default
+                the connection's own search_path
+        """
+        self.config = config
+        self.database = database
+        self.schema = schema
+        self._local = threading.local()
+        self._opened: List = []
+        self._lock = threading.Lock()
+
+    def get(self) -> Tuple[MariaDBConnector, PostgresConnector]:
+        """Get the connections of the current thread"""
+        return self.mariadb(), self.postgres()
+
+    def mariadb(self) -> MariaDBConnector:
+        """Get the MariaDB connection of the current thread"""
+        if not hasattr(self._local, "mariadb"):
+            # Each connection gets its own config, select_database() changes it
+            mariadb_config = replace(self.config.mariadb_config)
+            if self.database:
+                mariadb_config.database = self.database
+            mariadb = MariaDBConnector(mariadb_config)
+            mariadb.connect()
+            self._local.mariadb = mariadb
+            with self._lock:
+                self._opened.append(mariadb)
+        return self._local.mariadb
+
+    def postgres(self) -> PostgresConnector:
+        """Get the PostgreSQL connection of the current thread"""
+        if not hasattr(self._local, "postgres"):
+            postgres = PostgresConnector(self.config.postgres_config.connection_string, self.schema)
+            postgres.connect()
+            self._local.postgres = postgres
+            with self._lock:
+                self._opened.append(postgres)
+        return self._local.postgres
+
+    def close(self) -> None:
+        with self._lock:
+            for connector in self._opened:
+                connector.disconnect()
+            self._opened = []
@@ -1,34 +1,270 @@
+import io
+from contextlib import contextmanager
 import psycopg2
-from typing import Dict, List, Any
+import pandas as pd
+from typing import Dict, List, Any, Optional, Union
 import os
+from config.schema_parser import SchemaParser
+from core.schema_apply import SchemaApplier
 from utils.env_loader import load_environment
 
+# Marker written for NULL values in COPY data
+COPY_NULL = "\\N"
+# Bytes of a DataFrame's rows encoded at a time by CopyReader
+COPY_SLICE_BYTES = 1024 ** 2
+# Characters copy_expert asks CopyReader for at a time
+COPY_READ_SIZE = 1024 ** 2
+
+
+def _copy_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Prepare a DataFrame for COPY in CSV format
+    
+    Integer columns that pandas turned into floats because of NULLs are
+    written without a fraction again, and bytes are written in bytea hex
+    format.
+    """
+    df = df.copy()
+    for column in df.columns:
+        values = df[column]
+        if pd.api.types.is_float_dtype(values):
+            present = values.dropna()
+            if len(present) and (present % 1 == 0).all():
+                df[column] = values.astype("Int64")
+        elif values.dtype == object:
+            if values.map(lambda v: isinstance(v, (bytes, bytearray, memoryview))).any():
+                df[column] = values.map(
+                    lambda v: "\\x" + bytes(v).hex() if isinstance(v, (bytes, bytearray, memoryview)) else v)
+    return df
+
+
+class CopyReader:
+    """
+    COPY CSV data of a DataFrame, encoded a slice of rows at a time as it is read
+
+    copy_expert reads the data piece by piece, so only the slice being sent
+    is held encoded: a chunk of large values is neither doubled by the hex
+    encoding of its bytes nor copied into a buffer of the whole chunk.
+    """
+
+    def __init__(self, df: pd.DataFrame, slice_bytes: int = COPY_SLICE_BYTES):
+        self.df = df
+        row_bytes = df.memory_usage(deep=True, index=False).sum() / max(len(df), 1)
+        self.rows_per_slice = max(1, int(slice_bytes // max(row_bytes, 1)))
+        self._position = 0
+        self._text = ""
+        self._offset = 0
+
+    def read(self, size: int = -1) -> str:
+        """Read up to size characters, or everything left when size is negative"""
+        if size is None or size < 0:
+            parts = [self._text[self._offset:]]
+            while self._position < len(self.df):
+                parts.append(self._encode_slice())
+            self._text, self._offset = "", 0
+            return "".join(parts)
+
+        if self._offset >= len(self._text):
+            self._text = self._encode_slice() if self._position < len(self.df) else ""
+            self._offset = 0
+        data = self._text[self._offset:self._offset + size]
+        self._offset += len(data)
+        return data
+
+    def _encode_slice(self) -> str:
+        part = self.df.iloc[self._position:self._position + self.rows_per_slice]
+        self._position += len(part)
+        return _copy_frame(part).to_csv(index=False, header=False, na_rep=COPY_NULL)
+
+
+def encode_copy(df: pd.DataFrame) -> io.StringIO:
+    """Encode a DataFrame as COPY CSV data, ready to be read from the start"""
+    return io.StringIO(CopyReader(df).read())
+
 
 class PostgresConnector:
-    def __init__(self, connection_string: str):
+    def __init__(self, connection_string: str, schema: Optional[str] = None):
+        """
+        Args:
+            connection_string: libpq connection string
+            schema: Schema unqualified table names resolve to, by default the
+                connection's own search_path
+        """
         self.connection_string = connection_string
+        self.schema = schema
         self.connection = None
+        # Set inside transaction(), whose block commits or rolls back as a whole
+        self._in_transaction = False
         
     def connect(self) -> None:
         """Establish connection to PostgreSQL"""
         self.connection = psycopg2.connect(self.connection_string)
+        if self.schema:
+            self._set_search_path(self.schema)
+        
+    def _set_search_path(self, schema: Optional[str]) -> None:
+        with self.connection.cursor() as cursor:
+            if schema:
+                cursor.execute(f'SET search_path TO "{schema}"')
+            else:
+                cursor.execute("RESET search_path")
+        self.connection.commit()
+        
+    def select_schema(self, schema: Optional[str], create: bool = False) -> None:
+        """
+        Switch the schema unqualified table names resolve to
+        
+        Args:
+            schema: Schema to switch to, None for the connection's default
+            create: Create the schema first if it does not exist
+        """
+        if schema and create:
+            self.execute_query(f'CREATE SCHEMA IF NOT EXISTS "{schema}"')
+        if schema == self.schema:
+            return
+        self.schema = schema
+        # A connection opened later sets the schema when it connects
+        if self.connection and not self.connection.closed:
+            self._set_search_path(schema)
+        
+    def _commit(self) -> None:
+        if not self._in_transaction:
+            self.connection.commit()
+        
+    def _rollback(self) -> None:
+        if not self._in_transaction:
+            self.connection.rollback()
+        
+    @contextmanager
+    def transaction(self):
+        """Run the queries and copies of a block in one transaction
+        
+        Nothing is committed until the block ends, and everything is rolled
+        back if it raises.
+        """
+        if not self.connection or self.connection.closed:
+            self.connect()
+        self._in_transaction = True
+        try:
+            yield self
+            self.connection.commit()
+        except BaseException:
+            self.connection.rollback()
+            raise
+        finally:
+            self._in_transaction = False
         
     def disconnect(self) -> None:
         """Close the database connection"""
         if self.connection and not self.connection.closed:
             self.connection.close()
+
+    def execute_query(self, query: str, params=None) -> Optional[List[tuple]]:
+        """Execute a SQL query and return its rows
+
+        Args:
+            query: SQL query to execute
+            params: Parameters for the query
+
+        Returns:
+            List of result rows or None for statements that return no data
+        """
+        if not self.connection or self.connection.closed:
+            self.connect()
+
+        try:
+            with self.connection.cursor() as cursor:
+                cursor.execute(query, params)
+                rows = cursor.fetchall() if cursor.description else None
+            self._commit()
+        except Exception:
+            self._rollback()
+            raise
+
+        return rows
+
+    def execute_transaction(self, statements: List[str]) -> None:
+        """Execute several statements in a single transaction
+        
+        Args:
+            statements: SQL statements to execute in order
+        """
+        if not statements:
+            return
+        if not self.connection or self.connection.closed:
+            self.connect()
+
+        try:
+            with self.connection.cursor() as cursor:
+                for statement in statements:
+                    cursor.execute(statement)
+            self._commit()
+        except Exception:
+            self._rollback()
+            raise
+
+    def create_tables(self, schema_definitions: Dict[str, Any], workers: int = 4) -> List[str]:
+        """Create tables based on schema definitions
+        
+        Only the DDL needed to bring the target in line with the definitions
+        is executed, so running it against a provisioned target is cheap.
+        Only tables, columns and primary keys are created; indexes, unique
+        constraints and foreign keys are left to apply_constraints.
+        
+        Returns:
+            The statements that were executed
+        """
+        parser = SchemaParser.from_definitions(schema_definitions)
+        return SchemaApplier(self, parser, workers).apply()
+        
+    def copy_dataframe(self, table_name: str, df: pd.DataFrame) -> int:
+        """Load a DataFrame into a table with COPY
+        
+        Args:
+            table_name: Target table, created with an unquoted name
+            df: Rows to load, with columns named as in the target table
             
-    def create_tables(self, schema_definitions: Dict[str, Any]) -> None:
-        """Create tables based on schema definitions"""
-        pass
+        Returns:
+            Number of rows loaded
+        """
+        if df.empty:
+            return 0
+        if not self.connection or self.connection.closed:
+            self.connect()
         
-    def insert_data(self, table_name: str, data: List[Dict[str, Any]], batch_size: int = 100000) -> bool:
+        columns = ", ".join(f'"{column.lower()}"' for column in df.columns)
+        query = f"""COPY "{table_name.lower()}" ({columns}) FROM STDIN WITH (FORMAT csv, NULL '{COPY_NULL}')"""
+        try:
+            with self.connection.cursor() as cursor:
+                cursor.copy_expert(query, CopyReader(df), size=COPY_READ_SIZE)
+            self._commit()
+        except Exception:
+            self._rollback()
+            raise
+        
+        return len(df)
+        
+    def insert_data(self, table_name: str, data: Union[List[Dict[str, Any]], pd.DataFrame],
+                    batch_size: int = 100000) -> bool:
         """Insert data into a table"""
-        pass
+        if data is None:
+            return False
+        df = data if isinstance(data, pd.DataFrame) else pd.DataFrame(data)
+        for start in range(0, len(df), batch_size):
+            self.copy_dataframe(table_name, df.iloc[start:start + batch_size])
+        return True
+        
+    def apply_constraints(self, schema_definitions: Dict[str, Any], workers: int = 4) -> List[str]:
+        """Add the constraints of the schema definitions that need the data loaded
+        
+        Indexes and unique constraints are built once the rows are in, which
+        is cheaper than maintaining them during COPY. Foreign keys follow, so
+        tables referencing each other, or themselves, load in any order.
         
-    def apply_constraints(self, constraints_config: Dict[str, Any]) -> None:
-        """Apply database constraints"""
-        pass
+        Returns:
+            The statements that were executed
+        """
+        parser = SchemaParser.from_definitions(schema_definitions)
+        return SchemaApplier(self, parser, workers).apply_constraints()
 
     @classmethod
     def test_connection(cls):
@@ -0,0 +1,73 @@
+import json
+import logging
+import os
+import threading
+from typing import Dict, Any, Optional
+
+from utils.files import write_json_atomic
+
+
+class CheckpointStore:
+    """
+    Records which partitions of a table have been loaded.
+
+    A table's entry is created when its first partition finishes and removed
+    once the whole table is loaded, so the file only holds the progress of
+    interrupted runs. A rerun skips the partitions already loaded as long as
+    the table definition has not changed in the meantime.
+    """
+
+    def __init__(self, path: str = ".migres/checkpoints.json"):
+        self.path = path
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._data = self._read()
+
+    def _read(self) -> Dict[str, Any]:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"Ignoring unreadable checkpoint file {self.path}: {str(e)}")
+            return {}
+
+    def _entry(self, db_name: str, table_name: str, fingerprint: Optional[str]) -> Dict[str, Any]:
+        key = f"{db_name}.{table_name}"
+        entry = self._data.get(key)
+        if entry is None or entry["fingerprint"] != fingerprint:
+            entry = self._data[key] = {"fingerprint": fingerprint, "partitions": {}}
+        return entry
+
+    def completed_partitions(self, db_name: str, table_name: str,
+                             fingerprint: Optional[str] = None) -> Dict[str, int]:
+        """Get the loaded partitions of a table with their row counts
+
+        Args:
+            db_name: Database of the table
+            table_name: Name of the table
+            fingerprint: Definition fingerprint of the table; checkpoints
+                recorded for another fingerprint are discarded
+
+        Returns:
+            Dictionary mapping partition names to the number of rows loaded
+        """
+        with self._lock:
+            entry = self._data.get(f"{db_name}.{table_name}")
+            if entry is None or entry["fingerprint"] != fingerprint:
+                return {}
+            return dict(entry["partitions"])
+
+    def complete_partition(self, db_name: str, table_name: str, partition: str, rows: int,
+                           fingerprint: Optional[str] = None) -> None:
+        """Record that a partition has been loaded completely"""
+        with self._lock:
+            self._entry(db_name, table_name, fingerprint)["partitions"][partition] = rows
+            write_json_atomic(self.path, self._data)
+
+    def complete_table(self, db_name: str, table_name: str) -> None:
+        """Forget the checkpoints of a table once all of it has been loaded"""
+        with self._lock:
+            if self._data.pop(f"{db_name}.{table_name}", None) is not None:
+                write_json_atomic(self.path, self._data)
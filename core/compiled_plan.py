@@ -0,0 +1,233 @@
+import hashlib
+import logging
+import os
+import pickle
+import tempfile
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from config.sampling import ReferentialSampler
+from config.table_sorter import TableSorter
+from core.data_processor import Kernel, compile_kernels
+
+# Bumped whenever the layout of CompiledPlan changes, so older artifacts are recompiled
+PLAN_VERSION = 4
+
+# Configuration files a plan is compiled from
+CONFIG_FILES = ("maria_config.ini", "type_config.ini", "uuid_config.ini", "table_schema.ini", "constraints.ini")
+
+Table = Tuple[str, str]
+
+
+def config_digest(paths=CONFIG_FILES, databases: Optional[List[str]] = None) -> str:
+    """
+    Digest of the configuration files and the migrated databases
+
+    Args:
+        paths: Configuration files, missing files are skipped
+        databases: Names of the migrated databases
+
+    Returns:
+        str: Hex digest that changes whenever any of the files changes
+    """
+    digest = hashlib.sha256(repr(list(databases or [])).encode())
+    for path in paths:
+        digest.update(path.encode())
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                digest.update(f.read())
+    return digest.hexdigest()
+
+
+def catalog_fingerprints(catalog) -> Optional[Dict[Table, str]]:
+    """Definition fingerprints of the catalog's tables, None when they are unknown"""
+    return dict(catalog.fingerprints) if catalog.fingerprints else None
+
+
+@dataclass(frozen=True)
+class CompiledTable:
+    """An exported table with its columns, conversions and row filter"""
+    database: str
+    name: str
+    columns: Tuple[str, ...]
+    kernels: Tuple[Kernel, ...]
+    where: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class CompiledPlan:
+    """
+    Everything a run derives from the configuration and the source catalog
+
+    Built once by PlanCompiler and then only read, so worker threads share
+    it without locking. The plan is saved as a pickle under .migres and
+    reused by every run until the configuration or the schema changes.
+    """
+    version: int
+    config_digest: str
+    catalog_fingerprints: Optional[Dict[Table, str]]
+    databases: Tuple[str, ...]
+    tables: Dict[Table, CompiledTable]
+    levels: Tuple[Tuple[Tuple[Table, ...], ...], ...]
+    deferred_foreign_keys: Tuple = ()
+    warnings: Tuple[str, ...] = field(default=())
+    # Share of the root tables' rows sampled, None for a full migration
+    sample: Optional[float] = None
+
+    def table(self, db_name: str, table_name: str) -> Optional[CompiledTable]:
+        return self.tables.get((db_name, table_name))
+
+    def kernels(self, db_name: Optional[str], table_name: str) -> Optional[Tuple[Kernel, ...]]:
+        """Conversions of a table
+
+        Tables of the same name in different databases can have different
+        columns, so a table is looked up by database too. Without a database
+        the first table of that name is used.
+        """
+        if db_name is not None:
+            table = self.tables.get((db_name, table_name))
+            return table.kernels if table else None
+        for table in self.tables.values():
+            if table.name == table_name:
+                return table.kernels
+        return None
+
+    def is_current(self, digest: str, catalog, sample: Optional[float] = None) -> bool:
+        """
+        Check the plan was compiled from the same configuration, schema and sample rate
+
+        A catalog without fingerprints, which is not loaded through the
+        catalog cache, can't be compared, so the plan is then always stale.
+        """
+        fingerprints = catalog_fingerprints(catalog)
+        return (self.version == PLAN_VERSION and self.config_digest == digest and self.sample == sample
+                and fingerprints is not None and self.catalog_fingerprints == fingerprints)
+
+    def save(self, path: str) -> None:
+        """Write the plan so readers never see a partially written file"""
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    @classmethod
+    def load(cls, path: str) -> Optional["CompiledPlan"]:
+        """
+        Read a saved plan
+
+        The plan is a pickle written by this tool under .migres; only load
+        plans from a directory you trust.
+
+        Returns:
+            The plan, or None if it is missing, unreadable or from another version
+        """
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "rb") as f:
+                plan = pickle.load(f)
+        except Exception as e:
+            logging.getLogger(__name__).warning(f"Ignoring unreadable plan {path}: {str(e)}")
+            return None
+        if not isinstance(plan, cls) or plan.version != PLAN_VERSION:
+            return None
+        return plan
+
+
+class PlanCompiler:
+    """
+    Compiles the configuration files and the source catalog into a CompiledPlan
+
+    The include and exclude settings, column lists, type and UUID conversions
+    and the table order are resolved once, and every setting naming a table
+    or column that is not in the catalog is reported.
+    """
+
+    def __init__(self, manager):
+        """
+        Args:
+            manager: MigrationManager holding the configuration and catalog
+        """
+        self.manager = manager
+        self.warnings: List[str] = []
+
+    def _check_sections(self, name: str, sections: Dict[str, Dict[str, str]],
+                        columns: Dict[str, set]) -> None:
+        selection = self.manager.selection
+        for table_name, options in sections.items():
+            if table_name not in columns:
+                # Excluded tables are left out of the catalog
+                if selection.include_table(table_name):
+                    self.warnings.append(f"{name}: unknown table [{table_name}]")
+                continue
+            for column in options:
+                if column.lower() not in columns[table_name]:
+                    self.warnings.append(f"{name}: unknown column {table_name}.{column}")
+
+    def _validate(self, catalog) -> None:
+        """Report settings naming tables or columns that are not in the catalog"""
+        config = self.manager.config
+        columns: Dict[str, set] = {}
+        for table in catalog.tables():
+            columns.setdefault(table.name, set()).update(c.lower() for c in table.column_names)
+
+        self._check_sections("type_config.ini", config.type_conversions, columns)
+        self._check_sections("uuid_config.ini", config.uuid_config, columns)
+
+        # Patterns may match nothing, and excluded tables are not in the catalog
+        selection = self.manager.selection
+        lowered = {table_name.lower(): names for table_name, names in columns.items()}
+        for name, included in selection.tables.names.items():
+            if included and name not in lowered:
+                self.warnings.append(f"maria_config.ini: unknown table {name} in [tables]")
+        for key in selection.columns.names:
+            table_name, _, column = key.partition(".")
+            if table_name in lowered and column not in lowered[table_name]:
+                self.warnings.append(f"maria_config.ini: unknown column {key} in [columns]")
+
+    def compile(self) -> CompiledPlan:
+        """Resolve the configuration against the catalog"""
+        manager = self.manager
+        catalog = manager._get_catalog()
+        self.warnings = []
+        self._validate(catalog)
+
+        sorter = TableSorter(manager.mariadb, manager.postgres, manager.maria_config, catalog,
+                             manager.catalog_cache)
+        levels = manager._migration_levels(sorter)
+
+        manager.row_filters.validate(catalog)
+        cycles = set(sorter.deferred_foreign_keys)
+        filters = manager.row_filters.resolve(catalog, cycles)
+        if manager.sample is not None:
+            seed = manager.maria_config.getint("sample", "seed", fallback=0)
+            filters = ReferentialSampler(manager.sample, seed).resolve(catalog, filters, cycles)
+
+        config = manager.config
+        tables = {}
+        for level in levels:
+            for unit in level:
+                for db_name, table_name in unit:
+                    columns = manager._get_columns_to_export(table_name, db_name)
+                    kernels = compile_kernels(table_name, columns, config.type_conversions, config.uuid_config,
+                                              catalog.column_types(db_name, table_name))
+                    tables[(db_name, table_name)] = CompiledTable(db_name, table_name, tuple(columns), kernels,
+                                                                  filters.get((db_name, table_name)))
+
+        return CompiledPlan(
+            version=PLAN_VERSION,
+            config_digest=config_digest(databases=config.mariadb_databases),
+            catalog_fingerprints=catalog_fingerprints(catalog),
+            databases=tuple(config.mariadb_databases),
+            tables=tables,
+            levels=tuple(tuple(tuple(unit) for unit in level) for level in levels),
+            deferred_foreign_keys=tuple(sorter.deferred_foreign_keys),
+            warnings=tuple(self.warnings),
+            sample=manager.sample,
+        )
@@ -1,24 +1,312 @@
+import json
+import logging
+import re
+import numpy as np
 import pandas as pd
-import uuid
-from typing import Dict, Any, List
+from typing import Dict, Any, Callable, List, Optional, Tuple
 from config.config import ConfigManager
+from core.uuid_generator import uuid_series
+
+try:
+    import orjson
+except ImportError:  # orjson is an optional dependency, the json module is used without it
+    orjson = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.json as pa_json
+except ImportError:  # without pyarrow every JSON document is parsed on its own
+    pa = None
+    pa_json = None
+
+# A conversion applied to one column: (column, kernel name, argument)
+Kernel = Tuple[str, str, Optional[str]]
+
+# MariaDB writes invalid dates as zeros, which PostgreSQL rejects
+ZERO_DATES = {"0000-00-00", "0000-00-00 00:00:00"}
+DATE_TYPES = {"date", "datetime", "timestamp"}
+
+
+def _zero_date(values: pd.Series, argument: Optional[str]) -> pd.Series:
+    if values.dtype != object:
+        return values
+    return values.mask(values.isin(ZERO_DATES))
+
+
+def _boolean(values: pd.Series, argument: Optional[str]) -> pd.Series:
+    return pd.to_numeric(values, errors="coerce").astype("Int64").astype("boolean")
+
+
+def _float(values: pd.Series, argument: Optional[str]) -> pd.Series:
+    return pd.to_numeric(values, errors="coerce").astype(float)
+
+
+def _integer(values: pd.Series, argument: Optional[str]) -> pd.Series:
+    return pd.to_numeric(values, errors="coerce").astype("Int64")
+
+
+def _timestamp(values: pd.Series, argument: Optional[str]) -> pd.Series:
+    return pd.to_datetime(values, errors="coerce")
+
+
+def _text(values: pd.Series, argument: Optional[str]) -> pd.Series:
+    return values.where(values.isna(), values.astype(str))
+
+
+def _uuid(values: pd.Series, argument: Optional[str]) -> pd.Series:
+    return uuid_series(values, argument)
+
+
+def _reject_constant(name: str):
+    raise ValueError(f"{name} is not valid JSON")
+
+
+# \u0000 escapes not preceded by an escaped backslash; jsonb can't store NUL
+_NUL_ESCAPE = re.compile(r"(?<!\\)((?:\\\\)*)\\u0000")
+
+# Batches pyarrow's reader can't settle: NaN and Infinity are accepted by
+# pyarrow but not by jsonb, and a carriage return could split a document
+_BULK_UNSAFE = ("NaN", "Infinity", "\r")
+# Documents checked by one read of pyarrow's JSON reader
+_BULK_BATCH = 4096
+if pa_json is not None:
+    # An empty schema ignoring every field validates without building columns
+    _BULK_PARSE_OPTIONS = pa_json.ParseOptions(explicit_schema=pa.schema([]), unexpected_field_behavior="ignore")
+
+
+def _bulk_valid(text: str, count: int) -> bool:
+    """Check count JSON objects, one per line of text, in one pass of pyarrow's JSON reader"""
+    # Each document must be on a line of its own
+    if text.count("\n") != count - 1 or any(unsafe in text for unsafe in _BULK_UNSAFE):
+        return False
+    try:
+        data = text.encode("utf-8")
+        # A single block, so no document is too large to fit one
+        options = pa_json.ReadOptions(use_threads=False, block_size=max(len(data), 1 << 20))
+        table = pa_json.read_json(pa.BufferReader(data), read_options=options, parse_options=_BULK_PARSE_OPTIONS)
+    except (pa.ArrowException, UnicodeEncodeError):
+        return False
+    # Two objects on one line are read as two rows
+    return table.num_rows == count
+
+
+def _validate_one(value: Any, loads: Callable[[str], Any]) -> Tuple[Optional[str], Optional[str]]:
+    """Parse one document, returning it as text and the error if it is invalid"""
+    try:
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            value = bytes(value).decode("utf-8")
+        loads(value)
+    except (ValueError, TypeError) as e:
+        return None, str(e) or type(e).__name__
+    return value, None
+
+
+def validate_json(values: pd.Series) -> Tuple[pd.Series, pd.Series]:
+    """
+    Check a column of JSON documents for loading into jsonb
+
+    Documents are only parsed to validate them: valid documents are passed
+    on as the text that was read, and PostgreSQL builds the jsonb. Bytes are
+    decoded, and \\u0000 escapes, which jsonb rejects, are removed.
+
+    Columns of text are checked in batches by pyarrow's JSON reader, which
+    builds no Python objects. It only reads single line objects, so every
+    document of a batch it fails, or that holds anything else, is parsed
+    again one at a time with orjson when it is installed, and the json
+    module otherwise, which also gives the error.
+
+    Returns:
+        The documents, with None for the invalid ones, and the error of each
+        invalid document, None for the others
+    """
+    loads = orjson.loads if orjson is not None else \
+        (lambda document: json.loads(document, parse_constant=_reject_constant))
+    documents = values.to_numpy(dtype=object, copy=True)
+    documents[values.isna().to_numpy()] = None
+    errors = np.full(len(documents), None, dtype=object)
+    present = np.flatnonzero(values.notna().to_numpy())
+
+    single = []
+    escaped = False
+    if pa_json is not None and pd.api.types.infer_dtype(documents, skipna=True) == "string":
+        for start in range(0, len(present), _BULK_BATCH):
+            batch = present[start:start + _BULK_BATCH]
+            text = "\n".join(documents[batch].tolist())
+            escaped = escaped or "\\u0000" in text
+            if not _bulk_valid(text, len(batch)):
+                single.append(batch)
+    else:
+        # Bytes and mixed columns are decoded and parsed one document at a time
+        single.append(present)
+
+    for position in np.concatenate(single).tolist() if single else []:
+        documents[position], errors[position] = _validate_one(documents[position], loads)
+        escaped = escaped or (documents[position] is not None and "\\u0000" in documents[position])
+
+    result = pd.Series(documents, index=values.index, dtype=object)
+    if escaped:
+        nul = result.str.contains("\\u0000", regex=False, na=False)
+        result[nul] = result[nul].str.replace(_NUL_ESCAPE, r"\1", regex=True)
+    return result, pd.Series(errors, index=values.index, dtype=object)
+
+
+def _jsonb(values: pd.Series, argument: Optional[str]) -> pd.Series:
+    return validate_json(values)[0]
+
+
+# Conversion kernels by name. Compiled plans refer to kernels by name, so
+# they can be pickled and shared.
+KERNELS: Dict[str, Callable[[pd.Series, Optional[str]], pd.Series]] = {
+    "zero_date": _zero_date,
+    "boolean": _boolean,
+    "float": _float,
+    "integer": _integer,
+    "timestamp": _timestamp,
+    "text": _text,
+    "uuid": _uuid,
+    "jsonb": _jsonb,
+}
+
+# Kernel of each type_config.ini type. Types without a kernel are loaded as
+# they are read and cast by PostgreSQL.
+TYPE_KERNELS = {
+    "boolean": "boolean", "bool": "boolean",
+    "float": "float", "real": "float", "double precision": "float",
+    "integer": "integer", "int": "integer", "bigint": "integer", "smallint": "integer",
+    "timestamp": "timestamp", "timestamptz": "timestamp", "date": "timestamp",
+    "text": "text", "varchar": "text",
+    "uuid": "uuid",
+    "jsonb": "jsonb", "json": "jsonb",
+}
+
+# Processing step each kernel belongs to
+_STEPS = {"zero_date": "clean", "uuid": "uuids", "jsonb": "json"}
+
+
+def compile_kernels(table_name: str, columns: List[str], type_config: Dict[str, Any],
+                    uuid_config: Dict[str, Any], source_types: Optional[Dict[str, str]] = None) -> Tuple[Kernel, ...]:
+    """
+    Work out the conversions of a table's columns
+
+    Args:
+        table_name: Name of the table
+        columns: Exported columns
+        type_config: Target type of each column, by table, from type_config.ini
+        uuid_config: UUID entity of each column, by table, from uuid_config.ini
+        source_types: MariaDB DATA_TYPE of each column, if known
+
+    Returns:
+        Kernels in the order they are applied
+    """
+    types = {k.lower(): str(v).strip().lower() for k, v in (type_config.get(table_name) or {}).items()}
+    entities = {k.lower(): str(v).strip() for k, v in (uuid_config.get(table_name) or {}).items()}
+    source_types = source_types or {}
+
+    kernels: List[Kernel] = []
+    for column in columns:
+        if source_types.get(column) in DATE_TYPES:
+            kernels.append((column, "zero_date", None))
+    for column in columns:
+        kernel = TYPE_KERNELS.get(types.get(column.lower(), ""))
+        if kernel is None and column.lower() not in types and source_types.get(column) == "json":
+            # MariaDB JSON columns become JSONB unless type_config.ini says otherwise
+            kernel = "jsonb"
+        if kernel and kernel != "uuid":
+            kernels.append((column, kernel, None))
+    for column in columns:
+        entity = entities.get(column.lower())
+        if entity or types.get(column.lower()) == "uuid":
+            # A uuid column without an entity gets its own table as entity
+            kernels.append((column, "uuid", entity or table_name))
+    return tuple(kernels)
+
 
 class DataProcessor:
-    def __init__(self, config_manager: ConfigManager):
+    def __init__(self, config_manager: ConfigManager, plan=None, rejects=None):
         self.config_manager = config_manager
-        
-    def convert_types(self, df: pd.DataFrame, table_name: str) -> pd.DataFrame:
+        # Compiled plan holding the kernels of every table, see core.compiled_plan
+        self.plan = plan
+        # RejectWriter receiving rows with invalid JSON, which are otherwise only logged
+        self.rejects = rejects
+        self.logger = logging.getLogger(__name__)
+        self._kernels: Dict[Tuple[str, Tuple[str, ...]], Tuple[Kernel, ...]] = {}
+
+    def _config_sections(self, name: str) -> Dict[str, Any]:
+        config = self.config_manager.get_config(name) if self.config_manager else None
+        return {section: dict(config[section]) for section in config.sections()} if config else {}
+
+    def kernels(self, table_name: str, columns: List[str], db_name: Optional[str] = None) -> Tuple[Kernel, ...]:
+        """Get the kernels of a table, from the compiled plan when there is one"""
+        if self.plan is not None:
+            kernels = self.plan.kernels(db_name, table_name)
+            if kernels is not None:
+                return kernels
+
+        key = (table_name, tuple(columns))
+        if key not in self._kernels:
+            self._kernels[key] = compile_kernels(table_name, list(columns), self._config_sections("type_config"),
+                                                 self._config_sections("uuid_config"))
+        return self._kernels[key]
+
+    def _apply(self, df: pd.DataFrame, table_name: str, step: str, db_name: Optional[str] = None) -> pd.DataFrame:
+        """Run the kernels of one step, replacing the converted columns of df"""
+        for column, name, argument in self.kernels(table_name, list(df.columns), db_name):
+            if _STEPS.get(name, "types") == step and column in df.columns:
+                df[column] = KERNELS[name](df[column], argument)
+        return df
+
+    def convert_types(self, df: pd.DataFrame, table_name: str, db_name: Optional[str] = None) -> pd.DataFrame:
         """Convert column types based on configuration"""
-        pass
-        
-    def convert_uuids(self, df: pd.DataFrame, table_name: str) -> pd.DataFrame:
+        return self._apply(df, table_name, "types", db_name)
+
+    def convert_json(self, df: pd.DataFrame, table_name: str, db_name: Optional[str] = None) -> pd.DataFrame:
+        """Validate jsonb columns, leaving out the rows with invalid documents
+
+        A chunk is never failed by bad JSON: the rows are written to the
+        reject file, and the rest of the chunk is loaded.
+        """
+        results = {
+            column: validate_json(df[column])
+            for column, name, _ in self.kernels(table_name, list(df.columns), db_name)
+            if _STEPS.get(name) == "json" and column in df.columns
+        }
+        rejected = pd.Series(False, index=df.index)
+        reject_columns = pd.Series(None, index=df.index, dtype=object)
+        reject_errors = pd.Series(None, index=df.index, dtype=object)
+        for column, (_, errors) in results.items():
+            # A row is reported once, for its first invalid column
+            invalid = errors.notna() & ~rejected
+            reject_columns[invalid] = column
+            reject_errors[invalid] = errors[invalid]
+            rejected |= invalid
+
+        if rejected.any():
+            if self.rejects is not None:
+                self.rejects.write(db_name, table_name, df[rejected], reject_columns[rejected].tolist(),
+                                   reject_errors[rejected].tolist())
+            else:
+                self.logger.warning(f"Left out {int(rejected.sum())} rows of {table_name} with invalid JSON")
+        for column, (documents, _) in results.items():
+            df[column] = documents
+        return df[~rejected] if rejected.any() else df
+
+    def convert_uuids(self, df: pd.DataFrame, table_name: str, db_name: Optional[str] = None) -> pd.DataFrame:
         """Convert IDs to UUIDs"""
-        pass
-        
-    def clean_data(self, df: pd.DataFrame, table_name: str) -> pd.DataFrame:
+        return self._apply(df, table_name, "uuids", db_name)
+
+    def clean_data(self, df: pd.DataFrame, table_name: str, db_name: Optional[str] = None) -> pd.DataFrame:
         """Clean and prepare data for insertion"""
-        pass
-        
-    def process_table_data(self, table_name: str, df: pd.DataFrame) -> List[Dict[str, Any]]:
-        """Full processing pipeline for table data"""
-        pass
\ No newline at end of file
+        return self._apply(df, table_name, "clean", db_name)
+
+    def process_table_data(self, table_name: str, df: pd.DataFrame, db_name: Optional[str] = None) -> pd.DataFrame:
+        """Full processing pipeline for table data
+
+        The steps convert columns in place, so they work on a copy of the
+        chunk: the caller's chunk is also written to Parquet on another
+        thread while it is processed, and must keep the values as read.
+        """
+        df = df.copy()
+        df = self.clean_data(df, table_name, db_name)
+        df = self.convert_types(df, table_name, db_name)
+        df = self.convert_json(df, table_name, db_name)
+        return self.convert_uuids(df, table_name, db_name)
@@ -0,0 +1,299 @@
+import json
+import os
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional
+from urllib.parse import quote
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow is an optional dependency
+    pa = None
+    pq = None
+
+# Hive's name for the partition holding NULL partition keys
+NULL_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+
+PARTITION_GRANULARITIES = {
+    "year": "%Y",
+    "month": "%Y-%m",
+    "day": "%Y-%m-%d",
+}
+
+# MariaDB DATA_TYPEs by the Arrow type family they are exported as
+INTEGER_TYPES = {"tinyint", "smallint", "mediumint", "int", "integer", "bigint", "year"}
+FLOAT_TYPES = {"float", "double", "real"}
+STRING_TYPES = {"char", "varchar", "tinytext", "text", "mediumtext", "longtext", "enum", "set", "json"}
+BINARY_TYPES = {"binary", "varbinary", "tinyblob", "blob", "mediumblob", "longblob", "bit"}
+TEMPORAL_TYPES = {"date", "datetime", "timestamp"}
+
+
+def parquet_available() -> bool:
+    """Whether pyarrow could be imported, which the Parquet export needs"""
+    return pa is not None
+
+
+def arrow_type(column_type: str):
+    """
+    Arrow type a MariaDB column is exported as
+
+    Args:
+        column_type: The column's COLUMN_TYPE, such as "bigint(20) unsigned"
+
+    Returns:
+        The Arrow type, or None for types left to be inferred from the data
+    """
+    column_type = column_type.strip().lower()
+    data_type = column_type.split("(")[0].split()[0] if column_type else ""
+    if data_type in INTEGER_TYPES:
+        return pa.uint64() if data_type == "bigint" and "unsigned" in column_type else pa.int64()
+    if data_type in FLOAT_TYPES:
+        return pa.float64()
+    if data_type in ("decimal", "numeric"):
+        precision, _, scale = column_type.partition("(")[2].partition(")")[0].partition(",")
+        precision = int(precision) if precision.strip().isdigit() else 10
+        scale = int(scale) if scale.strip().isdigit() else 0
+        # Wider decimals than Arrow's 128 bits are kept as their text
+        return pa.decimal128(precision, scale) if precision <= 38 else pa.string()
+    if data_type == "date":
+        return pa.date32()
+    if data_type in ("datetime", "timestamp"):
+        return pa.timestamp("us")
+    if data_type == "time":
+        return pa.duration("us")
+    if data_type in STRING_TYPES:
+        return pa.string()
+    if data_type in BINARY_TYPES:
+        return pa.binary()
+    return None
+
+
+class _PartitionFile:
+    """An open Parquet file of one partition"""
+
+    def __init__(self, path: str, relative_path: str, partition: Optional[str]):
+        self.path = path
+        self.relative_path = relative_path
+        self.partition = partition
+        self.writer = None
+        self.rows = 0
+        self.row_groups = 0
+
+
+class ParquetExporter:
+    """
+    Streams the chunks of one table into partitioned Parquet files.
+
+    Rows are buffered per partition and flushed as one row group once a
+    partition has row_group_size rows, or earlier when the total buffered rows
+    reach max_buffered_rows, so memory stays bounded by roughly one chunk.
+    Files roll over after max_rows_per_file rows and a _manifest.json listing
+    every file is written on close.
+
+    Column types come from the source catalog when column_types is given,
+    since a chunk can't tell the type of a column that is NULL throughout
+    it; only columns without a known type are inferred from the first chunk.
+    """
+
+    def __init__(self, directory: str, table_name: str, partition_by: Optional[str] = None,
+                 row_group_size: int = 100000, max_rows_per_file: int = 1000000,
+                 max_buffered_rows: int = 500000, compression: str = "zstd",
+                 max_open_files: int = 64, column_types: Optional[Dict[str, str]] = None):
+        if pa is None:
+            raise ImportError("Parquet export requires pyarrow: pip install pyarrow")
+
+        self.table_name = table_name
+        self.directory = os.path.join(directory, table_name)
+        self.row_group_size = row_group_size
+        self.max_rows_per_file = max_rows_per_file
+        self.max_buffered_rows = max_buffered_rows
+        self.compression = compression
+        self.max_open_files = max_open_files
+        # MariaDB COLUMN_TYPE of each column, see arrow_type
+        self.column_types = column_types or {}
+
+        # partition_by is "column" or "column:granularity". A plain column is
+        # moved into the directory name as Hive does; a derived key such as
+        # created_at_month gets its own name and the column stays in the data.
+        self.partition_column, self.partition_key, self.partition_format = None, None, None
+        if partition_by:
+            column, _, granularity = partition_by.partition(":")
+            self.partition_column = self.partition_key = column.strip()
+            granularity = granularity.strip()
+            if granularity:
+                if granularity not in PARTITION_GRANULARITIES:
+                    raise ValueError(f"Unknown partition granularity '{granularity}', "
+                                     f"expected one of {', '.join(PARTITION_GRANULARITIES)}")
+                self.partition_format = PARTITION_GRANULARITIES[granularity]
+                self.partition_key = f"{self.partition_column}_{granularity}"
+
+        self.schema = None
+        self._buffers: Dict[Optional[str], List[pd.DataFrame]] = {}
+        self._buffered_rows: Dict[Optional[str], int] = {}
+        self._open_files: "OrderedDict[Optional[str], _PartitionFile]" = OrderedDict()
+        self._file_counts: Dict[Optional[str], int] = {}
+        self._closed_files: List[_PartitionFile] = []
+
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _partition_keys(self, df: pd.DataFrame) -> pd.Series:
+        """Compute the partition value of every row of a chunk"""
+        values = df[self.partition_column]
+        if self.partition_format:
+            values = pd.to_datetime(values, errors="coerce").dt.strftime(self.partition_format)
+        return values.astype(object).where(values.notna(), NULL_PARTITION).astype(str)
+
+    def _arrow_schema(self, df: pd.DataFrame):
+        """Build the file schema from the catalog types of the first chunk's columns
+
+        Columns without a catalog type are inferred from the chunk, and
+        written as strings when they are entirely NULL in it.
+        """
+        inferred = pa.Schema.from_pandas(df, preserve_index=False)
+        fields = []
+        for schema_field in inferred:
+            column_type = arrow_type(self.column_types.get(schema_field.name, ""))
+            if column_type is None:
+                column_type = pa.string() if pa.types.is_null(schema_field.type) else schema_field.type
+            fields.append(pa.field(schema_field.name, column_type))
+        return pa.schema(fields)
+
+    def _conform(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Coerce columns read as Python objects to the numeric and date types of the schema
+
+        MariaDB zero dates are read as text, and become NULL like in the load.
+        """
+        columns = {}
+        for schema_field in self.schema:
+            values = df[schema_field.name]
+            if values.dtype != object:
+                continue
+            if pa.types.is_timestamp(schema_field.type):
+                columns[schema_field.name] = pd.to_datetime(values, errors="coerce")
+            elif pa.types.is_date(schema_field.type):
+                columns[schema_field.name] = pd.to_datetime(values, errors="coerce").dt.date
+            elif pa.types.is_integer(schema_field.type) or pa.types.is_floating(schema_field.type):
+                columns[schema_field.name] = pd.to_numeric(values, errors="coerce")
+        return df.assign(**columns) if columns else df
+
+    def write_chunk(self, df: pd.DataFrame) -> None:
+        """Add a chunk of rows to the export"""
+        if df.empty:
+            return
+        if self.schema is None:
+            data = df
+            if self.partition_column and not self.partition_format:
+                data = df.drop(columns=[self.partition_column])
+            self.schema = self._arrow_schema(data)
+
+        if self.partition_column:
+            keys = self._partition_keys(df)
+            if not self.partition_format:
+                df = df.drop(columns=[self.partition_column])
+            for partition, part in df.groupby(keys, sort=False):
+                self._buffer(partition, part)
+        else:
+            self._buffer(None, df)
+
+        # Keep the total number of buffered rows bounded
+        while sum(self._buffered_rows.values()) > self.max_buffered_rows:
+            largest = max(self._buffered_rows, key=self._buffered_rows.get)
+            self._flush(largest)
+
+    def _buffer(self, partition: Optional[str], df: pd.DataFrame) -> None:
+        self._buffers.setdefault(partition, []).append(df)
+        self._buffered_rows[partition] = self._buffered_rows.get(partition, 0) + len(df)
+        if self._buffered_rows[partition] >= self.row_group_size:
+            self._flush(partition)
+
+    def _flush(self, partition: Optional[str]) -> None:
+        """Write the buffered rows of a partition as row groups"""
+        frames = self._buffers.pop(partition, [])
+        self._buffered_rows.pop(partition, None)
+        if not frames:
+            return
+
+        df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+        table = pa.Table.from_pandas(self._conform(df), schema=self.schema, preserve_index=False)
+
+        offset = 0
+        while offset < table.num_rows:
+            part_file = self._file_for(partition)
+            room = self.max_rows_per_file - part_file.rows
+            batch = table.slice(offset, room)
+            part_file.writer.write_table(batch, row_group_size=self.row_group_size)
+            part_file.rows += batch.num_rows
+            part_file.row_groups += -(-batch.num_rows // self.row_group_size)
+            offset += batch.num_rows
+
+            if part_file.rows >= self.max_rows_per_file:
+                self._close_file(partition)
+
+    def _file_for(self, partition: Optional[str]) -> _PartitionFile:
+        """Get the open file of a partition, starting a new one if needed"""
+        if partition in self._open_files:
+            self._open_files.move_to_end(partition)
+            return self._open_files[partition]
+
+        # Close the least recently used file when too many are open
+        if len(self._open_files) >= self.max_open_files:
+            self._close_file(next(iter(self._open_files)))
+
+        number = self._file_counts.get(partition, 0)
+        self._file_counts[partition] = number + 1
+
+        relative_dir = ""
+        if self.partition_column:
+            relative_dir = f"{self.partition_key}={quote(partition, safe='')}"
+        relative_path = os.path.join(relative_dir, f"part-{number:05d}.parquet")
+        path = os.path.join(self.directory, relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        part_file = _PartitionFile(path, relative_path, partition)
+        part_file.writer = pq.ParquetWriter(path, self.schema, compression=self.compression)
+        self._open_files[partition] = part_file
+        return part_file
+
+    def _close_file(self, partition: Optional[str]) -> None:
+        part_file = self._open_files.pop(partition)
+        part_file.writer.close()
+        self._closed_files.append(part_file)
+
+    def close(self) -> Dict[str, Any]:
+        """Flush all buffers, close the files and write the manifest
+
+        Returns:
+            The manifest describing the exported files
+        """
+        for partition in list(self._buffers):
+            self._flush(partition)
+        for partition in list(self._open_files):
+            self._close_file(partition)
+
+        files = sorted(self._closed_files, key=lambda f: f.relative_path)
+        manifest = {
+            "table": self.table_name,
+            "partition_by": self.partition_column,
+            "partition_key": self.partition_key,
+            "compression": self.compression,
+            "row_group_size": self.row_group_size,
+            "total_rows": sum(f.rows for f in files),
+            "schema": [{"name": f.name, "type": str(f.type)} for f in self.schema] if self.schema else [],
+            "files": [
+                {
+                    "path": f.relative_path,
+                    "partition": f.partition,
+                    "rows": f.rows,
+                    "row_groups": f.row_groups,
+                    "bytes": os.path.getsize(f.path),
+                }
+                for f in files
+            ],
+        }
+
+        with open(os.path.join(self.directory, "_manifest.json"), "w") as f:
+            json.dump(manifest, f, indent=2)
+
+        return manifest
@@ -0,0 +1,127 @@
+import logging
+from typing import Any, Iterator, List, Optional
+
+import pandas as pd
+
+from models.catalog import TableInfo
+
+# MariaDB types that can hold values of many megabytes
+LARGE_OBJECT_TYPES = {"blob", "mediumblob", "longblob", "text", "mediumtext", "longtext"}
+
+
+def large_object_columns(table: Optional[TableInfo], columns: List[str], min_avg_row_size: int) -> List[str]:
+    """
+    Find the columns of a table that should bypass the bulk path
+
+    A BLOB/TEXT column is treated as a large object when the table's average
+    row, as reported by the catalog, is at least min_avg_row_size bytes.
+    Such tables are read by LargeObjectStreamer. Tables without a primary
+    key are left on the bulk path, since they can't be read in key order.
+
+    Args:
+        table: Catalog entry of the table
+        columns: Columns being exported
+        min_avg_row_size: Average row size in bytes from which large object
+            columns are streamed separately
+
+    Returns:
+        Names of the large object columns among columns
+    """
+    if table is None or not table.primary_key or table.avg_row_length < min_avg_row_size:
+        return []
+    return [
+        c.name for c in table.columns
+        if c.name in columns and c.data_type in LARGE_OBJECT_TYPES and c.name not in table.primary_key
+    ]
+
+
+def _value_size(value: Any) -> int:
+    if value is None:
+        return 0
+    if isinstance(value, (bytes, bytearray, memoryview, str)):
+        return len(value)
+    return 8
+
+
+class LargeObjectStreamer:
+    """
+    Reads a table with large object columns in batches bounded by bytes.
+
+    Rows are read in primary key order, a few at a time, with keyset
+    pagination so no query holds a long-running result set. Rows are
+    buffered until max_in_flight bytes are reached and handed on as one
+    chunk, large values included, which is loaded with COPY like any other
+    chunk. Every row is written once, with all its columns, so NOT NULL
+    large columns load and no row is left behind as a dead tuple.
+    """
+
+    def __init__(self, mariadb, table: TableInfo, columns: List[str],
+                 max_in_flight: int = 256 * 1024 ** 2, rows_per_fetch: int = 100, where: Optional[str] = None):
+        """
+        Args:
+            mariadb: Connection to read with
+            table: Catalog entry of the table, which must have a primary key
+            columns: Columns to read, large object columns included
+            max_in_flight: Bytes of large values buffered before a batch is handed on
+            rows_per_fetch: Rows read by each query
+            where: Row filter of the table, if any
+        """
+        self.mariadb = mariadb
+        self.table = table
+        self.key = list(table.primary_key)
+        self.columns = columns
+        self.max_in_flight = max_in_flight
+        self.rows_per_fetch = rows_per_fetch
+        self.where = where
+        # The key columns come first, to resume after the last row read
+        self.selected = self.key + [c for c in columns if c not in self.key]
+        self.logger = logging.getLogger(__name__)
+
+    def _fetch_query(self, first: bool) -> str:
+        select = ", ".join(f"`{c}`" for c in self.selected)
+        order = ", ".join(f"`{c}`" for c in self.key)
+        conditions = []
+        if self.where:
+            # Later queries take the last key as parameters, so a % of the filter must be escaped
+            conditions.append(f"({self.where if first else self.where.replace('%', '%%')})")
+        if not first:
+            # Row value comparison resumes after the last key, also for composite keys
+            placeholders = ", ".join(["%s"] * len(self.key))
+            conditions.append(f"({order}) > ({placeholders})")
+        query = f"SELECT {select} FROM `{self.table.name}`"
+        if conditions:
+            query += f" WHERE {' AND '.join(conditions)}"
+        return query + f" ORDER BY {order} LIMIT {self.rows_per_fetch}"
+
+    def _batch(self, rows: List[tuple]) -> pd.DataFrame:
+        return pd.DataFrame(rows, columns=self.selected)[self.columns]
+
+    def batches(self) -> Iterator[pd.DataFrame]:
+        """Read the table as chunks of about max_in_flight bytes"""
+        buffer: List[tuple] = []
+        buffered_bytes = 0
+        total_rows = 0
+        last_key = None
+
+        while True:
+            fetched = 0
+            query = self._fetch_query(last_key is None)
+            for row in self.mariadb.iter_rows(query, last_key):
+                fetched += 1
+                last_key = tuple(row[:len(self.key)])
+                buffer.append(row)
+                buffered_bytes += sum(_value_size(v) for v in row[len(self.key):])
+
+                if buffered_bytes >= self.max_in_flight:
+                    total_rows += len(buffer)
+                    yield self._batch(buffer)
+                    buffer, buffered_bytes = [], 0
+
+            if fetched < self.rows_per_fetch:
+                break
+
+        if buffer:
+            total_rows += len(buffer)
+            yield self._batch(buffer)
+
+        self.logger.info(f"Streamed {total_rows} rows of {self.table.name} with large values")
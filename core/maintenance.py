@@ -0,0 +1,164 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from connectors.pool import ThreadConnections
+
+# Size of every table, a partitioned table counting its partitions
+SIZES_QUERY = """
+SELECT n.nspname, c.relname, (SELECT SUM(pg_total_relation_size(p.relid)) FROM pg_partition_tree(c.oid) p)
+FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+WHERE c.relkind IN ('r', 'p') AND NOT c.relispartition AND n.nspname = ANY(%s)
+"""
+
+# Sequences owned by a column, of serial and identity columns alike
+SEQUENCES_QUERY = """
+SELECT n.nspname, c.relname, a.attname, quote_ident(sn.nspname) || '.' || quote_ident(seq.relname), s.seqmin
+FROM pg_depend d
+    JOIN pg_class seq ON seq.oid = d.objid AND seq.relkind = 'S'
+    JOIN pg_namespace sn ON sn.oid = seq.relnamespace
+    JOIN pg_sequence s ON s.seqrelid = seq.oid
+    JOIN pg_class c ON c.oid = d.refobjid
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    JOIN pg_attribute a ON a.attrelid = c.oid AND a.attnum = d.refobjsubid
+WHERE d.classid = 'pg_class'::regclass AND d.refclassid = 'pg_class'::regclass
+    AND d.deptype IN ('a', 'i') AND n.nspname = ANY(%s)
+"""
+
+Target = Tuple[str, str]
+
+
+@dataclass
+class MaintenanceResult:
+    """What was done to one table and how long it took"""
+    schema: str
+    table: str
+    bytes: int = 0
+    sequences: List[str] = field(default_factory=list)
+    seconds: float = 0.0
+    error: Optional[str] = None
+
+
+class PostLoadMaintenance:
+    """
+    Brings loaded tables into shape for queries
+
+    For every table, the sequences of its serial and identity columns are
+    moved past the largest loaded value with one setval query, then the
+    table is analyzed, or vacuumed with FREEZE and analyzed, so it has
+    statistics and a set visibility map without waiting for autovacuum.
+    Tables are handled largest first on a bounded pool of connections, so
+    the longest job starts earliest.
+    """
+
+    def __init__(self, config, workers: int = 4, analyze: bool = True, vacuum: bool = False,
+                 sync_sequences: bool = True):
+        """
+        Args:
+            config: MigrationConfig with the connection settings
+            workers: Tables maintained concurrently, each on its own connection
+            analyze: Run ANALYZE on every table
+            vacuum: Run VACUUM (FREEZE, ANALYZE) instead of ANALYZE
+            sync_sequences: Resynchronize the sequences of every table
+        """
+        self.config = config
+        self.workers = max(1, workers)
+        self.analyze = analyze
+        self.vacuum = vacuum
+        self.sync_sequences = sync_sequences
+        self.logger = logging.getLogger(__name__)
+
+    @classmethod
+    def from_config(cls, config, maria_config, workers: int = 4) -> "PostLoadMaintenance":
+        """Create the maintenance from the [maintenance] section of maria_config.ini"""
+        return cls(
+            config,
+            workers=maria_config.getint("maintenance", "workers", fallback=workers),
+            analyze=maria_config.getboolean("maintenance", "analyze", fallback=True),
+            vacuum=maria_config.getboolean("maintenance", "vacuum", fallback=False),
+            sync_sequences=maria_config.getboolean("maintenance", "sync_sequences", fallback=True),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.analyze or self.vacuum or self.sync_sequences
+
+    def _sequence_statement(self, name: str, sequences: List[Tuple[str, str, int]]) -> Tuple[str, list]:
+        # One scan of the table gives the largest value of every sequence column
+        maxima = ", ".join(f'MAX("{column}") AS c{i}' for i, (column, _, _) in enumerate(sequences))
+        calls = ", ".join(f"setval(%s, COALESCE(m.c{i} + 1, %s), false)" for i in range(len(sequences)))
+        params = [value for _, sequence, minimum in sequences for value in (sequence, minimum)]
+        return f"SELECT {calls} FROM (SELECT {maxima} FROM {name}) m", params
+
+    def maintain(self, connections: ThreadConnections, target: Target, nbytes: int,
+                 sequences: List[Tuple[str, str, int]]) -> MaintenanceResult:
+        """Maintain one table on the current thread's connection"""
+        schema, table = target
+        result = MaintenanceResult(schema, table, nbytes)
+        started = time.perf_counter()
+        name = f'"{schema}"."{table}"'
+        try:
+            postgres = connections.postgres()
+            # VACUUM can't run inside a transaction block
+            postgres.connection.autocommit = True
+            if self.sync_sequences and sequences:
+                postgres.execute_query(*self._sequence_statement(name, sequences))
+                result.sequences = [sequence for _, sequence, _ in sequences]
+            if self.vacuum:
+                postgres.execute_query(f"VACUUM (FREEZE, ANALYZE) {name}")
+            elif self.analyze:
+                postgres.execute_query(f"ANALYZE {name}")
+        except Exception as e:
+            self.logger.error(f"Error maintaining {schema}.{table}: {str(e)}")
+            result.error = str(e)
+        result.seconds = time.perf_counter() - started
+        return result
+
+    def run(self, postgres, tables: List[Tuple[Optional[str], str]]) -> List[MaintenanceResult]:
+        """
+        Maintain the given tables
+
+        Args:
+            postgres: Connection used to look up table sizes and sequences
+            tables: (schema, table) pairs, None standing for the default schema
+
+        Returns:
+            One result per table found in PostgreSQL, largest table first
+        """
+        if not self.enabled or not tables:
+            return []
+        rows = postgres.execute_query("SELECT current_schema()")
+        default_schema = rows[0][0] if rows else "public"
+        targets = list(dict.fromkeys((schema or default_schema, table.lower()) for schema, table in tables))
+        schemas = sorted({schema for schema, _ in targets})
+
+        sizes: Dict[Target, int] = {
+            (schema, table): int(nbytes or 0)
+            for schema, table, nbytes in postgres.execute_query(SIZES_QUERY, (schemas,)) or []
+        }
+        sequences: Dict[Target, List[Tuple[str, str, int]]] = {}
+        if self.sync_sequences:
+            for schema, table, column, sequence, minimum in postgres.execute_query(SEQUENCES_QUERY, (schemas,)) or []:
+                sequences.setdefault((schema, table), []).append((column, sequence, minimum))
+
+        jobs = sorted((target for target in targets if target in sizes), key=lambda t: sizes[t], reverse=True)
+        results = []
+        connections = ThreadConnections(self.config)
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                futures = [executor.submit(self.maintain, connections, target, sizes[target],
+                                           sequences.get(target, []))
+                           for target in jobs]
+                for future in as_completed(futures):
+                    result = future.result()
+                    status = f"error: {result.error}" if result.error else f"{result.seconds:.2f}s"
+                    synced = f", {len(result.sequences)} sequences" if result.sequences else ""
+                    print(f"  {result.schema}.{result.table} ({result.bytes / 1024 ** 2:.1f} MB{synced}): {status}")
+                    results.append(result)
+        finally:
+            connections.close()
+
+        results.sort(key=lambda r: r.bytes, reverse=True)
+        return results
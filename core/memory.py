@@ -0,0 +1,245 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, Optional
+
+import pandas as pd
+
+from utils.files import parse_size
+
+# A chunk is held as read, as transformed and once more as its COPY buffer
+# while it is loaded, so it is charged twice its measured size
+CHUNK_COPIES = 2
+
+# Largest share of the limit one chunk may take, so several producers fit
+_CHUNK_SHARE = 4
+
+
+def physical_memory() -> Optional[int]:
+    """Physical memory of the machine in bytes, if the platform reports it"""
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+def _format_bytes(nbytes: float) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if nbytes < 1024:
+            return f"{nbytes:.1f}{unit}"
+        nbytes /= 1024
+    return f"{nbytes:.1f}TB"
+
+
+class MemoryGovernor:
+    """
+    Process-wide ceiling on the bytes of chunks in flight
+
+    Every chunk is charged against the limit from the moment it is read
+    until it has been loaded and exported, by every worker and partition
+    thread of the process. A producer that would go over the limit blocks
+    before reading its next chunk until others release theirs; a single
+    chunk larger than the limit is let through alone, so a run never
+    deadlocks. Above the high watermark new units of tables are not started
+    and chunks are read smaller, down to min_chunk_size rows.
+
+    Without a limit every hook does nothing.
+    """
+
+    def __init__(self, limit: Optional[int], high_watermark: float = 0.75, min_chunk_size: int = 10000):
+        """
+        Args:
+            limit: Bytes of chunks allowed in flight, or None for no limit
+            high_watermark: Share of the limit from which the governor throttles
+            min_chunk_size: Fewest rows a chunk is shrunk to
+        """
+        self.limit = limit
+        self.high_watermark = high_watermark
+        self.min_chunk_size = min_chunk_size
+        self.in_flight = 0
+        self.peak = 0
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.shrunk_chunks = 0
+        self._condition = threading.Condition()
+
+    @classmethod
+    def from_config(cls, maria_config) -> "MemoryGovernor":
+        """
+        Create the governor from the [memory] section of maria_config.ini
+
+        limit is a size such as 8GB, a share of physical memory such as 50%,
+        or off. It defaults to half of physical memory.
+        """
+        setting = maria_config.get("memory", "limit", raw=True, fallback="50%").strip().lower()
+        if setting in ("", "off", "none"):
+            limit = None
+        elif setting.endswith("%"):
+            total = physical_memory()
+            limit = int(total * float(setting[:-1]) / 100) if total else None
+        else:
+            limit = parse_size(setting)
+        return cls(
+            limit or None,
+            high_watermark=maria_config.getfloat("memory", "high_watermark", fallback=0.75),
+            min_chunk_size=maria_config.getint("memory", "min_chunk_size", fallback=10000),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.limit is not None
+
+    def acquire(self, nbytes: float) -> int:
+        """
+        Charge bytes against the limit, blocking until they fit
+
+        Returns:
+            Bytes charged, to be given back to release
+        """
+        if self.limit is None:
+            return 0
+        nbytes = min(max(int(nbytes), 0), self.limit)
+        with self._condition:
+            if self.in_flight and self.in_flight + nbytes > self.limit:
+                self.waits += 1
+                started = time.perf_counter()
+                while self.in_flight and self.in_flight + nbytes > self.limit:
+                    self._condition.wait()
+                self.wait_seconds += time.perf_counter() - started
+            self.in_flight += nbytes
+            self.peak = max(self.peak, self.in_flight)
+        return nbytes
+
+    def resize(self, held: int, nbytes: float) -> int:
+        """
+        Correct a charge to the measured size of what was read, without blocking
+
+        Returns:
+            Bytes now charged
+        """
+        if self.limit is None:
+            return 0
+        nbytes = max(int(nbytes), 0)
+        with self._condition:
+            self.in_flight += nbytes - held
+            self.peak = max(self.peak, self.in_flight)
+            if nbytes < held:
+                self._condition.notify_all()
+        return nbytes
+
+    def release(self, held: int) -> None:
+        if not held:
+            return
+        with self._condition:
+            self.in_flight -= held
+            self._condition.notify_all()
+
+    @contextmanager
+    def reserve(self, nbytes: float):
+        """Hold bytes against the limit for the duration of a block"""
+        held = self.acquire(nbytes)
+        try:
+            yield
+        finally:
+            self.release(held)
+
+    def under_pressure(self) -> bool:
+        return self.limit is not None and self.in_flight >= self.limit * self.high_watermark
+
+    def chunk_rows(self, rows: int, row_bytes: float) -> int:
+        """
+        Rows to read in the next chunk
+
+        A chunk takes at most a quarter of the limit, and under pressure at
+        most half of what is left of it.
+
+        Args:
+            rows: Configured chunk size
+            row_bytes: Bytes charged for each row
+        """
+        if self.limit is None or row_bytes <= 0:
+            return rows
+        budget = self.limit / _CHUNK_SHARE
+        if self.under_pressure():
+            budget = min(budget, max(self.limit - self.in_flight, 0) / 2)
+        fitted = max(int(budget / row_bytes), min(self.min_chunk_size, rows))
+        if fitted < rows:
+            self.shrunk_chunks += 1
+            return fitted
+        return rows
+
+    def stream(self, chunk_size: int, row_bytes: float = 0) -> "GovernedStream":
+        """Track the chunks of one table or partition, see GovernedStream"""
+        return GovernedStream(self, chunk_size, row_bytes)
+
+    def report(self) -> Optional[str]:
+        """One line summary of the run, if the governor had a limit"""
+        if self.limit is None:
+            return None
+        return (f"Memory governor: peak {_format_bytes(self.peak)} of {_format_bytes(self.limit)} in flight, "
+                f"producers waited {self.waits} times ({self.wait_seconds:.1f}s), "
+                f"{self.shrunk_chunks} chunks read smaller")
+
+
+class GovernedStream:
+    """
+    Chunks of one table read within the governor's limit
+
+    The next chunk's size is decided, and its estimated bytes charged, before
+    it is read; once read, the charge is corrected to the chunk's measured
+    size. The first chunk is measured in full and sets the bytes per row
+    used for the following ones. Callers release each chunk once they are
+    done with it, and close the stream to release any chunk left over.
+    """
+
+    def __init__(self, governor: MemoryGovernor, chunk_size: int, row_bytes: float = 0):
+        """
+        Args:
+            governor: Governor the chunks are charged to
+            chunk_size: Configured rows per chunk
+            row_bytes: Estimated bytes per row until a chunk has been measured
+        """
+        self.governor = governor
+        self.chunk_size = chunk_size
+        self.row_bytes = row_bytes
+        self.next_rows = chunk_size
+        self.measured = False
+        self._held: Dict[int, int] = {}
+
+    def size(self) -> int:
+        """Rows of the chunk being read, passed as the connector's chunk size"""
+        return self.next_rows
+
+    def read(self, chunks: Iterable[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+        if not self.governor.enabled:
+            yield from chunks
+            return
+
+        iterator = iter(chunks)
+        while True:
+            self.next_rows = self.governor.chunk_rows(self.chunk_size, self.row_bytes)
+            held = self.governor.acquire(self.next_rows * self.row_bytes)
+            try:
+                df = next(iterator)
+            except StopIteration:
+                self.governor.release(held)
+                return
+            except BaseException:
+                self.governor.release(held)
+                raise
+            if len(df):
+                if not self.measured:
+                    self.row_bytes = df.memory_usage(deep=True).sum() / len(df) * CHUNK_COPIES
+                    self.measured = True
+                held = self.governor.resize(held, len(df) * self.row_bytes)
+            self._held[id(df)] = held
+            yield df
+
+    def release(self, df: pd.DataFrame) -> None:
+        self.governor.release(self._held.pop(id(df), 0))
+
+    def close(self) -> None:
+        for held in self._held.values():
+            self.governor.release(held)
+        self._held.clear()
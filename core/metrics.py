@@ -0,0 +1,266 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Any, Iterable, Iterator, List, Optional
+
+import pandas as pd
+
+# Stages of the pipeline and the database each one waits on
+STAGES = {"extract": "mariadb", "transform": None, "load": "postgres"}
+
+
+def _format_duration(seconds: Optional[float]) -> str:
+    if seconds is None:
+        return "unknown"
+    seconds = int(seconds)
+    return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m{seconds % 60:02d}s"
+
+
+class _StageTotals:
+    def __init__(self):
+        self.rows = 0
+        self.bytes = 0
+        self.seconds = 0.0
+
+
+class _TableProgress:
+    def __init__(self, database: str, table: str, expected_rows: int, row_size: int):
+        self.database = database
+        self.table = table
+        self.expected_rows = expected_rows
+        self.row_size = row_size
+        self.rows = 0
+        self.started = time.monotonic()
+        self.finished: Optional[float] = None
+
+    @property
+    def name(self) -> str:
+        return f"{self.database}.{self.table}"
+
+    def eta(self) -> Optional[float]:
+        """Seconds until the table is loaded at its current rate"""
+        elapsed = time.monotonic() - self.started
+        if self.finished or not self.rows or not elapsed:
+            return 0.0 if self.finished else None
+        return max(self.expected_rows - self.rows, 0) / (self.rows / elapsed)
+
+
+class MigrationMetrics:
+    """
+    Collects per-chunk throughput of the extract, transform and load stages.
+
+    Every chunk records its rows, estimated bytes (rows times the table's
+    AVG_ROW_LENGTH) and the seconds spent in each stage; extract and load
+    time is time spent waiting on MariaDB and PostgreSQL respectively.
+    Progress of each table is tracked against its TABLE_ROWS estimate.
+
+    While running, a background thread periodically prints a status to the
+    terminal, appends a snapshot to the JSON lines file and rewrites the
+    Prometheus text-format file. Each chunk is also written to the JSON
+    lines file as it completes.
+    """
+
+    def __init__(self, jsonl_path: Optional[str] = None, prometheus_path: Optional[str] = None,
+                 interval: float = 10.0, display: bool = True):
+        self.jsonl_path = jsonl_path
+        self.prometheus_path = prometheus_path
+        self.interval = interval
+        self.display = display
+        self.stages = {stage: _StageTotals() for stage in STAGES}
+        self.tables: Dict[str, _TableProgress] = {}
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._reporter: Optional[threading.Thread] = None
+        self._jsonl = None
+
+    def start(self) -> None:
+        """Start the periodic reporting"""
+        self.started = time.monotonic()
+        if self.jsonl_path:
+            os.makedirs(os.path.dirname(os.path.abspath(self.jsonl_path)), exist_ok=True)
+            self._jsonl = open(self.jsonl_path, "a")
+        self._stop.clear()
+        self._reporter = threading.Thread(target=self._report_loop, name="migres-metrics", daemon=True)
+        self._reporter.start()
+
+    def stop(self) -> None:
+        """Stop reporting and write a final snapshot"""
+        self._stop.set()
+        if self._reporter:
+            self._reporter.join()
+            self._reporter = None
+        self.report()
+        if self._jsonl:
+            self._jsonl.close()
+            self._jsonl = None
+
+    def start_table(self, database: str, table: str, expected_rows: int = 0, row_size: int = 0) -> None:
+        """Begin tracking a table
+
+        Args:
+            database: Database of the table
+            table: Name of the table
+            expected_rows: TABLE_ROWS estimate from the catalog
+            row_size: AVG_ROW_LENGTH from the catalog, used to estimate bytes
+        """
+        with self._lock:
+            self.tables[f"{database}.{table}"] = _TableProgress(database, table, expected_rows, row_size)
+
+    def finish_table(self, database: str, table: str) -> None:
+        with self._lock:
+            progress = self.tables.get(f"{database}.{table}")
+            if progress:
+                progress.finished = time.monotonic()
+
+    def record(self, database: str, table: str, stage: str, rows: int, seconds: float) -> None:
+        """Record one chunk passing through a stage"""
+        key = f"{database}.{table}"
+        with self._lock:
+            progress = self.tables.get(key)
+            row_size = progress.row_size if progress else 0
+            totals = self.stages[stage]
+            totals.rows += rows
+            totals.bytes += rows * row_size
+            totals.seconds += seconds
+            if progress and stage == "load":
+                progress.rows += rows
+
+            if self._jsonl:
+                self._jsonl.write(json.dumps({
+                    "event": "chunk", "time": time.time(), "table": key, "stage": stage,
+                    "rows": rows, "bytes": rows * row_size, "seconds": round(seconds, 6),
+                }) + "\n")
+
+    @contextmanager
+    def measure(self, database: str, table: str, stage: str, rows: int):
+        """Time a block of work on a chunk of rows"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(database, table, stage, rows, time.perf_counter() - started)
+
+    def timed_chunks(self, database: str, table: str,
+                     chunks: Iterable[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+        """Pass chunks through, recording the time spent extracting each one"""
+        iterator = iter(chunks)
+        while True:
+            started = time.perf_counter()
+            try:
+                df = next(iterator)
+            except StopIteration:
+                return
+            self.record(database, table, "extract", len(df), time.perf_counter() - started)
+            yield df
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Current totals, rates, database wait times and progress"""
+        with self._lock:
+            elapsed = time.monotonic() - self.started
+            stages = {}
+            for stage, totals in self.stages.items():
+                stages[stage] = {
+                    "rows": totals.rows,
+                    "bytes": totals.bytes,
+                    "seconds": round(totals.seconds, 3),
+                    # Throughput while working in the stage, independent of the others
+                    "rows_per_second": round(totals.rows / totals.seconds, 1) if totals.seconds else None,
+                    "bytes_per_second": round(totals.bytes / totals.seconds, 1) if totals.seconds else None,
+                }
+            wait = {db: round(self.stages[stage].seconds, 3) for stage, db in STAGES.items() if db}
+
+            # TABLE_ROWS is an estimate: finished tables count what was actually loaded
+            expected = sum(t.rows if t.finished else max(t.expected_rows, t.rows) for t in self.tables.values())
+            loaded = sum(t.rows for t in self.tables.values())
+            rate = loaded / elapsed if elapsed else 0
+            eta = (expected - loaded) / rate if rate else None
+
+            tables = [
+                {
+                    "table": t.name, "rows": t.rows, "expected_rows": t.expected_rows,
+                    "done": t.finished is not None, "eta_seconds": t.eta(),
+                }
+                for t in self.tables.values()
+            ]
+
+        # The stage with the most accumulated time is holding the pipeline back
+        busiest = max(stages, key=lambda s: stages[s]["seconds"])
+        return {
+            "time": datetime.now().isoformat(timespec="seconds"),
+            "elapsed_seconds": round(elapsed, 1),
+            "stages": stages,
+            "database_wait_seconds": wait,
+            "bottleneck": busiest if stages[busiest]["seconds"] else None,
+            "rows_loaded": loaded,
+            "rows_expected": expected,
+            "eta_seconds": round(eta, 1) if eta is not None else None,
+            "tables": tables,
+        }
+
+    def report(self) -> None:
+        """Emit the current snapshot to every configured output"""
+        snapshot = self.snapshot()
+        if self.display:
+            self._print(snapshot)
+        if self._jsonl:
+            with self._lock:
+                self._jsonl.write(json.dumps({"event": "snapshot", **snapshot}) + "\n")
+                self._jsonl.flush()
+        if self.prometheus_path:
+            self._write_prometheus(snapshot)
+
+    def _report_loop(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.report()
+
+    def _print(self, snapshot: Dict[str, Any]) -> None:
+        expected = snapshot["rows_expected"]
+        percent = f"{100 * snapshot['rows_loaded'] / expected:.1f}%" if expected else "-"
+        rates = ", ".join(
+            f"{stage} {values['rows_per_second'] or 0:,.0f} rows/s" for stage, values in snapshot["stages"].items())
+        print(f"[progress] {snapshot['rows_loaded']:,}/{expected:,} rows ({percent}), "
+              f"ETA {_format_duration(snapshot['eta_seconds'])} | {rates} | "
+              f"bottleneck: {snapshot['bottleneck'] or '-'}")
+        for table in snapshot["tables"]:
+            if not table["done"]:
+                print(f"    {table['table']}: {table['rows']:,}/{table['expected_rows']:,} rows, "
+                      f"ETA {_format_duration(table['eta_seconds'])}")
+
+    def _write_prometheus(self, snapshot: Dict[str, Any]) -> None:
+        lines: List[str] = []
+
+        def metric(name: str, kind: str, help_text: str, samples: List[tuple]) -> None:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                label_text = ",".join(f'{k}="{v}"' for k, v in labels.items())
+                lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+
+        stages = snapshot["stages"]
+        metric("migres_stage_rows_total", "counter", "Rows processed by each stage",
+               [({"stage": s}, v["rows"]) for s, v in stages.items()])
+        metric("migres_stage_bytes_total", "counter", "Estimated bytes processed by each stage",
+               [({"stage": s}, v["bytes"]) for s, v in stages.items()])
+        metric("migres_stage_seconds_total", "counter", "Seconds spent in each stage",
+               [({"stage": s}, v["seconds"]) for s, v in stages.items()])
+        metric("migres_database_wait_seconds_total", "counter", "Seconds spent waiting on each database",
+               [({"database": db}, seconds) for db, seconds in snapshot["database_wait_seconds"].items()])
+        metric("migres_table_rows_loaded", "gauge", "Rows loaded per table",
+               [({"table": t["table"]}, t["rows"]) for t in snapshot["tables"]])
+        metric("migres_table_rows_expected", "gauge", "TABLE_ROWS estimate per table",
+               [({"table": t["table"]}, t["expected_rows"]) for t in snapshot["tables"]])
+        if snapshot["eta_seconds"] is not None:
+            metric("migres_eta_seconds", "gauge", "Estimated seconds until the migration finishes",
+                   [({}, snapshot["eta_seconds"])])
+
+        # Write beside the target and rename, so the scraper never sees a partial file
+        directory = os.path.dirname(os.path.abspath(self.prometheus_path))
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.prometheus_path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, self.prometheus_path)
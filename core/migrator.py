@@ -1,88 +1,142 @@
-from typing import Dict, Any, List, Optional
+import threading
+import time
+from collections import Counter
+from contextlib import nullcontext
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Any, Iterator, List, Optional, Set, Tuple, Union
+import pandas as pd
 from connectors.mariadb_connector import MariaDBConnector
 from connectors.postgres_connector import PostgresConnector
+from connectors.pool import ThreadConnections
+from core.checkpoint import CheckpointStore
+from core.compiled_plan import CompiledPlan, PlanCompiler, config_digest
 from core.data_processor import DataProcessor
+from core.exporter import ParquetExporter
+from core.metrics import MigrationMetrics
+from core.profiling import NullProfiler, StageProfiler
+from core.rejects import RejectWriter
+from core.large_objects import LargeObjectStreamer, large_object_columns
+from core.maintenance import PostLoadMaintenance
+from core.memory import GovernedStream, MemoryGovernor
+from core.partition_loader import PartitionedTableLoader
+from core.planner import MEMORY_FACTOR
+from core.spill_cache import SpillCache, source_fingerprint
+from models.catalog import PartitionInfo, TableInfo
 from models.migration import MigrationConfig
 import configparser
 import os
+import sys
+from config.catalog import SchemaCatalog
+from config.catalog_cache import CatalogCache
+from config.filters import RowFilters, with_filter
+from config.schema_parser import SchemaParser
+from config.selection import SelectionRules
 from config.table_sorter import TableSorter
+from utils.files import parse_size
 
 class MigrationManager:
-    def __init__(self, config: MigrationConfig):
+    def __init__(self, config: MigrationConfig, use_spill_cache: bool = False, profile: bool = False,
+                 sample: Optional[float] = None):
         self.config = config
+        # Share of the root tables' rows to migrate, see ReferentialSampler
+        self.sample = sample
         self.mariadb = MariaDBConnector(config.mariadb_config)
         self.postgres = PostgresConnector(config.postgres_config.connection_string)
         self.data_processor = DataProcessor(config.config_manager)
+        self.schema_parser = SchemaParser.from_definitions(config.schema_definitions)
         self.maria_config = self._load_maria_config()
+        self.data_processor.rejects = RejectWriter(
+            self.maria_config.get("rejects", "directory", fallback=".migres/rejects"))
+        self.selection = SelectionRules.from_config(self.maria_config)
+        self.row_filters = RowFilters.from_config(self.maria_config)
+        self.spill_cache = self._create_spill_cache() if use_spill_cache else None
+        self.catalog: Optional[SchemaCatalog] = None
+        self.plan: Optional[CompiledPlan] = None
+        self.catalog_cache = CatalogCache(
+            self.maria_config.get("catalog_cache", "path", fallback=".migres/catalog.json"))
+        self.metrics = self._create_metrics()
+        self.profiler = StageProfiler(
+            self.maria_config.get("profile", "directory", fallback=".migres/profile"),
+            top=self.maria_config.getint("profile", "top", fallback=25),
+        ) if profile else NullProfiler()
+        self.checkpoints = CheckpointStore(
+            self.maria_config.get("checkpoints", "path", fallback=".migres/checkpoints.json"))
+        # Shared by every worker, so the chunks of all tables stay within one limit
+        self.memory = MemoryGovernor.from_config(self.maria_config)
         
     def _load_maria_config(self) -> configparser.ConfigParser:
         """Load MariaDB export configuration"""
-        maria_config = configparser.ConfigParser()
+        maria_config = configparser.ConfigParser(allow_no_value=True)
         if os.path.exists("maria_config.ini"):
             maria_config.read("maria_config.ini")
         return maria_config
         
+    def _create_metrics(self) -> MigrationMetrics:
+        """Create the metrics collector from the [metrics] settings"""
+        return MigrationMetrics(
+            jsonl_path=self.maria_config.get("metrics", "jsonl", fallback=".migres/metrics.jsonl") or None,
+            prometheus_path=self.maria_config.get("metrics", "prometheus", fallback=".migres/metrics.prom") or None,
+            interval=self.maria_config.getfloat("metrics", "interval", fallback=10.0),
+            display=self.maria_config.getboolean("metrics", "display", fallback=True),
+        )
+        
+    def _get_catalog(self) -> SchemaCatalog:
+        """Load the catalog of all configured databases on first use"""
+        if self.catalog is None:
+            self.catalog = self.catalog_cache.load_catalog(self.mariadb, self.config.mariadb_databases,
+                                                           self.selection)
+        return self.catalog
+        
+    def _create_spill_cache(self) -> SpillCache:
+        """Create the spill cache from the [spill_cache] settings"""
+        max_size = self.maria_config.get("spill_cache", "max_size", fallback=None)
+        return SpillCache(
+            self.maria_config.get("spill_cache", "directory", fallback=".migres/spill"),
+            max_bytes=parse_size(max_size) if max_size else None,
+        )
+        
+    def _include_table(self, table: str) -> bool:
+        """Check the configuration to see whether a table is exported"""
+        return self.selection.include_table(table)
+        
+    def _include_column(self, table_name: str, column: str) -> bool:
+        """Check the configuration to see whether a column is exported"""
+        return self.selection.include_column(table_name, column)
+        
+    def _row_filter(self, db_name: str, table_name: str) -> Optional[str]:
+        """WHERE condition a table is read with, from the compiled plan"""
+        if self.plan is None:
+            self.get_plan()
+        compiled = self.plan.table(db_name, table_name)
+        return compiled.where if compiled else None
+        
     def _get_tables_to_export(self) -> Dict[str, List[str]]:
         """Determine which tables to export based on configuration"""
-        export_all = self.maria_config.getboolean("export_settings", "export_all_tables", fallback=True)
-        
-        # Get list of all tables from MariaDB
-        self.mariadb.connect()
-        all_tables = {}
-        for db_name in self.config.mariadb_databases:
-            self.mariadb.select_database(db_name)
-            tables = self.mariadb.get_tables()
-            all_tables[db_name] = tables
+        # Get list of all tables from the catalog
+        catalog = self._get_catalog()
+        all_tables = {db_name: catalog.table_names(db_name) for db_name in self.config.mariadb_databases}
         
         # Apply inclusion/exclusion rules
         result = {}
         for db_name, tables in all_tables.items():
-            filtered_tables = []
-            
-            for table in tables:
-                include_table = export_all  # Default based on export_all setting
-                
-                # Check if table has explicit setting
-                if self.maria_config.has_section("tables"):
-                    table_setting = self.maria_config.get("tables", table, fallback=None)
-                    if table_setting == "include":
-                        include_table = True
-                    elif table_setting == "exclude":
-                        include_table = False
-                
-                if include_table:
-                    filtered_tables.append(table)
+            filtered_tables = [table for table in tables if self._include_table(table)]
             
             if filtered_tables:
                 result[db_name] = filtered_tables
                 
         return result
         
-    def _get_columns_to_export(self, table_name: str) -> List[str]:
+    def _get_columns_to_export(self, table_name: str, db_name: Optional[str] = None) -> List[str]:
         """Determine which columns to export for a table based on configuration"""
-        export_all = self.maria_config.getboolean("export_settings", "export_all_columns", fallback=True)
+        compiled = self.plan.table(db_name or self.mariadb.config.database, table_name) if self.plan else None
+        if compiled:
+            return list(compiled.columns)
         
-        # Get all columns for the table
-        all_columns = self.mariadb.get_columns(table_name)
+        # Get all columns for the table, by default in the current database
+        all_columns = self._get_catalog().columns(db_name or self.mariadb.config.database, table_name)
         
         # Apply inclusion/exclusion rules
-        filtered_columns = []
-        for column in all_columns:
-            include_column = export_all  # Default based on export_all setting
-            
-            # Check if column has explicit setting
-            if self.maria_config.has_section("columns"):
-                column_key = f"{table_name}.{column}"
-                column_setting = self.maria_config.get("columns", column_key, fallback=None)
-                if column_setting == "include":
-                    include_column = True
-                elif column_setting == "exclude":
-                    include_column = False
-            
-            if include_column:
-                filtered_columns.append(column)
-                
-        return filtered_columns
+        return [column for column in all_columns if self._include_column(table_name, column)]
         
     def run(self, no_download: bool = False) -> None:
         """Execute the full migration process"""
@@ -90,66 +144,731 @@ class MigrationManager:
             self.mariadb.connect()
             self.postgres.connect()
             
-            # Determine tables to export
-            tables_to_export = self._get_tables_to_export()
-            
             # Create tables in PostgreSQL
-            self.postgres.create_tables(self.config.schema_definitions)
+            self._create_tables()
             
-            # Process each database
-            for db_name, tables in tables_to_export.items():
-                self.mariadb.select_database(db_name)
-                
-                # Use the table sorter to determine migration order
-                sorter = TableSorter(self.mariadb, self.postgres, self.maria_config)
-                ordered_tables = sorter.get_migration_order(db_name)
-                
-                # Filter ordered_tables to only include tables we want to export
-                ordered_tables = [t for t in ordered_tables if t in tables]
-                
-                print(f"Migrating tables in optimized order:")
-                for i, table in enumerate(ordered_tables, 1):
-                    print(f"{i}. {table}")
+            # The tables of every database, sorted as one dependency graph
+            plan = self.get_plan()
+            levels = plan.levels
+            
+            print(f"Migrating tables in optimized order:")
+            for i, level in enumerate(levels, 1):
+                units = [" + ".join(f"{db_name}.{table}" for db_name, table in unit) for unit in level]
+                print(f"{i}. {', '.join(units)}")
+            if plan.deferred_foreign_keys:
+                print(f"Loading {len(plan.deferred_foreign_keys)} foreign keys inside cycles, "
+                      f"which are added with the others after the load")
+            if plan.sample is not None:
+                print(f"Sampling {plan.sample:.4%} of the root tables with every row they reference")
+            for db_name in plan.databases:
+                if self._target_schema(db_name):
+                    print(f"Loading {db_name} into schema {self._target_schema(db_name)}")
+            
+            # Load each unit as soon as the units it depends on are loaded
+            self.metrics.start()
+            self.profiler.start()
+            try:
+                self._run_units([[list(unit) for unit in level] for level in levels], no_download)
+            finally:
+                self.profiler.stop()
+                self.metrics.stop()
+            self._report_profile()
+            if self.memory.report():
+                print(self.memory.report())
+            self._report_rejects()
+                    
+            self._apply_constraints()
+            
+            self._maintain(list(plan.tables))
+            
+        finally:
+            self.mariadb.disconnect()
+            self.postgres.disconnect()
+            
+    def saved_sample(self) -> Optional[float]:
+        """Sample rate of the saved plan, which the last run loaded the target with"""
+        plan = CompiledPlan.load(self.maria_config.get("plan", "artifact", fallback=".migres/plan.pickle"))
+        return plan.sample if plan else None
+        
+    def get_plan(self, recompile: bool = False) -> CompiledPlan:
+        """Load the compiled plan, compiling it again when it is out of date
+        
+        The plan is saved to the [plan] artifact path and reused by later runs
+        as long as the configuration files and the source schema are unchanged.
+        
+        Args:
+            recompile: Compile the plan even if the saved one is current
+            
+        Returns:
+            The plan, also handed to the data processor
+        """
+        path = self.maria_config.get("plan", "artifact", fallback=".migres/plan.pickle")
+        digest = config_digest(databases=self.config.mariadb_databases)
+        catalog = self._get_catalog()
+        
+        plan = None if recompile else CompiledPlan.load(path)
+        if plan is None or not plan.is_current(digest, catalog, self.sample):
+            self.plan = None
+            plan = PlanCompiler(self).compile()
+            for warning in plan.warnings:
+                print(f"Warning: {warning}")
+            if plan.catalog_fingerprints is not None:
+                plan.save(path)
+        
+        self.plan = plan
+        self.data_processor.plan = plan
+        return plan
+        
+    def _migration_levels(self, sorter: TableSorter) -> List[List[List[Tuple[str, str]]]]:
+        """Sort the exported tables of every database into levels of units"""
+        tables_to_export = self._get_tables_to_export()
+        levels = sorter.get_global_migration_levels(self.config.mariadb_databases)
+        
+        # Filter the levels to only include tables we want to export
+        levels = [[[t for t in unit if t[1] in tables_to_export.get(t[0], [])] for unit in level]
+                  for level in levels]
+        levels = [[unit for unit in level if unit] for level in levels]
+        return [level for level in levels if level]
+        
+    def _report_profile(self) -> None:
+        """Write the profiling report of a --profile run and summarize it"""
+        report = self.profiler.report()
+        if report is None:
+            return
+        
+        print(f"Profile written to {self.profiler.directory}")
+        for stage, summary in report["stages"].items():
+            print(f"  {stage}: {summary['seconds']:.1f}s over {summary['chunks']} chunks, "
+                  f"peak {summary['peak_bytes'] / 1024 ** 2:.1f} MB")
+            for function in summary.get("hottest", [])[:3]:
+                print(f"    {function['own_seconds']:.3f}s  {function['function']}")
+            for allocator in summary["allocators"][:3]:
+                print(f"    {allocator['bytes'] / 1024 ** 2:.1f} MB  {allocator['location']}")
+        
+    def _maintain(self, tables: List[Tuple[str, str]]) -> None:
+        """Analyze, vacuum and resynchronize the sequences of the loaded tables, from [maintenance]
+        
+        Args:
+            tables: Loaded (database, table) pairs
+        """
+        maintenance = PostLoadMaintenance.from_config(self.config, self.maria_config, self._workers())
+        if not maintenance.enabled or not tables:
+            return
+        print("Running post-load maintenance:")
+        started = time.perf_counter()
+        self.postgres.select_schema(None)
+        results = maintenance.run(self.postgres, [(self._target_schema(db_name), table) for db_name, table in tables])
+        failed = sum(1 for result in results if result.error)
+        print(f"Maintained {len(results) - failed} tables in {time.perf_counter() - started:.1f}s"
+              + (f", {failed} failed" if failed else ""))
+        
+    def _report_rejects(self) -> None:
+        """Print the rows left out for invalid JSON, by table"""
+        rejects = self.data_processor.rejects
+        for (db_name, table), count in sorted(rejects.counts.items(), key=lambda item: (item[0][0] or "", item[0][1])):
+            name = f"{db_name}.{table}" if db_name else table
+            print(f"Rejected {count} rows of {name} with invalid JSON, see {rejects.path(db_name, table)}")
+        
+    def _create_tables(self) -> None:
+        """Create or complete the target tables from table_schema.ini, in every target schema"""
+        schemas = list(dict.fromkeys(self._target_schema(db_name) for db_name in self.config.mariadb_databases))
+        statements = []
+        try:
+            for schema in schemas:
+                self.postgres.select_schema(schema, create=True)
+                statements += self.postgres.create_tables(self.config.schema_definitions, self._workers())
+        finally:
+            self.postgres.select_schema(None)
+        if statements:
+            print(f"Applied {len(statements)} schema changes to PostgreSQL")
+        else:
+            print("PostgreSQL schema is up to date")
+        
+    def _apply_constraints(self) -> None:
+        """Add the indexes, unique constraints and foreign keys of table_schema.ini once every
+        table is loaded, in every target schema"""
+        schemas = list(dict.fromkeys(self._target_schema(db_name) for db_name in self.config.mariadb_databases))
+        statements = []
+        try:
+            for schema in schemas:
+                self.postgres.select_schema(schema)
+                statements += self.postgres.apply_constraints(self.config.schema_definitions, self._workers())
+        finally:
+            self.postgres.select_schema(None)
+        if statements:
+            print(f"Added {len(statements)} constraints to PostgreSQL")
+        
+    def _target_schema(self, db_name: Optional[str]) -> Optional[str]:
+        """PostgreSQL schema a source database is loaded into, from [target_schemas]
+        
+        Databases without an entry load into the connection's default schema.
+        """
+        if not db_name:
+            return None
+        return self.maria_config.get("target_schemas", db_name, fallback=None) or None
+        
+    def _workers(self) -> int:
+        """Number of units loaded concurrently, each with its own connections"""
+        return max(1, self.maria_config.getint("performance", "workers", fallback=4))
+        
+    def _database_workers(self) -> int:
+        """Number of units of one source database loaded concurrently"""
+        return max(1, self.maria_config.getint("performance", "database_workers", fallback=self._workers()))
+        
+    def _select(self, db_name: str) -> Tuple[MariaDBConnector, PostgresConnector]:
+        """The manager's own connections, switched to a database and its target schema"""
+        self.mariadb.select_database(db_name)
+        self.postgres.select_schema(self._target_schema(db_name))
+        return self.mariadb, self.postgres
+        
+    def _unit_dependencies(self, levels: List[List[List[Tuple[str, str]]]]) -> List[Set[int]]:
+        """Find the units each unit has to wait for
+        
+        A unit waits for the units of earlier levels it references through
+        foreign keys. References to later levels, which only an explicit
+        order in [migration] creates, are left out, so the order set there
+        wins. The levels of force_early, custom_order and force_late tables
+        are barriers: they start after every unit of the level before them
+        and finish before any unit of the level after them starts.
+        
+        Args:
+            levels: Levels of units of (database, table) pairs
+            
+        Returns:
+            The units each unit depends on, by index in the flattened levels
+        """
+        units = [unit for level in levels for unit in level]
+        level_of = [k for k, level in enumerate(levels) for _ in level]
+        indexes: List[List[int]] = []
+        for level in levels:
+            start = sum(len(previous) for previous in indexes)
+            indexes.append(list(range(start, start + len(level))))
+        
+        unit_of = {table: i for i, unit in enumerate(units) for table in unit}
+        dependencies: List[Set[int]] = [set() for _ in units]
+        for fk in self._get_catalog().foreign_keys():
+            i = unit_of.get((fk.database, fk.table))
+            j = unit_of.get((fk.referenced_database, fk.referenced_table))
+            if i is not None and j is not None and level_of[j] < level_of[i]:
+                dependencies[i].add(j)
+        
+        sorter = TableSorter(self.mariadb, self.postgres, self.maria_config)
+        explicit = sorter.explicit_tables(list(unit_of))
+        for k, level in enumerate(levels):
+            if not any(table in explicit for unit in level for table in unit):
+                continue
+            for i in indexes[k]:
+                dependencies[i].update(indexes[k - 1] if k else ())
+            for i in indexes[k + 1] if k + 1 < len(levels) else ():
+                dependencies[i].update(indexes[k])
+        return dependencies
+        
+    def _run_units(self, levels: List[List[List[Tuple[str, str]]]], no_download: bool) -> None:
+        """Load units of tables, running independent units concurrently
+        
+        A unit is started as soon as every unit it depends on has finished
+        (see _unit_dependencies), rather than waiting for its whole level. Each source database is a
+        job of its own: its units run on connections opened on that database
+        and its target schema, one pair per worker thread, which are closed
+        as soon as the database is done. Up to workers units run at once, at
+        most database_workers of them from one database, and the database
+        with the fewest running units is served first so that every database
+        makes progress. While the memory governor is under pressure, no new
+        unit is started unless nothing is running.
+        
+        Args:
+            levels: Levels of units of (database, table) pairs, in dependency order
+            no_download: If True, don't save data locally
+            
+        Raises:
+            RuntimeError: If some units could never be started
+        """
+        units = [unit for level in levels for unit in level]
+        workers = self._workers()
+        if workers == 1 or len(units) <= 1:
+            for unit in units:
+                self._load_unit(unit, no_download, self._select)
+            return
+        
+        dependencies = self._unit_dependencies(levels)
+        dependents: List[List[int]] = [[] for _ in units]
+        for i, unit_dependencies in enumerate(dependencies):
+            for j in unit_dependencies:
+                dependents[j].append(i)
+        
+        # A unit's database is that of its first table, a cycle rarely spans databases
+        database_of = [unit[0][0] for unit in units]
+        database_workers = self._database_workers()
+        remaining = Counter(db_name for unit in units for db_name in {db for db, _ in unit})
+        connections = {db_name: ThreadConnections(self.config, db_name, self._target_schema(db_name))
+                       for db_name in remaining}
+        running_per_database = Counter()
+        
+        def load(unit):
+            self._load_unit(unit, no_download, lambda db_name: connections[db_name].get())
+        
+        def next_unit() -> Optional[int]:
+            candidates = [i for i in ready if running_per_database[database_of[i]] < database_workers]
+            if not candidates:
+                return None
+            return min(candidates, key=lambda i: running_per_database[database_of[i]])
+        
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                running = {}
+                ready = [i for i, unit_dependencies in enumerate(dependencies) if not unit_dependencies]
                 
-                # Process tables in the determined order
-                for table in ordered_tables:
-                    columns = self._get_columns_to_export(table)
-                    self._process_table(table, columns, no_download)
+                while running or ready:
+                    while ready and len(running) < workers and not (running and self.memory.under_pressure()):
+                        i = next_unit()
+                        if i is None:
+                            break
+                        ready.remove(i)
+                        running_per_database[database_of[i]] += 1
+                        running[executor.submit(load, units[i])] = i
                     
-            # Apply constraints
-            self.postgres.apply_constraints(self.config.constraints)
+                    # Held back units are retried once memory has been released
+                    done, _ = wait(running, timeout=1.0 if ready else None, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        i = running.pop(future)
+                        future.result()
+                        running_per_database[database_of[i]] -= 1
+                        for db_name in {db for db, _ in units[i]}:
+                            remaining[db_name] -= 1
+                            if not remaining[db_name]:
+                                connections[db_name].close()
+                        for j in dependents[i]:
+                            dependencies[j].discard(i)
+                            if not dependencies[j]:
+                                ready.append(j)
+        finally:
+            for database_connections in connections.values():
+                database_connections.close()
+        
+        # Units waiting on each other are never ready; they must not be skipped silently
+        stuck = [units[i] for i, unit_dependencies in enumerate(dependencies) if unit_dependencies]
+        if stuck:
+            names = ", ".join(" + ".join(f"{db_name}.{table}" for db_name, table in unit) for unit in stuck)
+            raise RuntimeError(f"Units could not be scheduled, they wait on each other: {names}")
+        
+    def _load_unit(self, unit: List[Tuple[str, str]], no_download: bool,
+                   connect: Callable[[str], Tuple[MariaDBConnector, PostgresConnector]]) -> None:
+        """Load the tables of a unit one after another
+        
+        Args:
+            unit: (database, table) pairs to load
+            no_download: If True, don't save data locally
+            connect: Returns the MariaDB and PostgreSQL connections of a database
+        """
+        for db_name, table in unit:
+            mariadb, postgres = connect(db_name)
+            columns = self._get_columns_to_export(table, db_name)
+            self._process_table(table, columns, no_download, db_name, mariadb=mariadb, postgres=postgres)
+        
+    def load_from_cache(self, no_download: bool = True, check_source: bool = False) -> None:
+        """Replay the transform and load stages from the spill cache
+        
+        Tables are loaded in the order they were originally extracted, which
+        is the dependency order of the run that filled the cache. The source
+        database is not queried unless check_source is set.
+        
+        Args:
+            no_download: If True, don't save data locally
+            check_source: Compare each entry's fingerprint with the source
+                table and skip entries that are out of date
+        """
+        entries = [e for e in self.spill_cache.entries() if self._include_table(e["table"])]
+        if not entries:
+            print("The spill cache is empty")
+            return
+        
+        try:
+            self.postgres.connect()
+            self._create_tables()
+            
+            self.metrics.start()
+            try:
+                for entry in entries:
+                    db_name, table = entry["database"], entry["table"]
+                    fingerprint = with_filter(source_fingerprint(self.mariadb, db_name, table),
+                                              self._row_filter(db_name, table)) if check_source else None
+                    if check_source and fingerprint != entry["fingerprint"]:
+                        print(f"Skipping {db_name}.{table}: source has changed since it was cached")
+                        continue
+                    
+                    columns = [c for c in entry["columns"] if self._include_column(table, c)]
+                    chunks = (df[columns] for df in self.spill_cache.iter_chunks(entry))
+                    self.postgres.select_schema(self._target_schema(db_name))
+                    self._process_table(table, columns, no_download, db_name, chunks, cached=entry)
+            finally:
+                self.metrics.stop()
+            self._report_rejects()
             
+            self._apply_constraints()
+            
+            self._maintain([(entry["database"], entry["table"]) for entry in entries])
+        
         finally:
             self.mariadb.disconnect()
             self.postgres.disconnect()
             
-    def _process_table(self, table_name: str, columns: List[str], no_download: bool) -> None:
+    def _extract_chunks(self, db_name: Optional[str], table_name: str, columns: List[str],
+                        mariadb: Optional[MariaDBConnector] = None,
+                        chunk_size: Union[int, Callable[[], int], None] = None,
+                        read: Optional[Callable[[], Iterator[pd.DataFrame]]] = None) -> Iterator[pd.DataFrame]:
+        """Read a table from MariaDB, going through the spill cache when enabled
+        
+        A cached extraction of the same table state is replayed instead of
+        reading the source again; otherwise the chunks are written to the cache
+        as they are read. read replaces the chunked read of the table, for
+        tables read another way such as by LargeObjectStreamer.
+        """
+        mariadb = mariadb or self.mariadb
+        chunk_size = chunk_size or self._chunk_size()
+        where = self._row_filter(db_name, table_name) if db_name else None
+        read = read or (lambda: mariadb.iter_table_chunks(table_name, columns, chunk_size, where=where))
+        if self.spill_cache is None or db_name is None:
+            yield from read()
+            return
+        
+        # A filtered read is cached apart from a full read of the same table
+        fingerprint = with_filter(source_fingerprint(mariadb, db_name, table_name), where)
+        entry = self.spill_cache.lookup(db_name, table_name, columns, fingerprint)
+        if entry:
+            print(f"  Replaying {entry['rows']} rows from the spill cache")
+            yield from self.spill_cache.iter_chunks(entry)
+            return
+        
+        table_info = self._get_catalog().table(db_name, table_name)
+        writer = self.spill_cache.writer(
+            db_name, table_name, columns, fingerprint,
+            column_types={c.name: c.column_type for c in table_info.columns} if table_info else None,
+            avg_row_length=table_info.avg_row_length if table_info else 0)
+        try:
+            for df in read():
+                writer.write_chunk(df)
+                yield df
+        except BaseException:
+            writer.abort()
+            raise
+        writer.commit()
+        
+    def _create_exporter(self, db_name: Optional[str], table_name: str,
+                         max_rows: Optional[int] = None,
+                         column_types: Optional[Dict[str, str]] = None) -> ParquetExporter:
+        """Create the Parquet exporter for a table from the [download] settings
+        
+        Args:
+            db_name: Database of the table, which names the export directory
+            table_name: Name of the table
+            max_rows: Most rows buffered or written per row group, for tables
+                whose rows are too large for the configured sizes
+            column_types: MariaDB COLUMN_TYPE of each column, which the file
+                schema is built from
+        """
+        directory = self.maria_config.get("download", "directory", fallback="exports")
+        if db_name:
+            directory = os.path.join(directory, db_name)
+
+        return ParquetExporter(
+            directory,
+            table_name,
+            partition_by=self.maria_config.get("download_partitions", table_name, fallback=None),
+            row_group_size=min(self.maria_config.getint("download", "row_group_size", fallback=100000),
+                               max_rows or sys.maxsize),
+            max_rows_per_file=self.maria_config.getint("download", "max_rows_per_file", fallback=1000000),
+            max_buffered_rows=min(self._chunk_size(), max_rows or sys.maxsize),
+            compression=self.maria_config.get("download", "compression", fallback="zstd"),
+            column_types=column_types,
+        )
+
+    def _chunk_size(self) -> int:
+        """Number of rows extracted from MariaDB at a time"""
+        return self.maria_config.getint("export_settings", "chunk_size", fallback=500000)
+
+    def _partition_order(self, partitions: List[PartitionInfo]) -> List[PartitionInfo]:
+        """Order partitions for extraction
+        
+        RANGE partitions are read oldest first, so the cold partitions are
+        loaded ahead of the hot last one that is still being written to.
+        Other partitioning methods are read largest first.
+        """
+        if partitions and (partitions[0].method or "").startswith("RANGE"):
+            return sorted(partitions, key=lambda p: p.ordinal)
+        return sorted(partitions, key=lambda p: p.data_length, reverse=True)
+        
+    def _process_partitions(self, table_info: TableInfo, columns: List[str],
+                            exporter: Optional[ParquetExporter],
+                            target: Optional[PartitionedTableLoader] = None) -> int:
+        """Extract and load the partitions of a table concurrently
+        
+        Each partition is read with its own SELECT ... PARTITION (p) query on
+        its own connections and copied in one transaction, which is
+        checkpointed once committed, so an interrupted run resumes with the
+        partitions that are missing and none of their rows loaded. Rows routed
+        into the detached children of a range or list partitioned target
+        can't be committed per source partition; the loader empties those
+        children and the whole table is loaded again.
+        
+        Args:
+            table_info: Catalog entry of the partitioned table
+            columns: List of columns to export
+            exporter: Parquet exporter shared by the partitions, if any
+            target: Loader of a partitioned PostgreSQL table, if any
+            
+        Returns:
+            Number of rows loaded in this run
+        """
+        db_name, table_name = table_info.database, table_info.name
+        where = self._row_filter(db_name, table_name)
+        fingerprint = self._partition_fingerprint(table_info)
+        routed = target is not None and target.routes
+        completed = self._completed_partitions(table_info, target)
+        partitions = [p for p in self._partition_order(table_info.partitions) if p.name not in completed]
+        if completed:
+            print(f"  Skipping {len(completed)} partitions loaded by a previous run")
+        
+        connections = ThreadConnections(self.config, db_name, self._target_schema(db_name))
+        export_lock = threading.Lock()
+        row_bytes = self._row_bytes(table_info)
+        progress_lock = threading.Lock()
+        total_rows = 0
+        
+        def load_partition(partition: PartitionInfo) -> None:
+            nonlocal total_rows
+            mariadb, postgres = connections.get()
+            
+            partition_rows = 0
+            stream = self.memory.stream(self._chunk_size(), row_bytes)
+            chunks = mariadb.iter_table_chunks(table_name, columns, stream.size, partition.name, where)
+            chunks = self.profiler.chunks(db_name, table_name, stream.read(chunks))
+            try:
+                with nullcontext() if routed else postgres.transaction():
+                    for df in self.metrics.timed_chunks(db_name, table_name, chunks):
+                        if exporter:
+                            with export_lock:
+                                exporter.write_chunk(df)
+                        
+                        with self.metrics.measure(db_name, table_name, "transform", len(df)), \
+                                self.profiler.stage(db_name, table_name, "transform", len(df)):
+                            processed_data = self.data_processor.process_table_data(table_name, df, db_name)
+                        with self.metrics.measure(db_name, table_name, "load", len(df)), \
+                                self.profiler.stage(db_name, table_name, "load", len(df)):
+                            if routed:
+                                target.write_chunk(processed_data)
+                            else:
+                                postgres.insert_data(table_name, processed_data)
+                        stream.release(df)
+                        
+                        partition_rows += len(df)
+                        with progress_lock:
+                            total_rows += len(df)
+            finally:
+                stream.close()
+            
+            if not routed:
+                self.checkpoints.complete_partition(db_name, table_name, partition.name, partition_rows,
+                                                    fingerprint)
+        
+        try:
+            with ThreadPoolExecutor(max_workers=self._partition_workers()) as executor:
+                for future in [executor.submit(load_partition, p) for p in partitions]:
+                    future.result()
+        finally:
+            connections.close()
+        
+        self.checkpoints.complete_table(db_name, table_name)
+        return total_rows
+        
+    def _partition_fingerprint(self, table_info: TableInfo) -> Optional[str]:
+        """Fingerprint the partition checkpoints of a table are recorded with"""
+        # Checkpoints of a run with another filter don't count
+        return with_filter(self._get_catalog().fingerprints.get((table_info.database, table_info.name)),
+                           self._row_filter(table_info.database, table_info.name))
+
+    def _completed_partitions(self, table_info: TableInfo,
+                              target: Optional[PartitionedTableLoader] = None) -> Dict[str, int]:
+        """Partitions of a table loaded by a previous run, which this run skips"""
+        if target is not None and target.routes:
+            return {}
+        return self.checkpoints.completed_partitions(table_info.database, table_info.name,
+                                                     self._partition_fingerprint(table_info))
+        
+    def _row_bytes(self, table_info: Optional[TableInfo]) -> float:
+        """Bytes a row of the table is estimated to take in memory, before a chunk has been measured"""
+        return table_info.avg_row_length * MEMORY_FACTOR if table_info else 0
+        
+    def _partition_workers(self) -> int:
+        """Number of partitions read or written concurrently for one table"""
+        return max(1, self.maria_config.getint("performance", "partition_workers", fallback=4))
+        
+    def _create_partition_loader(self, table_name: str,
+                                 db_name: Optional[str] = None) -> Optional[PartitionedTableLoader]:
+        """Create the loader of a table partitioned in table_schema.ini, if it is"""
+        spec = self.schema_parser.get_partition_spec(table_name)
+        if spec is None:
+            return None
+        loader = PartitionedTableLoader(spec, self.schema_parser, self.config, self._partition_workers(),
+                                        self._target_schema(db_name))
+        loader.prepare()
+        return loader
+        
+    def _large_object_setting(self, option: str, default: str) -> int:
+        """Read a size from the [large_objects] settings, in bytes"""
+        return parse_size(self.maria_config.get("large_objects", option, fallback=default))
+        
+    def _process_table(self, table_name: str, columns: List[str], no_download: bool,
+                       db_name: Optional[str] = None,
+                       chunks: Optional[Iterator[pd.DataFrame]] = None,
+                       mariadb: Optional[MariaDBConnector] = None,
+                       postgres: Optional[PostgresConnector] = None,
+                       cached: Optional[Dict[str, Any]] = None) -> None:
         """Process a single table
         
+        The table is streamed chunk by chunk. Unless no_download is set, each
+        extracted chunk is also written to Parquet on a background thread while
+        the same chunk is being loaded into PostgreSQL. Tables partitioned in
+        table_schema.ini are loaded into their child partitions directly. Tables
+        with large BLOB/TEXT values are read a few rows at a time and loaded in
+        chunks of at most [large_objects] max_in_flight bytes.
+        
         Args:
             table_name: Name of the table to process
             columns: List of columns to export
             no_download: If True, don't save data locally
+            db_name: Database the table belongs to, used for the export path
+            chunks: Chunks to load instead of extracting the table from MariaDB
+            mariadb: Connection to extract with, by default the manager's own
+            postgres: Connection to load with, by default the manager's own
+            cached: Spill cache entry the chunks are replayed from, which gives
+                the table's size and column types instead of the catalog, so
+                a replay never queries MariaDB
         """
         print(f"Processing table: {table_name}")
         
-        # Read data from MariaDB
-        df = self.mariadb.read_table(table_name, columns)
+        table_info = self._get_catalog().table(db_name, table_name) if db_name and chunks is None else None
+        if table_info:
+            expected_rows, row_size = table_info.rows, table_info.avg_row_length
+            column_types = {c.name: c.column_type for c in table_info.columns}
+        elif cached:
+            expected_rows = cached["rows"]
+            row_size = cached.get("avg_row_length") or cached["bytes"] // max(cached["rows"], 1)
+            column_types = cached.get("column_types")
+        else:
+            expected_rows, row_size, column_types = 0, 0, None
+
+        # Rows with large BLOB/TEXT values are read a few at a time and loaded
+        # in batches bounded by bytes rather than rows
+        large_columns = []
+        if chunks is None:
+            large_columns = large_object_columns(table_info, columns, self._large_object_setting(
+                "min_avg_row_size", "1MB"))
+        max_in_flight = self._large_object_setting("max_in_flight", "256MB")
+        batch_rows = max(1, max_in_flight // max(table_info.avg_row_length, 1)) if large_columns else None
+        
+        target = self._create_partition_loader(table_name, db_name)
+        # Partitioned tables are read partition by partition, unless they go
+        # through the spill cache, which stores whole tables
+        by_partition = bool(chunks is None and not large_columns and self.spill_cache is None
+                            and table_info and table_info.partitions)
+        if by_partition and not no_download and self._completed_partitions(table_info, target):
+            # The interrupted run wrote no manifest and may have exported part of
+            # a partition that was rolled back, so its files can't be carried on,
+            # and a new export would hold the remaining partitions only
+            print(f"  Skipping the Parquet export of {table_name}: the load resumes from checkpoints, "
+                  f"the files of the interrupted run are left as they are")
+            no_download = True
+        exporter = None if no_download else self._create_exporter(db_name, table_name, batch_rows, column_types)
+        total_rows = 0
+        
+        self.metrics.start_table(db_name or "", table_name, expected_rows, row_size)
+        try:
+            if by_partition:
+                total_rows = self._process_partitions(table_info, columns, exporter, target)
+                chunks = iter(())
+            stream = self.memory.stream(batch_rows or self._chunk_size(), row_size * MEMORY_FACTOR)
+            if chunks is None and large_columns:
+                print(f"  Streaming large columns {', '.join(large_columns)}")
+                streamer = LargeObjectStreamer(
+                    mariadb or self.mariadb, table_info, columns,
+                    max_in_flight=max_in_flight,
+                    rows_per_fetch=self.maria_config.getint("large_objects", "rows_per_fetch", fallback=100),
+                    where=self._row_filter(db_name, table_name),
+                )
+                chunks = self._extract_chunks(db_name, table_name, columns, mariadb, read=streamer.batches)
+            elif chunks is None:
+                chunks = self._extract_chunks(db_name, table_name, columns, mariadb, stream.size)
+            
+            total_rows += self._load_chunks(db_name, table_name, chunks, exporter, target,
+                                            postgres or self.postgres, stream)
+            
+            if target:
+                target.finish()
+        finally:
+            if target:
+                target.close()
+            self.metrics.finish_table(db_name or "", table_name)
+        
+        if exporter:
+            manifest = exporter.close()
+            print(f"  Exported {manifest['total_rows']} rows to {len(manifest['files'])} Parquet files")
         
-        if df.empty:
+        if total_rows == 0:
             print(f"  No data found in table {table_name}")
-            return
+        else:
+            print(f"  Migrated {total_rows} rows of {table_name}")
             
-        print(f"  Read {len(df)} rows")
+    def _load_chunks(self, db_name: Optional[str], table_name: str, chunks: Iterator[pd.DataFrame],
+                     exporter: Optional[ParquetExporter], target: Optional[PartitionedTableLoader],
+                     postgres: PostgresConnector, stream: Optional[GovernedStream] = None) -> int:
+        """Load a stream of chunks, exporting each chunk in the background
         
-        # Process data
-        processed_data = self.data_processor.process_table_data(table_name, df)
+        Each chunk is held against the memory governor until it has been
+        loaded and, when exporting, written to Parquet.
         
-        # Save to file if requested
-        if not no_download:
-            # Save to file logic here
-            pass
+        Returns:
+            Number of rows loaded
+        """
+        stream = stream or self.memory.stream(self._chunk_size())
+        total_rows = 0
+        try:
+            with ThreadPoolExecutor(max_workers=1) as export_pool:
+                pending_export = None
+                
+                # Read data from MariaDB
+                chunks = self.profiler.chunks(db_name or "", table_name, stream.read(chunks))
+                for df in self.metrics.timed_chunks(db_name or "", table_name, chunks):
+                    total_rows += len(df)
+                    
+                    # Save to file if requested, keeping at most one chunk in flight
+                    if exporter:
+                        if pending_export:
+                            pending_export.result()
+                        pending_export = export_pool.submit(exporter.write_chunk, df)
+                    
+                    # Process data
+                    with self.metrics.measure(db_name or "", table_name, "transform", len(df)), \
+                            self.profiler.stage(db_name or "", table_name, "transform", len(df)):
+                        processed_data = self.data_processor.process_table_data(table_name, df, db_name)
+                    
+                    # Insert into PostgreSQL
+                    with self.metrics.measure(db_name or "", table_name, "load", len(df)), \
+                            self.profiler.stage(db_name or "", table_name, "load", len(df)):
+                        if target:
+                            target.write_chunk(processed_data)
+                        else:
+                            postgres.insert_data(table_name, processed_data)
+                    
+                    # A chunk is released once it is both loaded and exported, so this loop never
+                    # holds memory while it waits for more, which could deadlock the workers
+                    if exporter:
+                        pending_export.add_done_callback(lambda _, chunk=df: stream.release(chunk))
+                    else:
+                        stream.release(df)
+                
+                if pending_export:
+                    pending_export.result()
+        finally:
+            stream.close()
         
-        # Insert into PostgreSQL
-        self.postgres.insert_data(table_name, processed_data)
-        print(f"  Inserted {len(processed_data)} rows into PostgreSQL")
\ No newline at end of file
+        return total_rows
@@ -0,0 +1,164 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Union
+
+import pandas as pd
+
+from config.partitioning import ChildPartition, PartitionSpec
+from config.schema_parser import SchemaParser
+from connectors.pool import ThreadConnections
+
+
+class PartitionedTableLoader:
+    """
+    Loads a partitioned PostgreSQL table straight into its child partitions.
+
+    Range and list children are created as standalone tables shaped like the
+    parent. Each chunk is split by child in Python and every part is copied
+    into its child, so PostgreSQL does no tuple routing through the parent,
+    and the parts of a chunk are copied in parallel. When loading is done
+    each child gets its indexes and a CHECK constraint matching its bounds,
+    which lets ATTACH PARTITION skip validating the rows; the CHECK is
+    dropped again once attached.
+
+    Hash partitioned tables cannot be routed outside PostgreSQL, so their
+    rows are copied into the parent.
+    """
+
+    def __init__(self, spec: PartitionSpec, schema_parser: SchemaParser, config, workers: int = 4,
+                 schema: Optional[str] = None):
+        self.spec = spec
+        self.schema_parser = schema_parser
+        self.table_name = spec.table
+        self.connections = ThreadConnections(config, schema=schema)
+        self.logger = logging.getLogger(__name__)
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+        self._pending = []
+        self._lock = threading.Lock()
+        self._detached: List[ChildPartition] = []
+        self.rows: Dict[str, int] = {}
+
+    @property
+    def routes(self) -> bool:
+        """Whether rows are copied into detached children, rather than into the parent"""
+        return self.spec.method != "hash"
+
+    def prepare(self) -> None:
+        """Create the children that do not exist yet as standalone tables
+
+        Children left detached by an interrupted run are emptied, since the
+        rows they hold can't be matched to what was committed at the source.
+        """
+        if self.spec.method == "hash":
+            return
+
+        postgres = self.connections.postgres()
+        names = [child.name.lower() for child in self.spec.children]
+        existing = {
+            name: attached for name, attached in postgres.execute_query("""
+            SELECT
+                c.relname, i.inhparent IS NOT NULL
+            FROM
+                pg_class c
+                LEFT JOIN pg_inherits i ON i.inhrelid = c.oid
+            WHERE
+                c.relnamespace = current_schema()::regnamespace
+                AND c.relname = ANY(%s)
+            """, (names,)) or []
+        }
+
+        for child in self.spec.children:
+            if child.name.lower() not in existing:
+                postgres.execute_query(
+                    f'CREATE TABLE "{child.name.lower()}" '
+                    f'(LIKE "{self.table_name.lower()}" INCLUDING DEFAULTS INCLUDING GENERATED)')
+            elif not existing[child.name.lower()]:
+                postgres.execute_query(f'TRUNCATE "{child.name.lower()}"')
+            if not existing.get(child.name.lower()):
+                self._detached.append(child)
+
+        if self._detached:
+            self.logger.info(f"Loading {len(self._detached)} detached partitions of {self.table_name}")
+
+    def _copy(self, target: str, df: pd.DataFrame) -> None:
+        self.connections.postgres().copy_dataframe(target, df)
+
+    def write_chunk(self, data: Union[List[Dict[str, Any]], pd.DataFrame]) -> None:
+        """Copy a chunk of rows into the child partitions they belong to
+
+        The copies of one chunk run in parallel while the caller reads the
+        next chunk; at most one chunk is in flight.
+        """
+        if data is None:
+            return
+        df = data if isinstance(data, pd.DataFrame) else pd.DataFrame(data)
+        if df.empty:
+            return
+
+        parts = {self.table_name: df} if self.spec.method == "hash" else self.spec.route(df)
+        with self._lock:
+            for future in self._pending:
+                future.result()
+            self._pending = [self._executor.submit(self._copy, target, rows) for target, rows in parts.items()]
+            for target, rows in parts.items():
+                self.rows[target] = self.rows.get(target, 0) + len(rows)
+
+    def _primary_key(self) -> Optional[str]:
+        primary_key = self.schema_parser.get_primary_key(self.table_name)
+        if primary_key:
+            return primary_key
+        for column, definition in self.schema_parser.get_column_definitions(self.table_name).items():
+            if "PRIMARY KEY" in definition.upper():
+                return column
+        return None
+
+    def _build_indexes(self, child: ChildPartition) -> None:
+        """Build the indexes of a loaded child and add its bound CHECK"""
+        postgres = self.connections.postgres()
+        name = child.name.lower()
+
+        primary_key = self._primary_key()
+        if primary_key:
+            has_primary_key = postgres.execute_query(
+                "SELECT 1 FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'p'", (f'"{name}"',))
+            if not has_primary_key:
+                postgres.execute_query(f'ALTER TABLE "{name}" ADD PRIMARY KEY ({primary_key})')
+        for column in self.schema_parser.get_unique_constraints(self.table_name):
+            postgres.execute_query(f'CREATE UNIQUE INDEX IF NOT EXISTS "{name}_{column}_key" ON "{name}" ({column})')
+        for column in self.schema_parser.get_indexes(self.table_name):
+            postgres.execute_query(f'CREATE INDEX IF NOT EXISTS "idx_{name}_{column}" ON "{name}" ({column})')
+
+        check = self.spec.check_clause(child)
+        if check:
+            postgres.execute_query(f'ALTER TABLE "{name}" DROP CONSTRAINT IF EXISTS "{name}_bound"')
+            postgres.execute_query(f'ALTER TABLE "{name}" ADD CONSTRAINT "{name}_bound" CHECK ({check})')
+
+    def finish(self) -> None:
+        """Wait for the last copies, then index and attach the loaded children"""
+        with self._lock:
+            for future in self._pending:
+                future.result()
+            self._pending = []
+
+        try:
+            for future in [self._executor.submit(self._build_indexes, child) for child in self._detached]:
+                future.result()
+
+            # Attaching locks the parent, so children are attached one at a
+            # time. The default child goes last, since every attach after it
+            # would have to scan it.
+            postgres = self.connections.postgres()
+            for child in sorted(self._detached, key=lambda c: c.default):
+                name = child.name.lower()
+                postgres.execute_query(
+                    f'ALTER TABLE "{self.table_name.lower()}" ATTACH PARTITION "{name}" '
+                    f'{self.spec.bound_clause(child)}')
+                postgres.execute_query(f'ALTER TABLE "{name}" DROP CONSTRAINT IF EXISTS "{name}_bound"')
+            self._detached = []
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+        self.connections.close()
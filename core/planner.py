@@ -0,0 +1,343 @@
+import heapq
+import json
+import logging
+import os
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional, Set, Tuple
+
+from config.table_sorter import TableSorter
+from core.large_objects import large_object_columns
+from models.catalog import ColumnInfo, TableInfo
+from utils.files import parse_size
+
+# Bytes per second of each stage when no earlier run has been measured
+DEFAULT_THROUGHPUT = {"extract": 20 * 1024 ** 2, "transform": 40 * 1024 ** 2, "load": 10 * 1024 ** 2}
+
+# Memory a chunk takes in pandas for each byte it takes on disk
+MEMORY_FACTOR = 4
+
+# Size of the zstd Parquet export compared with the data
+EXPORT_RATIO = 0.3
+
+# Storage bytes of fixed-width MariaDB types
+_FIXED_WIDTHS = {
+    "tinyint": 1, "smallint": 2, "mediumint": 3, "int": 4, "integer": 4, "bigint": 8, "float": 4,
+    "double": 8, "real": 8, "date": 3, "time": 3, "year": 1, "datetime": 8, "timestamp": 4, "bit": 1,
+}
+
+_MIN_CHUNK_SIZE = 10000
+_MAX_CHUNK_SIZE = 1000000
+
+
+def _column_width(column: ColumnInfo) -> float:
+    """Guess the average bytes a column takes in a row"""
+    if column.data_type in _FIXED_WIDTHS:
+        return _FIXED_WIDTHS[column.data_type]
+    if column.data_type in ("decimal", "numeric"):
+        return (column.numeric_precision or 10) // 2 + 1
+    if column.octet_length and column.octet_length < 65536:
+        # Variable-width columns are assumed half full
+        return max(1, column.octet_length / 2)
+    return 256
+
+
+@dataclass
+class TablePlan:
+    """Estimated cost of migrating one table"""
+    database: str
+    table: str
+    rows: int
+    bytes: int
+    large_object_bytes: int = 0
+    partitions: int = 0
+    chunk_size: int = 0
+    seconds: Dict[str, float] = field(default_factory=dict)
+    memory: int = 0
+    spill_bytes: int = 0
+    export_bytes: int = 0
+
+    @property
+    def total_seconds(self) -> float:
+        return sum(self.seconds.values())
+
+
+@dataclass
+class ScheduleEstimate:
+    """Simulated run of the migration units with a number of workers"""
+    workers: int
+    elapsed: float
+    peak_memory: int
+    units: List[Dict[str, Any]] = field(default_factory=list)
+
+
+class ThroughputHistory:
+    """
+    Stage throughput measured by earlier runs.
+
+    Reads the chunk events that MigrationMetrics appends to the metrics JSON
+    lines file. A table migrated before is estimated with its own rates,
+    other tables with the rates of all measured chunks. Stages without any
+    history use the rates measured by `migres probe`, if it was run, and
+    DEFAULT_THROUGHPUT otherwise.
+    """
+
+    def __init__(self, path: Optional[str] = ".migres/metrics.jsonl",
+                 probe_path: Optional[str] = ".migres/probe.json"):
+        self.path = path
+        self.probe_path = probe_path
+        self.chunks = 0
+        # (table or None, stage) -> [rows, bytes, seconds]
+        self.totals: Dict[Tuple[Optional[str], str], List[float]] = {}
+        # Bytes per second of each stage measured by migres probe
+        self.probe: Dict[str, float] = {}
+        self.logger = logging.getLogger(__name__)
+
+    def load(self) -> "ThroughputHistory":
+        self._load_probe()
+        if not self.path or not os.path.exists(self.path):
+            return self
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    continue
+                if event.get("event") != "chunk" or not event.get("seconds"):
+                    continue
+                self.chunks += 1
+                for key in ((event["table"], event["stage"]), (None, event["stage"])):
+                    totals = self.totals.setdefault(key, [0, 0, 0.0])
+                    totals[0] += event["rows"]
+                    totals[1] += event.get("bytes", 0)
+                    totals[2] += event["seconds"]
+        self.logger.info(f"Read {self.chunks} chunk measurements from {self.path}")
+        return self
+
+    def _load_probe(self) -> None:
+        if not self.probe_path or not os.path.exists(self.probe_path):
+            return
+        try:
+            with open(self.probe_path) as f:
+                rates = json.load(f).get("recommended", {}).get("rates", {})
+        except (OSError, ValueError, AttributeError):
+            self.logger.warning(f"Ignoring unreadable probe results in {self.probe_path}")
+            return
+        self.probe = {stage: rate for stage, rate in rates.items() if rate}
+
+    @property
+    def source(self) -> str:
+        sources = []
+        if self.chunks:
+            sources.append(f"{self.chunks} chunks measured in {self.path}")
+        if self.probe:
+            sources.append(f"{', '.join(sorted(self.probe))} rates from {self.probe_path}")
+        return ", ".join(sources) or "default rates"
+
+    def seconds(self, stage: str, table: str, rows: int, nbytes: int) -> float:
+        """Estimated seconds for a stage to process rows of a table"""
+        for key in ((table, stage), (None, stage)):
+            history_rows, history_bytes, history_seconds = self.totals.get(key, (0, 0, 0.0))
+            # A table's own rates only count once enough of it was measured
+            minimum = 1.0 if key[0] else 0.0
+            if not history_seconds or history_seconds < minimum:
+                continue
+            if history_bytes and nbytes:
+                return nbytes / (history_bytes / history_seconds)
+            if history_rows:
+                return rows / (history_rows / history_seconds)
+        return nbytes / self.probe.get(stage, DEFAULT_THROUGHPUT[stage])
+
+
+class MigrationPlanner:
+    """
+    Estimates the time, memory and disk a migration needs, without moving data.
+
+    Every exported table is costed from its catalog statistics (TABLE_ROWS,
+    AVG_ROW_LENGTH) restricted to the exported columns, and from the stage
+    throughput of earlier runs. The units TableSorter produces are then
+    scheduled on simulated workers the same way MigrationManager runs them,
+    to find the elapsed time and peak memory for the configured settings
+    and to recommend chunk size and parallelism.
+    """
+
+    def __init__(self, manager, history: Optional[ThroughputHistory] = None,
+                 no_download: bool = False, spill_cache: bool = False):
+        self.manager = manager
+        self.maria_config = manager.maria_config
+        self.history = history or ThroughputHistory(
+            self.maria_config.get("metrics", "jsonl", fallback=".migres/metrics.jsonl") or None,
+            self.maria_config.get("probe", "path", fallback=".migres/probe.json") or None).load()
+        self.no_download = no_download
+        self.spill_cache = spill_cache
+        self.chunk_memory = parse_size(self.maria_config.get("plan", "chunk_memory", fallback="256MB"))
+        self.memory_budget = parse_size(self.maria_config.get("plan", "memory_budget", fallback="4GB"))
+        self.max_workers = self.maria_config.getint("plan", "max_workers", fallback=16)
+
+    def _row_bytes(self, table: TableInfo, columns: List[str]) -> float:
+        """Average bytes of the given columns in a row of the table"""
+        widths = {column.name: _column_width(column) for column in table.columns}
+        total = sum(widths.values()) or 1
+        share = sum(widths.get(column, 0) for column in columns) / total
+        return (table.avg_row_length or total) * share
+
+    def recommended_chunk_size(self, row_bytes: float) -> int:
+        """Rows per chunk that keep one chunk within chunk_memory"""
+        rows = self.chunk_memory / max(row_bytes * MEMORY_FACTOR, 1)
+        rows = int(min(max(rows, _MIN_CHUNK_SIZE), _MAX_CHUNK_SIZE))
+        return rows // _MIN_CHUNK_SIZE * _MIN_CHUNK_SIZE
+
+    def plan_table(self, table: TableInfo, chunk_size: int, partition_workers: int) -> TablePlan:
+        """Estimate the cost of one table"""
+        columns = self.manager._get_columns_to_export(table.name, table.database)
+        large_columns = large_object_columns(table, columns, self.manager._large_object_setting(
+            "min_avg_row_size", "1MB"))
+        bulk_columns = [c for c in columns if c not in large_columns]
+
+        # Large values travel with their rows, they are only counted apart
+        row_bytes = self._row_bytes(table, bulk_columns)
+        nbytes = int(table.rows * row_bytes)
+        large_bytes = int(table.rows * self._row_bytes(table, large_columns)) if large_columns else 0
+        key = f"{table.database}.{table.name}"
+
+        plan = TablePlan(table.database, table.name, table.rows, nbytes, large_bytes, len(table.partitions),
+                         self.recommended_chunk_size(row_bytes))
+        plan.seconds = {
+            stage: self.history.seconds(stage, key, table.rows, nbytes + large_bytes)
+            for stage in ("extract", "transform", "load")
+        }
+
+        # A chunk is held as read and as processed, plus once more while exported
+        copies = 2 if self.no_download else 3
+        chunk_bytes = min(chunk_size, max(table.rows, 1)) * row_bytes * MEMORY_FACTOR * copies
+        parallel = 1
+        if table.partitions and not self.spill_cache:
+            parallel = min(len(table.partitions), partition_workers)
+            plan.seconds = {stage: seconds / parallel for stage, seconds in plan.seconds.items()}
+        plan.memory = int(chunk_bytes * parallel)
+        if large_columns:
+            # Rows with large values are read in batches of max_in_flight bytes instead
+            max_in_flight = self.manager._large_object_setting("max_in_flight", "256MB")
+            plan.memory = int(max_in_flight * MEMORY_FACTOR * copies)
+
+        plan.spill_bytes = nbytes + large_bytes if self.spill_cache else 0
+        plan.export_bytes = 0 if self.no_download else int((nbytes + large_bytes) * EXPORT_RATIO)
+        return plan
+
+    def simulate(self, units: List[List[Tuple[str, str]]], dependencies: List[Set[int]],
+                 tables: Dict[Tuple[str, str], TablePlan], workers: int) -> ScheduleEstimate:
+        """Replay MigrationManager._run_units with estimated durations
+
+        A unit starts once the units it depends on are done and a worker is
+        free, in the order it was queued; its tables run one after another.
+        """
+        durations = [sum(tables[t].total_seconds for t in unit if t in tables) for unit in units]
+        memory = [max((tables[t].memory for t in unit if t in tables), default=0) for unit in units]
+        waiting = [set(d) for d in dependencies]
+        dependents: List[List[int]] = [[] for _ in units]
+        for i, unit_dependencies in enumerate(waiting):
+            for j in unit_dependencies:
+                dependents[j].append(i)
+
+        queue = [i for i, d in enumerate(waiting) if not d]
+        running: List[Tuple[float, int]] = []
+        estimate = ScheduleEstimate(workers, 0.0, 0)
+        now = 0.0
+        while queue or running:
+            while queue and len(running) < workers:
+                i = queue.pop(0)
+                heapq.heappush(running, (now + durations[i], i))
+                estimate.units.append({
+                    "unit": [".".join(t) for t in units[i]],
+                    "start": round(now, 1), "end": round(now + durations[i], 1),
+                })
+                estimate.peak_memory = max(estimate.peak_memory, sum(memory[j] for _, j in running))
+            now, i = heapq.heappop(running)
+            for j in dependents[i]:
+                waiting[j].discard(i)
+                if not waiting[j]:
+                    queue.append(j)
+        estimate.elapsed = now
+        return estimate
+
+    def plan(self, workers: Optional[int] = None, chunk_size: Optional[int] = None) -> Dict[str, Any]:
+        """Estimate the migration with the configured settings and recommend better ones
+
+        Args:
+            workers: Workers to estimate with, instead of the configured ones
+            chunk_size: Chunk size to estimate with, instead of the configured one
+
+        Returns:
+            Report with the per-table estimates, the simulated schedule, totals
+            and recommended settings
+        """
+        manager = self.manager
+        catalog = manager._get_catalog()
+        sorter = TableSorter(manager.mariadb, manager.postgres, self.maria_config, catalog, manager.catalog_cache)
+        levels = manager._migration_levels(sorter)
+        units = [unit for level in levels for unit in level]
+        dependencies = manager._unit_dependencies(levels)
+
+        workers = workers or manager._workers()
+        chunk_size = chunk_size or manager._chunk_size()
+        partition_workers = manager._partition_workers()
+
+        tables = {}
+        for unit in units:
+            for db_name, table_name in unit:
+                table = catalog.table(db_name, table_name)
+                if table is not None:
+                    tables[(db_name, table_name)] = self.plan_table(table, chunk_size, partition_workers)
+        schedule = self.simulate(units, dependencies, tables, workers)
+
+        # The widest table decides the chunk size every table can use
+        large = [t for t in tables.values() if t.rows > _MIN_CHUNK_SIZE]
+        recommended_chunk_size = min((t.chunk_size for t in large), default=chunk_size)
+        recommended_tables = {
+            key: self.plan_table(catalog.table(*key), recommended_chunk_size, partition_workers) for key in tables
+        }
+        recommended = self._recommend_workers(units, dependencies, recommended_tables)
+
+        return {
+            "throughput": self.history.source,
+            "settings": {"workers": workers, "chunk_size": chunk_size, "partition_workers": partition_workers},
+            "tables": [{**vars(t), "total_seconds": t.total_seconds} for t in tables.values()],
+            "schedule": schedule.units,
+            "total": {
+                "elapsed_seconds": round(schedule.elapsed, 1),
+                "serial_seconds": round(sum(t.total_seconds for t in tables.values()), 1),
+                "rows": sum(t.rows for t in tables.values()),
+                "bytes": sum(t.bytes + t.large_object_bytes for t in tables.values()),
+                "peak_memory": schedule.peak_memory,
+                "spill_bytes": sum(t.spill_bytes for t in tables.values()),
+                "export_bytes": sum(t.export_bytes for t in tables.values()),
+            },
+            "recommended": {
+                "chunk_size": recommended_chunk_size,
+                "workers": recommended.workers,
+                "partition_workers": self._recommend_partition_workers(recommended_tables, recommended_chunk_size),
+                "elapsed_seconds": round(recommended.elapsed, 1),
+                "peak_memory": recommended.peak_memory,
+            },
+        }
+
+    def _recommend_workers(self, units: List[List[Tuple[str, str]]], dependencies: List[Set[int]],
+                           tables: Dict[Tuple[str, str], TablePlan]) -> ScheduleEstimate:
+        """Fewest workers within 5% of the fastest schedule that fits the memory budget"""
+        estimates = []
+        for workers in range(1, max(1, min(self.max_workers, len(units))) + 1):
+            estimate = self.simulate(units, dependencies, tables, workers)
+            if estimate.peak_memory > self.memory_budget and estimates:
+                break
+            estimates.append(estimate)
+        fastest = min(e.elapsed for e in estimates)
+        return next(e for e in estimates if e.elapsed <= fastest * 1.05)
+
+    def _recommend_partition_workers(self, tables: Dict[Tuple[str, str], TablePlan], chunk_size: int) -> int:
+        """Partitions read at once for the largest partitioned table, within the memory budget"""
+        partitioned = [t for t in tables.values() if t.partitions]
+        if not partitioned:
+            return self.manager._partition_workers()
+        largest = max(partitioned, key=lambda t: t.bytes)
+        per_partition = largest.memory / max(1, min(largest.partitions, self.manager._partition_workers()))
+        fits = int(self.memory_budget // per_partition) if per_partition else largest.partitions
+        return max(1, min(largest.partitions, fits, self.max_workers))
@@ -0,0 +1,273 @@
+import logging
+import statistics
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Sequence
+
+import pandas as pd
+
+from connectors.pool import ThreadConnections
+from core.large_objects import large_object_columns
+from core.planner import MEMORY_FACTOR
+from utils.files import write_json_atomic
+
+# Schema of the scratch tables COPY throughput is measured with. Each probe
+# creates a table of its own in it and drops only that table afterwards.
+SCRATCH_SCHEMA = "migres_probe"
+
+# A setting is recommended once it reaches this share of the best measured rate
+NEAR_BEST = 0.9
+
+
+def _near_best(results: List[Dict[str, Any]], key: str, rate: str = "rows_per_second") -> Optional[Dict[str, Any]]:
+    """The result with the smallest key whose rate is close to the best one"""
+    if not results:
+        return None
+    best = max(result[rate] for result in results)
+    return min((result for result in results if result[rate] >= best * NEAR_BEST), key=lambda r: r[key])
+
+
+def _rates(rows: int, nbytes: int, seconds: float) -> Dict[str, Any]:
+    seconds = max(seconds, 1e-9)
+    return {"rows": rows, "bytes": nbytes, "seconds": round(seconds, 6),
+            "rows_per_second": round(rows / seconds, 1), "bytes_per_second": round(nbytes / seconds, 1)}
+
+
+class ThroughputProbe:
+    """
+    Measures what the source and target servers can actually sustain
+
+    Reads a sample of the largest exported tables at several fetch sizes,
+    times round trips to both servers, and copies the rows read into an
+    UNLOGGED scratch table at several COPY buffer sizes and writer counts.
+    Bytes are counted as rows times the catalog's average row length, the
+    way MigrationMetrics counts them, so the rates can stand in for run
+    history in `migres plan`.
+
+    The rows copied are held in memory, so they are read without large
+    object columns and only up to sample_bytes. The scratch table gets a
+    unique name in the migres_probe schema, so no table of the target's
+    own schemas is ever touched.
+
+    The scratch table skips the WAL, so the COPY rates are an upper bound
+    for logged target tables.
+    """
+
+    def __init__(self, manager, tables: int = 3, rows: int = 200000,
+                 fetch_sizes: Sequence[int] = (1000, 10000, 100000),
+                 buffer_sizes: Sequence[int] = (10000, 50000, 100000),
+                 writers: Sequence[int] = (1, 2, 4, 8), round_trips: int = 20,
+                 sample_bytes: int = 256 * 1024 ** 2):
+        """
+        Args:
+            manager: MigrationManager giving the catalog, selection and connections
+            tables: Number of the largest exported tables read
+            rows: Rows read from each table at each fetch size
+            fetch_sizes: Rows fetched at a time from MariaDB
+            buffer_sizes: Rows sent by each COPY
+            writers: Concurrent COPY connections
+            round_trips: Queries timed for the latency of each server
+            sample_bytes: Most bytes of rows held in memory for the COPY measurements
+        """
+        self.manager = manager
+        self.tables = tables
+        self.rows = rows
+        self.fetch_sizes = sorted(fetch_sizes)
+        self.buffer_sizes = sorted(buffer_sizes)
+        self.writers = sorted(writers)
+        self.round_trips = round_trips
+        self.sample_bytes = sample_bytes
+        self.logger = logging.getLogger(__name__)
+
+    def _sample_tables(self) -> list:
+        """The largest exported tables, by data length"""
+        exported = self.manager._get_tables_to_export()
+        catalog = self.manager._get_catalog()
+        tables = [
+            catalog.table(db_name, table) for db_name, names in exported.items() for table in names
+        ]
+        tables = [t for t in tables if t is not None and t.rows > 0]
+        return sorted(tables, key=lambda t: t.data_length, reverse=True)[:self.tables]
+
+    def latency(self, connector) -> float:
+        """Median milliseconds of a trivial query"""
+        timings = []
+        for _ in range(self.round_trips):
+            started = time.perf_counter()
+            connector.execute_query("SELECT 1")
+            timings.append(time.perf_counter() - started)
+        return round(statistics.median(timings) * 1000, 3)
+
+    def read(self, table, fetch_size: int) -> Dict[str, Any]:
+        """Read up to self.rows rows of a table, fetch_size rows at a time"""
+        mariadb = self.manager.mariadb
+        mariadb.select_database(table.database)
+        columns = self.manager._get_columns_to_export(table.name, table.database)
+        rows = 0
+        started = time.perf_counter()
+        for df in mariadb.iter_table_chunks(table.name, columns, fetch_size, limit=self.rows):
+            rows += len(df)
+        seconds = time.perf_counter() - started
+        return {"table": f"{table.database}.{table.name}", "fetch_size": fetch_size,
+                **_rates(rows, rows * table.avg_row_length, seconds)}
+
+    def sample(self, table) -> pd.DataFrame:
+        """
+        Read the rows COPY is measured with
+
+        Large object columns are left out, and rows are read until the
+        largest COPY buffer is filled or sample_bytes are held.
+        """
+        columns = self.manager._get_columns_to_export(table.name, table.database)
+        large_columns = large_object_columns(table, columns, self.manager._large_object_setting(
+            "min_avg_row_size", "1MB"))
+        columns = [c for c in columns if c not in large_columns]
+
+        mariadb = self.manager.mariadb
+        mariadb.select_database(table.database)
+        chunks, nbytes = [], 0
+        for df in mariadb.iter_table_chunks(table.name, columns, self.fetch_sizes[0], limit=self.buffer_sizes[-1]):
+            chunks.append(df)
+            nbytes += int(df.memory_usage(deep=True).sum())
+            if nbytes >= self.sample_bytes:
+                break
+        return pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(columns=columns)
+
+    def open_writers(self, executor: ThreadPoolExecutor, connections: ThreadConnections) -> None:
+        """
+        Open the PostgreSQL connection of every thread of the writer pool
+
+        The COPY measurements then reuse the same connections, and none of
+        them times a connect.
+        """
+        threads = self.writers[-1]
+        # Every thread waits for the others, so each opens a connection of its own
+        opened = threading.Barrier(threads)
+
+        def open_connection(_):
+            try:
+                connections.postgres()
+            finally:
+                opened.wait()
+
+        list(executor.map(open_connection, range(threads)))
+
+    def copy(self, executor: ThreadPoolExecutor, connections: ThreadConnections, scratch_table: str,
+             sample: pd.DataFrame, row_size: float, buffer_rows: int, writers: int) -> Dict[str, Any]:
+        """Copy the sample into the scratch table from several connections of the writer pool at once"""
+        postgres = connections.postgres()
+        postgres.execute_query(f'TRUNCATE "{scratch_table}"')
+
+        def write(_):
+            connections.postgres().insert_data(scratch_table, sample, batch_size=buffer_rows)
+
+        started = time.perf_counter()
+        list(executor.map(write, range(writers)))
+        seconds = time.perf_counter() - started
+        rows = len(sample) * writers
+        return {"buffer_rows": buffer_rows, "writers": writers, **_rates(rows, rows * row_size, seconds)}
+
+    def run(self) -> Dict[str, Any]:
+        """
+        Take every measurement
+
+        Returns:
+            Report with the latencies, read and COPY rates, and the
+            recommended chunk_size and workers
+        """
+        tables = self._sample_tables()
+        if not tables:
+            raise ValueError("No exported table has rows to probe")
+        mariadb, postgres = self.manager.mariadb, self.manager.postgres
+
+        report: Dict[str, Any] = {
+            "time": time.time(),
+            "latency_ms": {"mariadb": self.latency(mariadb), "postgres": self.latency(postgres)},
+            "read": [], "copy": [],
+        }
+
+        for table in tables:
+            # A first read warms the server's caches, so fetch sizes are compared fairly
+            self.read(table, self.fetch_sizes[-1])
+            for fetch_size in self.fetch_sizes:
+                result = self.read(table, fetch_size)
+                print(f"  read {result['table']} fetching {fetch_size:,} rows: "
+                      f"{result['rows_per_second']:,.0f} rows/s, {result['bytes_per_second'] / 1024 ** 2:.1f} MB/s")
+                report["read"].append(result)
+
+        # The largest table's rows, as read, are what COPY is measured with
+        table = tables[0]
+        sample = self.sample(table)
+        if not len(sample):
+            raise ValueError(f"No rows could be read from {table.database}.{table.name}")
+        if len(sample) < self.buffer_sizes[-1]:
+            print(f"  COPY measured with {len(sample):,} rows of {table.database}.{table.name}, "
+                  f"the rows that fit in {self.sample_bytes / 1024 ** 2:.0f} MB")
+        row_size = table.avg_row_length
+        if len(sample.columns) < len(self.manager._get_columns_to_export(table.name, table.database)):
+            # Without the large columns a row is counted as it is held, like a measured chunk
+            row_size = sample.memory_usage(deep=True).sum() / len(sample) / MEMORY_FACTOR
+
+        # Every writer connection resolves the scratch table in the probe's own schema
+        connections = ThreadConnections(self.manager.config, schema=SCRATCH_SCHEMA)
+        scratch = connections.postgres()
+        scratch_table = f"probe_{uuid.uuid4().hex[:12]}"
+        definitions = ", ".join(f'"{column.lower()}" text' for column in sample.columns)
+        # One pool of writer threads, with their connections, serves every measurement
+        executor = ThreadPoolExecutor(max_workers=self.writers[-1])
+        try:
+            scratch.select_schema(SCRATCH_SCHEMA, create=True)
+            scratch.execute_query(f'CREATE UNLOGGED TABLE "{scratch_table}" ({definitions})')
+            self.open_writers(executor, connections)
+            for buffer_rows in self.buffer_sizes:
+                for writers in self.writers:
+                    result = self.copy(executor, connections, scratch_table, sample, row_size, buffer_rows, writers)
+                    print(f"  COPY {buffer_rows:,} rows at a time with {writers} writers: "
+                          f"{result['rows_per_second']:,.0f} rows/s, {result['bytes_per_second'] / 1024 ** 2:.1f} MB/s")
+                    report["copy"].append(result)
+        finally:
+            executor.shutdown()
+            try:
+                scratch.execute_query(f'DROP TABLE IF EXISTS "{SCRATCH_SCHEMA}"."{scratch_table}"')
+            finally:
+                connections.close()
+
+        report["recommended"] = self.recommend(report)
+        return report
+
+    def recommend(self, report: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Pick chunk_size and workers from the measurements
+
+        The smallest fetch size and COPY buffer that come close to the best
+        rate are preferred, since they hold the least memory; chunk_size is
+        the larger of the two. workers is the smallest writer count that
+        comes close to the best total COPY rate at that buffer.
+        """
+        reads = []
+        for fetch_size in self.fetch_sizes:
+            results = [r for r in report["read"] if r["fetch_size"] == fetch_size]
+            if results:
+                reads.append({"fetch_size": fetch_size,
+                              "rows_per_second": sum(r["rows_per_second"] for r in results) / len(results),
+                              "bytes_per_second": sum(r["bytes_per_second"] for r in results) / len(results)})
+        read = _near_best(reads, "fetch_size")
+        single = [r for r in report["copy"] if r["writers"] == self.writers[0]]
+        buffer = _near_best(single, "buffer_rows")
+        chunk_size = max(read["fetch_size"] if read else 0, buffer["buffer_rows"] if buffer else 0)
+
+        parallel = [r for r in report["copy"] if buffer and r["buffer_rows"] == buffer["buffer_rows"]]
+        writers = _near_best(parallel, "writers")
+        return {
+            "chunk_size": chunk_size or None,
+            "workers": writers["writers"] if writers else None,
+            # Rates of one worker at those settings, used by ThroughputHistory
+            "rates": {"extract": read["bytes_per_second"] if read else None,
+                      "load": buffer["bytes_per_second"] if buffer else None},
+        }
+
+    @staticmethod
+    def save(report: Dict[str, Any], path: str) -> None:
+        write_json_atomic(path, report)
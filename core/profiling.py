@@ -0,0 +1,227 @@
+import cProfile
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from typing import Dict, Any, Iterable, Iterator, List, Optional
+
+import pandas as pd
+
+from utils.files import write_json_atomic
+
+_NULL_STAGE = nullcontext()
+
+# tracemalloc.reset_peak is only available from Python 3.9
+_RESET_PEAK = hasattr(tracemalloc, "reset_peak")
+
+
+def _peak_growth(base: int, peak_before: int) -> int:
+    """Bytes a block allocated at its peak, above what was traced when it started
+
+    Without reset_peak the traced peak covers the whole run, so it only
+    tells about the block when the block raised it; otherwise the memory
+    still held at the end of the block is the best estimate.
+    """
+    current, peak = tracemalloc.get_traced_memory()
+    if not _RESET_PEAK and peak <= peak_before:
+        peak = current
+    return max(peak - base, 0)
+
+
+class NullProfiler:
+    """Profiler used when profiling is off; every hook does nothing"""
+
+    enabled = False
+
+    def start(self) -> None:
+        pass
+
+    def stop(self) -> None:
+        pass
+
+    def stage(self, database: str, table: str, stage: str, rows: int = 0):
+        return _NULL_STAGE
+
+    def chunks(self, database: str, table: str, chunks: Iterable[pd.DataFrame]) -> Iterable[pd.DataFrame]:
+        return chunks
+
+    def report(self) -> Optional[Dict[str, Any]]:
+        return None
+
+
+class StageProfiler:
+    """
+    CPU and memory profiler for the stages of a migration.
+
+    Every block run through stage() is profiled with cProfile, one profile
+    per stage and thread, merged when the report is written. tracemalloc runs
+    for the whole migration; the peak traced memory of each block is recorded
+    per chunk and per table, and whenever a stage reaches a new peak its
+    largest live allocations are kept as that stage's biggest allocators.
+
+    tracemalloc peaks are process wide, so with several workers a chunk's peak
+    includes what other threads allocated at the same time.
+    """
+
+    enabled = True
+
+    def __init__(self, directory: str = ".migres/profile", top: int = 25, frames: int = 10):
+        """
+        Args:
+            directory: Where the report and the per-stage .prof files are written
+            top: Number of functions and allocators listed per stage
+            frames: Stack frames recorded by tracemalloc for each allocation
+        """
+        self.directory = directory
+        self.top = top
+        self.frames = frames
+        self.chunk_records: List[Dict[str, Any]] = []
+        self.allocators: Dict[str, List[Dict[str, Any]]] = {}
+        self._peaks: Dict[str, int] = {}
+        self._profiles: List[tuple] = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._started_tracing = False
+
+    def start(self) -> None:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self._started_tracing = True
+
+    def stop(self) -> None:
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def _profile(self, stage: str) -> cProfile.Profile:
+        profiles = getattr(self._local, "profiles", None)
+        if profiles is None:
+            profiles = self._local.profiles = {}
+        if stage not in profiles:
+            profiles[stage] = cProfile.Profile()
+            with self._lock:
+                self._profiles.append((stage, profiles[stage]))
+        return profiles[stage]
+
+    @contextmanager
+    def stage(self, database: str, table: str, stage: str, rows: int = 0):
+        """Profile a block of work on one chunk
+
+        Yields a dict whose "rows" entry can be set once the chunk size is
+        known, for blocks that produce the chunk.
+        """
+        record = {"table": f"{database}.{table}", "stage": stage, "rows": rows}
+        profile = self._profile(stage)
+        if _RESET_PEAK:
+            tracemalloc.reset_peak()
+        base, peak_before = tracemalloc.get_traced_memory()
+        started = time.perf_counter()
+        try:
+            # Python 3.12+ allows a single active profiler at a time, so a
+            # block overlapping another thread's block is only timed
+            profile.enable()
+            profiled = True
+        except ValueError:
+            profiled = False
+        try:
+            yield record
+        finally:
+            if profiled:
+                profile.disable()
+            record["seconds"] = round(time.perf_counter() - started, 6)
+            record["peak_bytes"] = _peak_growth(base, peak_before)
+            record["profiled"] = profiled
+            if not record.pop("exhausted", False):
+                self._record(stage, record)
+
+    def _record(self, stage: str, record: Dict[str, Any]) -> None:
+        with self._lock:
+            self.chunk_records.append(record)
+            if record["peak_bytes"] <= self._peaks.get(stage, -1):
+                return
+            self._peaks[stage] = record["peak_bytes"]
+
+        # The block's results are still referenced by the caller, so the
+        # live allocations show where the stage's memory went
+        statistics = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        ]).statistics("lineno")[:self.top]
+        allocators = [
+            {"location": str(stat.traceback[0]), "bytes": stat.size, "blocks": stat.count}
+            for stat in statistics
+        ]
+        with self._lock:
+            self.allocators[stage] = allocators
+
+    def chunks(self, database: str, table: str, chunks: Iterable[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+        """Pass chunks through, profiling the extraction of each one"""
+        iterator = iter(chunks)
+        while True:
+            with self.stage(database, table, "extract") as record:
+                try:
+                    df = next(iterator)
+                except StopIteration:
+                    record["exhausted"] = True
+                    return
+                record["rows"] = len(df)
+            yield df
+
+    def _hottest(self, stats: pstats.Stats) -> List[Dict[str, Any]]:
+        functions = sorted(stats.stats.items(), key=lambda item: item[1][2], reverse=True)[:self.top]
+        return [
+            {
+                "function": f"{os.path.basename(filename)}:{line}({name})",
+                "calls": calls,
+                "own_seconds": round(own, 6),
+                "cumulative_seconds": round(cumulative, 6),
+            }
+            for (filename, line, name), (_, calls, own, cumulative, _) in functions
+        ]
+
+    def report(self) -> Dict[str, Any]:
+        """Write the profiling report and the per-stage pstats files
+
+        Returns:
+            The report, ranking the hottest functions and biggest allocators
+            of every stage
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        merged: Dict[str, pstats.Stats] = {}
+        for stage, profile in self._profiles:
+            profile.create_stats()
+            if not profile.stats:
+                continue
+            if stage in merged:
+                merged[stage].add(profile)
+            else:
+                merged[stage] = pstats.Stats(profile)
+
+        stages: Dict[str, Any] = {}
+        tables: Dict[str, Any] = {}
+        for record in self.chunk_records:
+            summary = stages.setdefault(record["stage"], {"chunks": 0, "rows": 0, "seconds": 0.0, "peak_bytes": 0})
+            summary["chunks"] += 1
+            summary["rows"] += record["rows"]
+            summary["seconds"] += record["seconds"]
+            summary["peak_bytes"] = max(summary["peak_bytes"], record["peak_bytes"])
+
+            table = tables.setdefault(record["table"], {"chunks": 0, "seconds": {}, "peak_bytes": 0})
+            table["chunks"] += record["stage"] == "extract"
+            table["seconds"][record["stage"]] = round(table["seconds"].get(record["stage"], 0.0) + record["seconds"], 6)
+            table["peak_bytes"] = max(table["peak_bytes"], record["peak_bytes"])
+
+        for stage, summary in stages.items():
+            summary["seconds"] = round(summary["seconds"], 6)
+            if stage in merged:
+                path = os.path.join(self.directory, f"{stage}.prof")
+                merged[stage].dump_stats(path)
+                summary["pstats"] = path
+                summary["hottest"] = self._hottest(merged[stage])
+            summary["allocators"] = self.allocators.get(stage, [])
+
+        report = {"stages": stages, "tables": tables, "chunks": self.chunk_records}
+        write_json_atomic(os.path.join(self.directory, "profile_report.json"), report)
+        return report
@@ -0,0 +1,52 @@
+import json
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+
+class RejectWriter:
+    """
+    Appends rows that can't be loaded to one JSON Lines file per table
+
+    Files are written under a directory per database, as tables of the same
+    name can be migrated from several databases. Each line holds the
+    database, the table, the column and error that rejected the row and the
+    row's values as read from MariaDB, so the rows can be fixed and loaded
+    later. Writes from concurrent workers are serialized.
+    """
+
+    def __init__(self, directory: str = ".migres/rejects"):
+        self.directory = directory
+        self.counts: Dict[Tuple[Optional[str], str], int] = {}
+        self._lock = threading.Lock()
+
+    def path(self, db_name: Optional[str], table_name: str) -> str:
+        directory = os.path.join(self.directory, db_name) if db_name else self.directory
+        return os.path.join(directory, f"{table_name}.jsonl")
+
+    def write(self, db_name: Optional[str], table_name: str, rows: pd.DataFrame,
+              columns: List[str], errors: List[str]) -> None:
+        """
+        Record rejected rows
+
+        Args:
+            db_name: Database the table belongs to
+            table_name: Table the rows belong to
+            rows: The rejected rows
+            columns: Column that rejected each row
+            errors: Error of each row
+        """
+        lines = [
+            json.dumps({"database": db_name, "table": table_name, "column": column, "error": error, "row": row},
+                       default=str)
+            for row, column, error in zip(rows.to_dict("records"), columns, errors)
+        ]
+        path = self.path(db_name, table_name)
+        with self._lock:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "a", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+            key = (db_name, table_name)
+            self.counts[key] = self.counts.get(key, 0) + len(lines)
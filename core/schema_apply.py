@@ -0,0 +1,221 @@
+import logging
+import re
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Set
+
+from config.schema_parser import SchemaParser
+
+# Current state of the target schema, one query per catalog
+TABLES_QUERY = """
+SELECT c.relname, c.relkind
+FROM pg_class c
+WHERE c.relnamespace = current_schema()::regnamespace AND c.relkind IN ('r', 'p')
+"""
+
+COLUMNS_QUERY = """
+SELECT c.relname, a.attname
+FROM pg_attribute a JOIN pg_class c ON c.oid = a.attrelid
+WHERE c.relnamespace = current_schema()::regnamespace AND c.relkind IN ('r', 'p')
+    AND a.attnum > 0 AND NOT a.attisdropped
+"""
+
+CONSTRAINTS_QUERY = """
+SELECT c.relname, con.contype, pg_get_constraintdef(con.oid)
+FROM pg_constraint con JOIN pg_class c ON c.oid = con.conrelid
+WHERE c.relnamespace = current_schema()::regnamespace AND con.contype IN ('p', 'u', 'f')
+"""
+
+INDEXES_QUERY = """
+SELECT tablename, indexname FROM pg_indexes WHERE schemaname = current_schema()
+"""
+
+
+def _normalize(definition: str) -> str:
+    """Canonical form of a constraint definition, for comparing the ini with pg_catalog"""
+    definition = re.sub(r'["\s]', "", definition.lower())
+    return definition.replace("public.", "")
+
+
+def _quote(name: str) -> str:
+    return f'"{name.lower()}"'
+
+
+@dataclass
+class TargetState:
+    """Tables, columns, constraints and indexes present in the target schema"""
+    tables: Set[str] = field(default_factory=set)
+    columns: Dict[str, Set[str]] = field(default_factory=dict)
+    primary_keys: Set[str] = field(default_factory=set)
+    constraints: Dict[str, Set[str]] = field(default_factory=dict)
+    indexes: Set[str] = field(default_factory=set)
+
+
+@dataclass
+class SchemaPlan:
+    """DDL needed to bring the target in line with table_schema.ini
+
+    tables holds the statements creating tables and columns, run in one
+    transaction, and primary_keys the primary keys added to existing
+    tables. These are applied before the data is loaded. indexes holds the
+    unique and index statements of each table, independent between tables,
+    and foreign_keys the foreign keys. These are added once the data is
+    loaded, so COPY does not maintain the indexes row by row and the tables
+    of a foreign key cycle can be loaded one after the other.
+    """
+    tables: List[str] = field(default_factory=list)
+    primary_keys: List[str] = field(default_factory=list)
+    indexes: Dict[str, List[str]] = field(default_factory=dict)
+    foreign_keys: List[str] = field(default_factory=list)
+
+    @property
+    def pre_load(self) -> List[str]:
+        return self.tables + self.primary_keys
+
+    @property
+    def post_load(self) -> List[str]:
+        return [s for group in self.indexes.values() for s in group] + self.foreign_keys
+
+    @property
+    def statements(self) -> List[str]:
+        return self.pre_load + self.post_load
+
+
+class SchemaApplier:
+    """
+    Applies table_schema.ini to PostgreSQL by diffing it against pg_catalog.
+
+    The current state is read with four catalog queries, compared with the
+    parsed definitions, and only missing tables, columns, keys, indexes and
+    foreign keys are created. Existing columns are never altered or dropped.
+    apply runs before the data is loaded and creates tables and primary
+    keys; apply_constraints runs after it and adds everything else.
+    """
+
+    def __init__(self, postgres, schema_parser: SchemaParser, workers: int = 4):
+        self.postgres = postgres
+        self.parser = schema_parser
+        self.workers = workers
+        self.logger = logging.getLogger(__name__)
+
+    def read_state(self) -> TargetState:
+        """Read the current target schema from pg_catalog"""
+        state = TargetState()
+        for name, _ in self.postgres.execute_query(TABLES_QUERY) or []:
+            state.tables.add(name)
+        for table, column in self.postgres.execute_query(COLUMNS_QUERY) or []:
+            state.columns.setdefault(table, set()).add(column)
+        for table, contype, definition in self.postgres.execute_query(CONSTRAINTS_QUERY) or []:
+            if contype == "p":
+                state.primary_keys.add(table)
+            state.constraints.setdefault(table, set()).add(_normalize(definition))
+        for _, index in self.postgres.execute_query(INDEXES_QUERY) or []:
+            state.indexes.add(index)
+        return state
+
+    def plan(self, state: TargetState) -> SchemaPlan:
+        """Work out the DDL that is missing from the target"""
+        plan = SchemaPlan()
+
+        for table in self.parser.get_tables():
+            name = table.lower()
+            column_defs = self.parser.get_column_definitions(table)
+            if not column_defs:
+                continue
+            spec = self.parser.get_partition_spec(table)
+            constraints = state.constraints.get(name, set())
+
+            if name not in state.tables:
+                columns = ",\n".join(f"    {_quote(column)} {definition}" for column, definition in column_defs.items())
+                partition = f" {spec.partition_clause()}" if spec else ""
+                plan.tables.append(f"CREATE TABLE {_quote(name)} (\n{columns}\n){partition}")
+            else:
+                existing = state.columns.get(name, set())
+                for column, definition in column_defs.items():
+                    if column.lower() not in existing:
+                        plan.tables.append(f"ALTER TABLE {_quote(name)} ADD COLUMN {_quote(column)} {definition}")
+
+            # Hash children are plain partitions; range and list children are
+            # created and attached by the loader
+            if spec and spec.method == "hash":
+                for child in spec.children:
+                    if child.name.lower() not in state.tables:
+                        plan.tables.append(f"CREATE TABLE {_quote(child.name)} PARTITION OF {_quote(name)} "
+                                           f"{spec.bound_clause(child)}")
+
+            primary_key = self.parser.get_primary_key(table)
+            inline_primary_key = "PRIMARY KEY" in " ".join(column_defs.values()).upper()
+            if primary_key and not inline_primary_key and name not in state.primary_keys:
+                plan.primary_keys.append(f"ALTER TABLE {_quote(name)} ADD PRIMARY KEY ({primary_key})")
+
+            statements = []
+            for constraint in self.parser.get_unique_constraints(table):
+                if _normalize(f"UNIQUE ({constraint})") not in constraints:
+                    statements.append(f"ALTER TABLE {_quote(name)} ADD UNIQUE ({constraint})")
+            for index in self.parser.get_indexes(table):
+                index_name = f"idx_{name}_{index}"
+                if index_name.lower() not in state.indexes:
+                    statements.append(f"CREATE INDEX {_quote(index_name)} ON {_quote(name)} ({index})")
+            if statements:
+                plan.indexes[name] = statements
+
+            for column, reference in self.parser.get_foreign_keys(table):
+                definition = f"FOREIGN KEY ({column}) REFERENCES {reference}"
+                if _normalize(definition) not in constraints:
+                    plan.foreign_keys.append(f"ALTER TABLE {_quote(name)} ADD {definition}")
+
+        return plan
+
+    def _apply_group(self, statements: List[str]) -> None:
+        postgres = type(self.postgres)(self.postgres.connection_string, self.postgres.schema)
+        try:
+            postgres.execute_transaction(statements)
+        finally:
+            postgres.disconnect()
+
+    def apply(self, dry_run: bool = False) -> List[str]:
+        """Create the missing tables, columns and primary keys, before the data is loaded
+
+        Args:
+            dry_run: Only work out the statements, without executing them
+
+        Returns:
+            The statements that were (or would be) executed
+        """
+        plan = self.plan(self.read_state())
+        if dry_run or not plan.pre_load:
+            self.logger.info(f"Target schema needs {len(plan.pre_load)} statements before loading")
+            return plan.pre_load
+
+        self.postgres.execute_transaction(plan.pre_load)
+        self.logger.info(f"Applied {len(plan.pre_load)} schema statements")
+        return plan.pre_load
+
+    def apply_constraints(self, dry_run: bool = False) -> List[str]:
+        """Add the missing unique constraints, indexes and foreign keys, once the data is loaded
+
+        Args:
+            dry_run: Only work out the statements, without executing them
+
+        Returns:
+            The statements that were (or would be) executed
+        """
+        plan = self.plan(self.read_state())
+        if dry_run or not plan.post_load:
+            return plan.post_load
+
+        # Index builds on different tables do not block each other, so each
+        # table's statements run in their own transaction on their own connection
+        groups = list(plan.indexes.values())
+        if len(groups) > 1 and self.workers > 1:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                for future in [executor.submit(self._apply_group, group) for group in groups]:
+                    future.result()
+        else:
+            for group in groups:
+                self.postgres.execute_transaction(group)
+
+        # Foreign keys come last, as one may reference a unique constraint built above
+        self.postgres.execute_transaction(plan.foreign_keys)
+        self.logger.info(f"Applied {len(plan.post_load)} constraint statements")
+        return plan.post_load
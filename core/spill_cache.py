@@ -0,0 +1,208 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+from typing import Dict, Any, Iterator, List, Optional
+
+import pandas as pd
+
+from utils.files import write_json_atomic
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+except ImportError:  # pyarrow is an optional dependency
+    pa = None
+
+META_FILE = "meta.json"
+
+
+def source_fingerprint(mariadb, db_name: str, table_name: str) -> str:
+    """
+    Fingerprint the current state of a source table from its metadata
+
+    Uses CREATE_TIME and UPDATE_TIME from INFORMATION_SCHEMA.TABLES together
+    with the column definitions, so it changes whenever the table is altered,
+    rebuilt or written to. TABLE_ROWS is left out since InnoDB re-estimates it
+    without any change to the data.
+
+    Args:
+        mariadb: Connected MariaDBConnector
+        db_name: Database of the table
+        table_name: Name of the table
+
+    Returns:
+        str: Hex digest identifying the table state
+    """
+    query = """
+    SELECT
+        t.CREATE_TIME, t.UPDATE_TIME, c.COLUMN_NAME, c.COLUMN_TYPE, c.IS_NULLABLE
+    FROM
+        INFORMATION_SCHEMA.TABLES t
+        JOIN INFORMATION_SCHEMA.COLUMNS c
+            ON c.TABLE_SCHEMA = t.TABLE_SCHEMA AND c.TABLE_NAME = t.TABLE_NAME
+    WHERE
+        t.TABLE_SCHEMA = %s
+        AND t.TABLE_NAME = %s
+    ORDER BY
+        c.ORDINAL_POSITION
+    """
+    result = mariadb.execute_query(query, (db_name, table_name))
+    rows = [] if result is None else result.astype(str).values.tolist()
+    return hashlib.sha256(json.dumps(rows).encode()).hexdigest()
+
+
+def _cache_key(db_name: str, table_name: str, columns: List[str], fingerprint: str) -> str:
+    payload = json.dumps([db_name, table_name, list(columns), fingerprint])
+    return hashlib.sha256(payload.encode()).hexdigest()[:24]
+
+
+class SpillWriter:
+    """Writes the extracted chunks of one table into a cache entry
+
+    The entry only becomes visible once commit() writes its meta.json.
+    """
+
+    def __init__(self, cache: "SpillCache", path: str, meta: Dict[str, Any]):
+        self.cache = cache
+        self.path = path
+        self.meta = meta
+
+    def write_chunk(self, df: pd.DataFrame) -> None:
+        """Append a chunk as an uncompressed Arrow IPC file, so reads can memory-map it"""
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        chunk_path = os.path.join(self.path, f"chunk-{self.meta['chunks']:05d}.arrow")
+        with pa.OSFile(chunk_path, "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+
+        self.meta["chunks"] += 1
+        self.meta["rows"] += len(df)
+        self.meta["bytes"] += os.path.getsize(chunk_path)
+
+    def commit(self) -> None:
+        """Publish the entry and evict older data to stay under the size cap"""
+        self.meta["created_at"] = self.meta["last_access"] = time.time()
+        write_json_atomic(os.path.join(self.path, META_FILE), self.meta)
+        self.cache._remove_stale(self.meta)
+        self.cache.evict(keep=self.meta["key"])
+
+    def abort(self) -> None:
+        """Discard a partially written entry"""
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+class SpillCache:
+    """
+    Local columnar cache of extracted source data.
+
+    Each entry holds the chunks of one table as Arrow IPC files and is keyed by
+    database, table, column list and source fingerprint, so data extracted
+    from an older state of the table is never replayed as current. When the
+    cache grows beyond max_bytes the least recently used entries are evicted.
+    """
+
+    def __init__(self, directory: str = ".migres/spill", max_bytes: Optional[int] = None):
+        if pa is None:
+            raise ImportError("The spill cache requires pyarrow: pip install pyarrow")
+
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _entry_path(self, db_name: str, table_name: str, key: str) -> str:
+        return os.path.join(self.directory, db_name, table_name, key)
+
+    def writer(self, db_name: str, table_name: str, columns: List[str], fingerprint: str,
+               column_types: Optional[Dict[str, str]] = None, avg_row_length: int = 0) -> SpillWriter:
+        """Start a new cache entry for a table
+
+        The catalog's column types and average row length are kept with the
+        entry, so a replay can export and track the table without the source.
+        """
+        key = _cache_key(db_name, table_name, columns, fingerprint)
+        path = self._entry_path(db_name, table_name, key)
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path)
+
+        meta = {
+            "key": key,
+            "database": db_name,
+            "table": table_name,
+            "columns": list(columns),
+            "fingerprint": fingerprint,
+            "column_types": column_types or {},
+            "avg_row_length": avg_row_length,
+            "chunks": 0,
+            "rows": 0,
+            "bytes": 0,
+        }
+        return SpillWriter(self, path, meta)
+
+    def entries(self) -> List[Dict[str, Any]]:
+        """Get the metadata of every complete entry, oldest first"""
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            if META_FILE in files:
+                with open(os.path.join(root, META_FILE)) as f:
+                    meta = json.load(f)
+                meta["path"] = root
+                entries.append(meta)
+        return sorted(entries, key=lambda e: e["created_at"])
+
+    def lookup(self, db_name: str, table_name: str, columns: Optional[List[str]] = None,
+               fingerprint: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Find the cache entry of a table
+
+        Args:
+            db_name: Database of the table
+            table_name: Name of the table
+            columns: Required column list, or None for any
+            fingerprint: Required source fingerprint, or None to accept the
+                newest entry without consulting the source
+
+        Returns:
+            Entry metadata, or None if there is no usable entry
+        """
+        matches = [
+            e for e in self.entries()
+            if e["database"] == db_name and e["table"] == table_name
+            and (columns is None or e["columns"] == list(columns))
+            and (fingerprint is None or e["fingerprint"] == fingerprint)
+        ]
+        return matches[-1] if matches else None
+
+    def iter_chunks(self, entry: Dict[str, Any]) -> Iterator[pd.DataFrame]:
+        """Replay the chunks of an entry, memory-mapping each file"""
+        entry["last_access"] = time.time()
+        write_json_atomic(os.path.join(entry["path"], META_FILE),
+                          {k: v for k, v in entry.items() if k != "path"})
+
+        for number in range(entry["chunks"]):
+            chunk_path = os.path.join(entry["path"], f"chunk-{number:05d}.arrow")
+            with pa.memory_map(chunk_path, "r") as source:
+                table = pa.ipc.open_file(source).read_all()
+                yield table.to_pandas()
+
+    def _remove_stale(self, meta: Dict[str, Any]) -> None:
+        """Drop older entries of the same table, only the latest extraction is kept"""
+        table_dir = os.path.dirname(self._entry_path(meta["database"], meta["table"], meta["key"]))
+        for key in os.listdir(table_dir):
+            if key != meta["key"]:
+                shutil.rmtree(os.path.join(table_dir, key), ignore_errors=True)
+
+    def evict(self, keep: Optional[str] = None) -> None:
+        """Remove least recently used entries until the cache fits in max_bytes"""
+        if not self.max_bytes:
+            return
+
+        entries = sorted(self.entries(), key=lambda e: e["last_access"])
+        total = sum(e["bytes"] for e in entries)
+        for entry in entries:
+            if total <= self.max_bytes:
+                break
+            if entry["key"] == keep:
+                continue
+            shutil.rmtree(entry["path"], ignore_errors=True)
+            total -= entry["bytes"]
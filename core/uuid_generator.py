@@ -0,0 +1,58 @@
+import uuid
+from functools import lru_cache
+from typing import Any
+
+import pandas as pd
+
+# Every generated UUID lives under this namespace, with one child namespace
+# per entity named in uuid_config.ini
+MIGRES_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, "https://github.com/Phenzic/migres")
+
+
+@lru_cache(maxsize=None)
+def entity_namespace(entity: str) -> uuid.UUID:
+    """Namespace of the UUIDs generated for an entity"""
+    return uuid.uuid5(MIGRES_NAMESPACE, entity.lower())
+
+
+def _key(value: Any) -> str:
+    # Integer ids read into a float column because of NULLs must give the
+    # same UUID as in a column without NULLs
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value)
+
+
+def generate_uuid(entity: str, value: Any) -> uuid.UUID:
+    """
+    Deterministic UUID of a source id
+
+    The same entity and id always give the same UUID, so a primary key and
+    the foreign keys referencing it, which name the same entity in
+    uuid_config.ini, are converted consistently without a lookup table.
+
+    Args:
+        entity: Entity the id belongs to, such as "user"
+        value: Source id
+
+    Returns:
+        Version 5 UUID of the id
+    """
+    return uuid.uuid5(entity_namespace(entity), _key(value))
+
+
+def uuid_series(values: pd.Series, entity: str) -> pd.Series:
+    """
+    Convert a column of source ids to UUID strings, keeping NULLs
+
+    Args:
+        values: Source ids
+        entity: Entity the ids belong to
+
+    Returns:
+        Series of UUID strings
+    """
+    namespace = entity_namespace(entity)
+    # Foreign key columns repeat ids, so each distinct id is hashed once
+    mapping = {value: str(uuid.uuid5(namespace, _key(value))) for value in values.dropna().unique()}
+    return values.map(mapping)
@@ -0,0 +1,315 @@
+import logging
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, replace
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, Any, List, Optional, Tuple
+
+from connectors.mariadb_connector import MariaDBConnector
+from connectors.postgres_connector import PostgresConnector
+
+# Source (MariaDB DATA_TYPE) and target (type_config.ini value) type families
+INTEGER_TYPES = {"tinyint", "smallint", "mediumint", "int", "integer", "bigint", "year"}
+DECIMAL_TYPES = {"decimal", "numeric"}
+FLOAT_TYPES = {"float", "double", "real", "double precision"}
+DATETIME_TYPES = {"datetime", "timestamp", "timestamptz"}
+TEXT_TYPES = {"char", "varchar", "tinytext", "text", "mediumtext", "longtext", "enum", "set"}
+BINARY_TYPES = {"binary", "varbinary", "tinyblob", "blob", "mediumblob", "longblob", "bytea"}
+BOOLEAN_TYPES = {"boolean", "bool"}
+UNCOMPARABLE_TYPES = {"uuid", "json", "jsonb"}
+
+# Relative tolerance used when comparing floating point MIN/MAX values
+FLOAT_TOLERANCE = 1e-6
+
+
+@dataclass
+class ColumnCheck:
+    """Aggregate expressions used to compare one column on both sides
+
+    The value expressions feed MIN/MAX, the text expressions feed the
+    content hash. Either pair is None when that comparison is not meaningful
+    for the column's type mapping.
+    """
+    name: str
+    source_value: Optional[str] = None
+    target_value: Optional[str] = None
+    source_text: Optional[str] = None
+    target_text: Optional[str] = None
+    float_values: bool = False
+
+
+def _type_family(data_type: Optional[str]) -> Optional[str]:
+    """Map a MariaDB or PostgreSQL type name onto the family used for comparison"""
+    if not data_type:
+        return None
+    data_type = data_type.lower().split("(")[0].strip()
+    for family, types in [("integer", INTEGER_TYPES), ("decimal", DECIMAL_TYPES),
+                          ("float", FLOAT_TYPES), ("datetime", DATETIME_TYPES),
+                          ("text", TEXT_TYPES), ("binary", BINARY_TYPES),
+                          ("boolean", BOOLEAN_TYPES), ("uncomparable", UNCOMPARABLE_TYPES)]:
+        if data_type in types:
+            return family
+    if data_type == "date":
+        return "date"
+    return None
+
+
+def build_column_check(column: str, source_type: str, target_type: Optional[str] = None,
+                       uuid_mapped: bool = False) -> ColumnCheck:
+    """Build the expressions that compare a column across the migration
+
+    Args:
+        column: Column name
+        source_type: MariaDB DATA_TYPE of the column
+        target_type: Type configured for the column in type_config.ini, if any
+        uuid_mapped: Whether the column is converted to a UUID via uuid_config.ini
+
+    Returns:
+        ColumnCheck for the column. Columns whose values are rewritten by the
+        migration (UUIDs, JSON) only get row and NULL counts compared.
+    """
+    check = ColumnCheck(name=column)
+    source_family = _type_family(source_type)
+    target_family = _type_family(target_type) or source_family
+
+    if uuid_mapped or target_family == "uncomparable" or source_type.lower() == "json":
+        return check
+
+    src = f"`{column}`"
+    tgt = f'"{column.lower()}"'
+
+    if source_family == "integer" and target_family == "boolean":
+        check.source_text = f"CASE WHEN {src} IS NULL THEN NULL WHEN {src} <> 0 THEN 'true' ELSE 'false' END"
+        check.target_text = f"{tgt}::text"
+    elif source_family != target_family:
+        # Unknown conversion, only the counts can be trusted
+        return check
+    elif source_family in ("integer", "decimal"):
+        check.source_value, check.target_value = src, tgt
+        check.source_text, check.target_text = f"CAST({src} AS CHAR)", f"{tgt}::text"
+    elif source_family == "float":
+        # Float text representations differ between servers, compare ranges only
+        check.source_value, check.target_value = src, tgt
+        check.float_values = True
+    elif source_family in ("datetime", "date"):
+        maria_format, pg_format = {
+            "datetime": ("%Y-%m-%d %H:%i:%s", "YYYY-MM-DD HH24:MI:SS"),
+            "date": ("%Y-%m-%d", "YYYY-MM-DD"),
+        }[source_family]
+        check.source_value = check.source_text = f"DATE_FORMAT({src}, '{maria_format}')"
+        check.target_value = check.target_text = f"to_char({tgt}, '{pg_format}')"
+    elif source_family == "text":
+        # MIN/MAX depend on collation, which differs between servers
+        check.source_text, check.target_text = src, f"{tgt}::text"
+    elif source_family == "binary":
+        check.source_text, check.target_text = f"HEX({src})", f"upper(encode({tgt}, 'hex'))"
+
+    return check
+
+
+def _source_hash(expression: str) -> str:
+    """Order-independent MariaDB hash: sum of the first 60 bits of each value's MD5"""
+    return f"SUM(CAST(CONV(SUBSTRING(MD5({expression}), 1, 15), 16, 10) AS UNSIGNED))"
+
+
+def _target_hash(expression: str) -> str:
+    """PostgreSQL equivalent of _source_hash"""
+    return f"SUM(('x' || substr(md5({expression}), 1, 15))::bit(60)::bigint)"
+
+
+def build_aggregate_queries(source_table: str, target_table: str, checks: List[ColumnCheck],
+                            source_filter: Optional[str] = None) -> Tuple[List[Tuple[str, str]], str, str]:
+    """Build the single-pass aggregate query for each side of a table
+
+    Args:
+        source_table: Qualified, quoted MariaDB table name
+        target_table: Qualified, quoted PostgreSQL table name
+        checks: Column checks to include
+        source_filter: Row filter the table was migrated with, if any
+
+    Returns:
+        Tuple of (metrics, source_query, target_query) where metrics lists the
+        (column, metric) pair for each selected value, in select order
+    """
+    metrics = [("*", "row_count")]
+    source_exprs = ["COUNT(*)"]
+    target_exprs = ["COUNT(*)"]
+
+    for check in checks:
+        src = f"`{check.name}`"
+        tgt = f'"{check.name.lower()}"'
+        metrics.append((check.name, "null_count"))
+        source_exprs.append(f"COUNT(*) - COUNT({src})")
+        target_exprs.append(f"COUNT(*) - COUNT({tgt})")
+
+        if check.source_value and check.target_value:
+            metrics.append((check.name, "min"))
+            source_exprs.append(f"MIN({check.source_value})")
+            target_exprs.append(f"MIN({check.target_value})")
+            metrics.append((check.name, "max"))
+            source_exprs.append(f"MAX({check.source_value})")
+            target_exprs.append(f"MAX({check.target_value})")
+
+        if check.source_text and check.target_text:
+            metrics.append((check.name, "hash"))
+            source_exprs.append(_source_hash(check.source_text))
+            target_exprs.append(_target_hash(check.target_text))
+
+    source_query = f"SELECT {', '.join(source_exprs)} FROM {source_table}"
+    if source_filter:
+        source_query += f" WHERE {source_filter}"
+    target_query = f"SELECT {', '.join(target_exprs)} FROM {target_table}"
+    return metrics, source_query, target_query
+
+
+def _values_match(source: Any, target: Any, float_values: bool = False) -> bool:
+    """Compare two aggregate values fetched from different drivers"""
+    if source is None or target is None:
+        return source is None and target is None
+    if float_values:
+        return math.isclose(float(source), float(target), rel_tol=FLOAT_TOLERANCE)
+    if isinstance(source, (int, Decimal)) and isinstance(target, (int, Decimal)):
+        return Decimal(source) == Decimal(target)
+    return str(source) == str(target)
+
+
+class MigrationVerifier:
+    """
+    Compares migrated tables between MariaDB and PostgreSQL.
+
+    All statistics are computed as aggregates on the database servers, so no
+    rows are transferred. Tables are verified concurrently, each worker thread
+    holding its own pair of connections.
+    """
+
+    def __init__(self, migration_manager, workers: int = 4):
+        self.manager = migration_manager
+        self.config = migration_manager.config
+        self.workers = workers
+        self.logger = logging.getLogger(__name__)
+        self._local = threading.local()
+        self._opened = []
+        self._lock = threading.Lock()
+
+    def _collect_checks(self) -> List[Tuple[str, str, List[ColumnCheck], Optional[str]]]:
+        """Work out which tables and columns to verify and how"""
+        tables_to_export = self.manager._get_tables_to_export()
+        type_config = self.config.type_conversions or {}
+        uuid_config = self.config.uuid_config or {}
+
+        catalog = self.manager._get_catalog()
+
+        jobs = []
+        for db_name, tables in tables_to_export.items():
+            for table in tables:
+                column_types = catalog.column_types(db_name, table)
+                columns = self.manager._get_columns_to_export(table, db_name)
+                table_types = type_config.get(table, {})
+                table_uuids = uuid_config.get(table, {})
+
+                checks = [
+                    build_column_check(column, column_types[column],
+                                       table_types.get(column.lower()),
+                                       column.lower() in table_uuids)
+                    for column in columns
+                ]
+                jobs.append((db_name, table, checks, self.manager._row_filter(db_name, table)))
+        return jobs
+
+    def _connectors(self) -> Tuple[MariaDBConnector, PostgresConnector]:
+        """Get the connections owned by the current worker thread"""
+        if not hasattr(self._local, "mariadb"):
+            mariadb = MariaDBConnector(replace(self.config.mariadb_config))
+            postgres = PostgresConnector(self.config.postgres_config.connection_string)
+            mariadb.connect()
+            postgres.connect()
+            self._local.mariadb, self._local.postgres = mariadb, postgres
+            with self._lock:
+                self._opened.extend([mariadb, postgres])
+        return self._local.mariadb, self._local.postgres
+
+    def verify_table(self, db_name: str, table: str, checks: List[ColumnCheck],
+                     where: Optional[str] = None) -> Dict[str, Any]:
+        """Verify a single table and return its report entry
+
+        Args:
+            db_name: Database of the table
+            table: Name of the table
+            checks: Column checks to run
+            where: Row filter the table was migrated with, only source rows
+                matching it are compared
+        """
+        started = time.monotonic()
+        entry = {
+            "database": db_name,
+            "table": table,
+            "status": "passed",
+            "source_rows": None,
+            "target_rows": None,
+            "mismatches": [],
+            "counts_only": [c.name for c in checks if not (c.source_value or c.source_text)],
+        }
+
+        try:
+            mariadb, postgres = self._connectors()
+            schema = self.manager._target_schema(db_name)
+            target_table = f'"{schema}"."{table.lower()}"' if schema else f'"{table.lower()}"'
+            metrics, source_query, target_query = build_aggregate_queries(
+                f"`{db_name}`.`{table}`", target_table, checks, where)
+
+            # A row of int and float columns would otherwise come out all floats, counts included
+            source_row = mariadb.execute_query(source_query).astype(object).iloc[0].tolist()
+            target_row = postgres.execute_query(target_query)[0]
+
+            float_columns = {c.name for c in checks if c.float_values}
+            for (column, metric), source, target in zip(metrics, source_row, target_row):
+                if not _values_match(source, target, column in float_columns):
+                    entry["mismatches"].append({
+                        "column": column, "metric": metric, "source": source, "target": target,
+                    })
+
+            entry["source_rows"], entry["target_rows"] = source_row[0], target_row[0]
+            if entry["mismatches"]:
+                entry["status"] = "failed"
+        except Exception as e:
+            self.logger.error(f"Error verifying {db_name}.{table}: {str(e)}")
+            entry["status"] = "error"
+            entry["error"] = str(e)
+
+        entry["duration_seconds"] = round(time.monotonic() - started, 3)
+        return entry
+
+    def run(self) -> Dict[str, Any]:
+        """Verify every migrated table
+
+        Returns:
+            Machine-readable report with a summary and one entry per table
+        """
+        jobs = self._collect_checks()
+        results = []
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                futures = [executor.submit(self.verify_table, *job) for job in jobs]
+                for future in as_completed(futures):
+                    entry = future.result()
+                    print(f"  {entry['database']}.{entry['table']}: {entry['status']}")
+                    results.append(entry)
+        finally:
+            for connector in self._opened:
+                connector.disconnect()
+
+        results.sort(key=lambda e: (e["database"], e["table"]))
+        return {
+            "generated_at": datetime.now().isoformat(timespec="seconds"),
+            "summary": {
+                "tables": len(results),
+                "passed": sum(1 for e in results if e["status"] == "passed"),
+                "failed": sum(1 for e in results if e["status"] == "failed"),
+                "errors": sum(1 for e in results if e["status"] == "error"),
+            },
+            "tables": results,
+        }
@@ -1,55 +1,144 @@
 import argparse
+import importlib
 import sys
-from pathlib import Path
 from dotenv import load_dotenv
-import os
-
-from commands.init import init_configs
-from commands.test import test_connection
-from commands.sort import sort_tables
-from commands.run import run_migration
-from commands.list import list_mariadb_tables
-from commands.exclude import (
-    run_migration_with_exclusions,
-    run_migration_with_column_exclusions
-)
 
 __version__ = "0.1.1.dev1"  # Match the version in pyproject.toml
 
-def main():
-    # Load environment variables at the very beginning
-    load_dotenv()
-    
+
+def _int_list(value):
+    """Parse a comma-separated list of integers, e.g. "1000,10000" """
+    return [int(item) for item in value.split(',') if item.strip()]
+
+
+# Subcommands, registered without importing them. Each maps to the
+# "module:function" that runs it, called with the parsed arguments as keyword
+# arguments, so a command's dependencies are only imported when it runs.
+COMMANDS = {
+    'init': {
+        'handler': 'commands.init:init_configs',
+        'help': 'Initialize configuration files',
+        'arguments': [
+            (['--from-source'], {'action': 'store_true',
+                                 'help': 'Generate table_schema.ini from the MariaDB schema'}),
+        ],
+    },
+    'run': {
+        'handler': 'commands.run:run_migration',
+        'help': 'Run the migration',
+        'arguments': [
+            (['--no-download'], {'action': 'store_true',
+                                 'help': 'Process and migrate data without saving files locally'}),
+            (['--spill-cache'], {'action': 'store_true',
+                                 'help': 'Keep extracted data in the local spill cache for replay'}),
+            (['--profile'], {'action': 'store_true',
+                             'help': 'Profile CPU and memory per stage and write a report to .migres/profile'}),
+            (['--sample'], {'metavar': 'RATE',
+                            'help': 'Migrate a sample such as 1%% of the unreferenced tables and every row they reference'}),
+        ],
+    },
+    'load': {
+        'handler': 'commands.load:load_from_cache',
+        'help': 'Load PostgreSQL from previously extracted data',
+        'arguments': [
+            (['--from-cache'], {'action': 'store_true', 'required': True,
+                                'help': 'Replay the transform and load stages from the spill cache'}),
+            (['--check-source'], {'action': 'store_true',
+                                  'help': 'Skip cached tables whose source table has changed'}),
+            (['--download'], {'action': 'store_false', 'dest': 'no_download',
+                              'help': 'Also export the replayed data to Parquet files'}),
+        ],
+    },
+    'plan': {
+        'handler': 'commands.plan:plan_migration',
+        'help': 'Estimate time, memory and disk of a migration',
+        'arguments': [
+            (['--report'], {'dest': 'report_path', 'help': 'Path of the JSON plan'}),
+            (['--workers'], {'type': int, 'help': 'Workers to estimate with'}),
+            (['--chunk-size'], {'type': int, 'help': 'Rows per chunk to estimate with'}),
+            (['--no-download'], {'action': 'store_true', 'help': 'Estimate without the Parquet export'}),
+            (['--spill-cache'], {'action': 'store_true', 'help': 'Estimate with the spill cache'}),
+        ],
+    },
+    'probe': {
+        'handler': 'commands.probe:probe_servers',
+        'help': 'Measure source read and target COPY throughput',
+        'arguments': [
+            (['--tables'], {'type': int, 'default': 3, 'help': 'Number of the largest tables read'}),
+            (['--rows'], {'type': int, 'default': 200000, 'help': 'Rows read from each table'}),
+            (['--fetch-sizes'], {'type': _int_list, 'help': 'Comma-separated rows fetched at a time'}),
+            (['--buffer-sizes'], {'type': _int_list, 'help': 'Comma-separated rows sent by each COPY'}),
+            (['--writers'], {'type': _int_list, 'help': 'Comma-separated concurrent COPY connections'}),
+            (['--report'], {'dest': 'report_path', 'help': 'Path of the JSON measurements'}),
+        ],
+    },
+    'compile': {
+        'handler': 'commands.compile:compile_plan',
+        'help': 'Validate the configuration and compile the migration plan',
+        'arguments': [],
+    },
+    'sort': {
+        'handler': 'commands.sort:sort_tables',
+        'help': 'Determine optimal table migration order',
+        'arguments': [],
+    },
+    'verify': {
+        'handler': 'commands.verify:verify_migration',
+        'help': 'Compare migrated tables between MariaDB and PostgreSQL',
+        'arguments': [
+            (['--report'], {'dest': 'report_path', 'default': 'verify_report.json',
+                            'help': 'Path of the JSON verification report'}),
+            (['--workers'], {'type': int, 'default': 4, 'help': 'Number of tables to verify in parallel'}),
+            (['--sample'], {'metavar': 'RATE',
+                            'help': 'Sample rate the target was loaded with, by default that of the last run'}),
+        ],
+    },
+}
+
+# Arguments parsed for the commands' own use, not passed to their handlers
+_SKIPPED_ARGUMENTS = {'from_cache'}
+
+
+def load_handler(handler):
+    """Import the function of a "module:function" handler"""
+    module, function = handler.split(':')
+    return getattr(importlib.import_module(module), function)
+
+
+def build_parser():
     parser = argparse.ArgumentParser(description='Database migration tool')
     parser.add_argument('--version', '-v', action='store_true', help='Show version information')
-    parser.add_argument('--test', '-t', nargs='?', const='all', choices=['all', 'maria', 'postgres'], 
+    parser.add_argument('--test', '-t', nargs='?', const='all', choices=['all', 'maria', 'postgres'],
                         help='Test database connection (all, maria or postgres)')
     parser.add_argument('--maria-table', choices=['ls'], help='List all tables in MariaDB')
-    parser.add_argument('--maria-exclude', type=str, help='Comma-separated list of tables to exclude from migration')
-    parser.add_argument('--maria-exclude-columns', type=str, 
-                        help='Comma-separated list of columns to exclude in format "table.column"')
-    
+    parser.add_argument('--maria-exclude', type=str,
+                        help='Comma-separated list of tables or globs (e.g. "events_2019_*") to exclude from migration')
+    parser.add_argument('--maria-exclude-columns', type=str,
+                        help='Comma-separated list of columns to exclude in format "table.column", globs allowed')
+
     subparsers = parser.add_subparsers(dest='command', help='Commands')
-    
-    # Init command
-    init_parser = subparsers.add_parser('init', help='Initialize configuration files')
-    # Run command
-    run_parser = subparsers.add_parser('run', help='Run the migration')
-    run_parser.add_argument('--no-download', action='store_true', 
-                           help='Process and migrate data without saving files locally')
-    # Sort command
-    sort_parser = subparsers.add_parser('sort', help='Determine optimal table migration order')
-    
+    for name, command in COMMANDS.items():
+        command_parser = subparsers.add_parser(name, help=command['help'])
+        for flags, options in command['arguments']:
+            command_parser.add_argument(*flags, **options)
+    return parser
+
+
+def main():
+    # Load environment variables at the very beginning
+    load_dotenv()
+
     # Parse arguments
-    args = parser.parse_args()
-    
+    args = build_parser().parse_args()
+
     # Check for version flag first
     if hasattr(args, 'version') and args.version:
         print(f"migres version {__version__}")
         return 0
-    
+
     # Handle test connection command
     if args.test:
+        test_connection = load_handler('commands.test:test_connection')
         if args.test == 'all':
             # Test all connections
             maria_result = test_connection('maria')
@@ -57,34 +146,36 @@ def main():
             return 1 if maria_result == 1 or postgres_result == 1 else 0
         else:
             return test_connection(args.test)
-    
+
     # Handle listing MariaDB tables
     if args.maria_table == 'ls':
-        return list_mariadb_tables()
-    
+        return load_handler('commands.list:list_mariadb_tables')()
+
     # Handle excluding tables and columns - process both if present
     tables_excluded = False
     columns_excluded = False
-    
+
     if args.maria_exclude:
-        run_migration_with_exclusions(args.maria_exclude)
+        load_handler('commands.exclude:run_migration_with_exclusions')(args.maria_exclude)
         tables_excluded = True
-        
+
     if args.maria_exclude_columns:
-        run_migration_with_column_exclusions(args.maria_exclude_columns)
+        load_handler('commands.exclude:run_migration_with_column_exclusions')(args.maria_exclude_columns)
         columns_excluded = True
-        
+
     if tables_excluded or columns_excluded:
         return 0
-    
+
     # Handle commands
-    if args.command == 'init':
-        print("Initializing configuration files...")
-        return init_configs()
-    elif args.command == 'run':
-        return run_migration(args.no_download if hasattr(args, 'no_download') else False)
-    elif args.command == 'sort':
-        return sort_tables()
+    if args.command in COMMANDS:
+        if args.command == 'init':
+            print("Initializing configuration files...")
+        names = {
+            options.get('dest', flags[0].lstrip('-').replace('-', '_'))
+            for flags, options in COMMANDS[args.command]['arguments']
+        }
+        kwargs = {name: getattr(args, name) for name in names - _SKIPPED_ARGUMENTS}
+        return load_handler(COMMANDS[args.command]['handler'])(**kwargs)
     else:
         # If no command is provided, show version
         print(f"migres version {__version__}")
@@ -92,4 +183,4 @@ def main():
         return 0
 
 if __name__ == "__main__":
-    sys.exit(main())
\ No newline at end of file
+    sys.exit(main())
@@ -1 +1,2 @@
 from .migration import PostgresConfig, DatabaseConfig, MigrationConfig
+from .catalog import ColumnInfo, IndexInfo, ForeignKeyInfo, PartitionInfo, TableInfo
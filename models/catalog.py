@@ -0,0 +1,79 @@
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import List, Optional
+
+
+@dataclass
+class ColumnInfo:
+    name: str
+    data_type: str
+    column_type: str
+    nullable: bool = True
+    default: Optional[str] = None
+    max_length: Optional[int] = None
+    octet_length: Optional[int] = None
+    numeric_precision: Optional[int] = None
+    numeric_scale: Optional[int] = None
+    extra: str = ""
+
+    @property
+    def auto_increment(self) -> bool:
+        return "auto_increment" in self.extra.lower()
+
+
+@dataclass
+class IndexInfo:
+    name: str
+    columns: List[str]
+    unique: bool = False
+    cardinality: Optional[int] = None
+
+
+@dataclass
+class ForeignKeyInfo:
+    name: str
+    database: str
+    table: str
+    columns: List[str]
+    referenced_database: str
+    referenced_table: str
+    referenced_columns: List[str]
+
+
+@dataclass
+class PartitionInfo:
+    name: str
+    method: Optional[str] = None
+    expression: Optional[str] = None
+    description: Optional[str] = None
+    ordinal: int = 0
+    rows: int = 0
+    data_length: int = 0
+
+
+@dataclass
+class TableInfo:
+    database: str
+    name: str
+    engine: Optional[str] = None
+    rows: int = 0
+    avg_row_length: int = 0
+    data_length: int = 0
+    index_length: int = 0
+    create_time: Optional[datetime] = None
+    update_time: Optional[datetime] = None
+    columns: List[ColumnInfo] = field(default_factory=list)
+    primary_key: List[str] = field(default_factory=list)
+    indexes: List[IndexInfo] = field(default_factory=list)
+    foreign_keys: List[ForeignKeyInfo] = field(default_factory=list)
+    partitions: List[PartitionInfo] = field(default_factory=list)
+
+    @property
+    def column_names(self) -> List[str]:
+        return [column.name for column in self.columns]
+
+    def column(self, name: str) -> Optional[ColumnInfo]:
+        for column in self.columns:
+            if column.name == name:
+                return column
+        return None
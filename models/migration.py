@@ -1,6 +1,7 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Dict, List, Any
 import configparser
+import os
 
 @dataclass
 class DatabaseConfig:
@@ -17,6 +18,20 @@ class DatabaseConfig:
 class PostgresConfig:
     connection_string: str
 
+def database_names(environ) -> List[str]:
+    """
+    Names of the databases to migrate, from the MARIADB_DATABASEn variables
+
+    Variables are ordered by their number, so MARIADB_DATABASE2 comes before
+    MARIADB_DATABASE10. Variables without a number follow, by name.
+    """
+    def key(var: str):
+        suffix = var[len("MARIADB_DATABASE"):]
+        return (0, int(suffix), var) if suffix.isdigit() else (1, 0, var)
+
+    return [environ[var] for var in sorted((var for var in environ if var.startswith("MARIADB_DATABASE")), key=key)
+            if environ[var]]
+
 @dataclass
 class MigrationConfig:
     mariadb_config: DatabaseConfig
@@ -27,11 +42,57 @@ class MigrationConfig:
     type_conversions: Dict[str, Any]
     uuid_config: Dict[str, Any]
     constraints: Dict[str, Any]
-    
+    mariadb_databases: List[str] = field(default_factory=list)
+    config_manager: Any = None
+
     @classmethod
     def load_from_files(cls, main_config_path: str, type_config_path: str,
                        uuid_config_path: str, schema_config_path: str,
                        constraints_path: str) -> 'MigrationConfig':
-        """Create config from ini files"""
-        # Implementation to load all config files
-        pass
\ No newline at end of file
+        """Create config from ini files
+
+        Connection details are read from the environment, so load the .env
+        file before calling this.
+
+        Raises:
+            ValueError: If the MariaDB or PostgreSQL settings are missing
+        """
+        from config.config import ConfigManager
+
+        host = os.getenv("MARIADB_HOST")
+        user = os.getenv("MARIADB_USER")
+        password = os.getenv("MARIADB_PASSWORD")
+        connection_string = os.getenv("SUPABASE_CONNECTION_STRING")
+
+        databases = database_names(os.environ)
+
+        if not all([host, user, password, connection_string]) or not databases:
+            raise ValueError(
+                "Missing configuration in .env file. Required variables: MARIADB_HOST, "
+                "MARIADB_USER, MARIADB_PASSWORD, MARIADB_DATABASE1, SUPABASE_CONNECTION_STRING"
+            )
+
+        config_manager = ConfigManager()
+        for name, path in [("type_config", type_config_path), ("uuid_config", uuid_config_path)]:
+            config_manager.load_config(name, path)
+
+        return cls(
+            mariadb_config=DatabaseConfig(host=host, user=user, password=password, database=databases[0]),
+            postgres_config=PostgresConfig(connection_string=connection_string),
+            tables_to_export={},
+            columns_to_export={},
+            schema_definitions=_read_sections(schema_config_path),
+            type_conversions=_read_sections(type_config_path),
+            uuid_config=_read_sections(uuid_config_path),
+            constraints=_read_sections(constraints_path),
+            mariadb_databases=databases,
+            config_manager=config_manager,
+        )
+
+
+def _read_sections(config_path: str) -> Dict[str, Dict[str, str]]:
+    """Read an ini file into a {section: {key: value}} dictionary"""
+    config = configparser.ConfigParser(allow_no_value=True)
+    if os.path.exists(config_path):
+        config.read(config_path)
+    return {section: dict(config.items(section)) for section in config.sections()}
@@ -24,6 +24,7 @@ setup(
         "psycopg2-binary>=2.9.0",
         "pandas>=1.3.0",
         "configparser>=5.0.0",
+        "pyarrow>=10.0.0",
     ],
     entry_points={
         "console_scripts": [
@@ -0,0 +1,39 @@
+import pytest
+
+from config.catalog import SchemaCatalog
+from models.catalog import ColumnInfo, ForeignKeyInfo, TableInfo
+
+
+@pytest.fixture
+def shop_catalog():
+    """users <- orders <- items, and categories referencing itself"""
+    def table(name, columns, foreign_keys=()):
+        return TableInfo("shop", name, columns=[ColumnInfo(c, "int", "int") for c in columns],
+                         primary_key=["id"], foreign_keys=list(foreign_keys))
+
+    catalog = SchemaCatalog(["shop"])
+    catalog.add_table(table("users", ["id", "created_at"]))
+    catalog.add_table(table("orders", ["id", "user_id"], [
+        ForeignKeyInfo("fk_orders_users", "shop", "orders", ["user_id"], "shop", "users", ["id"])]))
+    catalog.add_table(table("items", ["id", "order_id"], [
+        ForeignKeyInfo("fk_items_orders", "shop", "items", ["order_id"], "shop", "orders", ["id"])]))
+    catalog.add_table(table("categories", ["id", "parent_id"], [
+        ForeignKeyInfo("fk_categories_parent", "shop", "categories", ["parent_id"], "shop", "categories", ["id"])]))
+    return catalog
+
+
+@pytest.fixture
+def layered_catalog():
+    """Tables t<level>_<i>, 3 on each of 10 levels, each referencing every table of the level before"""
+    width, depth = 3, 10
+    catalog = SchemaCatalog(["shop"])
+    for level in range(depth):
+        for i in range(width):
+            name = f"t{level}_{i}"
+            references = [f"t{level - 1}_{j}" for j in range(width)] if level else []
+            columns = ["id"] + [f"{parent}_id" for parent in references]
+            catalog.add_table(TableInfo("shop", name, columns=[ColumnInfo(c, "int", "int") for c in columns],
+                                        primary_key=["id"], foreign_keys=[
+                ForeignKeyInfo(f"fk_{name}_{parent}", "shop", name, [f"{parent}_id"], "shop", parent, ["id"])
+                for parent in references]))
+    return catalog
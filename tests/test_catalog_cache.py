@@ -0,0 +1,73 @@
+import pandas as pd
+import pytest
+
+from config.catalog import SchemaCatalog
+from config.catalog_cache import CatalogCache
+from models.catalog import ColumnInfo, TableInfo
+
+
+class _MariaDB:
+    """Answers the fingerprint query with one row per table"""
+
+    def __init__(self, tables):
+        self.tables = tables
+
+    def execute_query(self, query, params=None):
+        if query.startswith("SET SESSION"):
+            return None
+        return pd.DataFrame([{
+            "TABLE_SCHEMA": "shop", "TABLE_NAME": name, "ENGINE": "InnoDB", "TABLE_ROWS": rows,
+            "AVG_ROW_LENGTH": 40, "DATA_LENGTH": rows * 40, "INDEX_LENGTH": 0,
+            "CREATE_TIME": "2024-01-01 00:00:00", "UPDATE_TIME": None, "COLUMNS_CHECKSUM": columns,
+            "INDEXES_CHECKSUM": None, "FKS_CHECKSUM": None, "PARTITIONS_CHECKSUM": None,
+        } for name, (rows, columns) in self.tables.items()])
+
+
+@pytest.fixture
+def introspected(monkeypatch):
+    """Tables introspected by SchemaCatalog.load, per call"""
+    calls = []
+
+    def load(mariadb, databases, tables=None, selection=None):
+        calls.append(sorted(name for _, name in tables))
+        catalog = SchemaCatalog(databases)
+        for _, name in tables:
+            catalog.add_table(TableInfo("shop", name, columns=[ColumnInfo("id", "int", "int(11)")]))
+        return catalog
+
+    monkeypatch.setattr(SchemaCatalog, "load", staticmethod(load))
+    return calls
+
+
+def test_only_new_and_changed_tables_are_introspected(tmp_path, introspected):
+    path = str(tmp_path / "catalog.json")
+    CatalogCache(path).load_catalog(_MariaDB({"users": (10, "a"), "orders": (5, "b")}), ["shop"])
+
+    catalog = CatalogCache(path).load_catalog(_MariaDB({"users": (12, "a"), "orders": (5, "c")}), ["shop"])
+
+    assert introspected == [["orders", "users"], ["orders"]]
+    # Statistics are refreshed for cached definitions too
+    assert catalog.table("shop", "users").rows == 12
+    assert catalog.table("shop", "users").column_names == ["id"]
+
+
+def test_dropped_tables_leave_the_cache(tmp_path, introspected):
+    path = str(tmp_path / "catalog.json")
+    CatalogCache(path).load_catalog(_MariaDB({"users": (10, "a"), "orders": (5, "b")}), ["shop"])
+    CatalogCache(path).load_catalog(_MariaDB({"users": (10, "a")}), ["shop"])
+
+    assert list(CatalogCache(path)._data["tables"]) == ["shop.users"]
+
+
+def test_orders_are_kept_per_scope_and_key(tmp_path):
+    cache = CatalogCache(str(tmp_path / "catalog.json"))
+    cache.set_order("shop", "k1", [["users"]])
+
+    assert CatalogCache(cache.path).get_order("shop", "k1") == [["users"]]
+    assert cache.get_order("shop", "k2") is None
+
+
+def test_unreadable_cache_starts_empty(tmp_path):
+    path = tmp_path / "catalog.json"
+    path.write_text("{not json")
+    assert CatalogCache(str(path)).get_order("shop", "k1") is None
@@ -0,0 +1,34 @@
+from core.checkpoint import CheckpointStore
+
+
+def test_completed_partitions_survive_a_restart(tmp_path):
+    path = str(tmp_path / "checkpoints.json")
+    CheckpointStore(path).complete_partition("shop", "events", "p0", 100, "v1")
+    store = CheckpointStore(path)
+    store.complete_partition("shop", "events", "p1", 50, "v1")
+
+    assert CheckpointStore(path).completed_partitions("shop", "events", "v1") == {"p0": 100, "p1": 50}
+
+
+def test_checkpoints_of_another_definition_are_discarded(tmp_path):
+    store = CheckpointStore(str(tmp_path / "checkpoints.json"))
+    store.complete_partition("shop", "events", "p0", 100, "v1")
+
+    assert store.completed_partitions("shop", "events", "v2") == {}
+    store.complete_partition("shop", "events", "p1", 50, "v2")
+    assert store.completed_partitions("shop", "events", "v2") == {"p1": 50}
+
+
+def test_a_loaded_table_is_forgotten(tmp_path):
+    path = str(tmp_path / "checkpoints.json")
+    store = CheckpointStore(path)
+    store.complete_partition("shop", "events", "p0", 100)
+    store.complete_table("shop", "events")
+
+    assert CheckpointStore(path).completed_partitions("shop", "events") == {}
+
+
+def test_unreadable_file_starts_empty(tmp_path):
+    path = tmp_path / "checkpoints.json"
+    path.write_text("{")
+    assert CheckpointStore(str(path)).completed_partitions("shop", "events") == {}
@@ -0,0 +1,44 @@
+import pandas as pd
+
+from core.compiled_plan import CompiledPlan, CompiledTable
+from core.data_processor import DataProcessor
+
+
+def _processor(kernels):
+    table = CompiledTable("shop", "orders", tuple(column for column, _, _ in kernels), kernels)
+    plan = CompiledPlan(1, "", None, ("shop",), {("shop", "orders"): table}, ((("shop", "orders"),),))
+    return DataProcessor(None, plan)
+
+
+def test_processing_leaves_the_chunk_as_read():
+    processor = _processor((
+        ("created", "zero_date", None),
+        ("amount", "float", None),
+        ("paid", "boolean", None),
+        ("payload", "jsonb", None),
+    ))
+    df = pd.DataFrame({
+        "created": ["2024-01-01", "0000-00-00"],
+        "amount": ["1.5", "x"],
+        "paid": ["1", "0"],
+        "payload": ['{"a": 1}', "not json"],
+    })
+    before = df.copy()
+
+    processed = processor.process_table_data("orders", df)
+
+    pd.testing.assert_frame_equal(df, before)
+    assert list(processed["amount"]) == [1.5]
+    assert processed["paid"].dtype == "boolean"
+
+
+def test_kernels_are_looked_up_by_database():
+    tables = {
+        ("shop", "orders"): CompiledTable("shop", "orders", ("amount",), (("amount", "float", None),)),
+        ("archive", "orders"): CompiledTable("archive", "orders", ("amount",), (("amount", "integer", None),)),
+    }
+    processor = DataProcessor(None, CompiledPlan(1, "", None, ("shop", "archive"), tables, ()))
+    df = pd.DataFrame({"amount": ["1", "2"]})
+
+    assert processor.process_table_data("orders", df, "shop")["amount"].dtype == float
+    assert processor.process_table_data("orders", df, "archive")["amount"].dtype == "Int64"
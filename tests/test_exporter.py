@@ -0,0 +1,95 @@
+import datetime
+import decimal
+import json
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from core.exporter import ParquetExporter, arrow_type
+
+
+def test_column_types_follow_the_catalog():
+    assert arrow_type("bigint(20)") == pa.int64()
+    assert arrow_type("bigint(20) unsigned") == pa.uint64()
+    assert arrow_type("decimal(12,3)") == pa.decimal128(12, 3)
+    assert arrow_type("decimal(65,2)") == pa.string()
+    assert arrow_type("datetime(6)") == pa.timestamp("us")
+    assert arrow_type("varchar(255)") == pa.string()
+    assert arrow_type("longblob") == pa.binary()
+    assert arrow_type("geometry") is None
+
+
+def test_columns_null_in_the_first_chunk_keep_their_type(tmp_path):
+    exporter = ParquetExporter(str(tmp_path), "users", row_group_size=2, max_buffered_rows=2,
+                               column_types={"id": "int(11)", "parent": "int(11)", "created": "datetime",
+                                             "balance": "decimal(10,2)"})
+    exporter.write_chunk(pd.DataFrame({"id": [1, 2], "parent": [None, None], "created": [None, None],
+                                       "balance": [None, None]}))
+    exporter.write_chunk(pd.DataFrame({"id": [3, 4], "parent": [1, 2],
+                                       "created": [datetime.datetime(2024, 1, 1), "0000-00-00 00:00:00"],
+                                       "balance": [decimal.Decimal("1.50"), None]}))
+    manifest = exporter.close()
+
+    table = pq.read_table(str(tmp_path / "users"))
+    assert manifest["total_rows"] == 4
+    assert table.schema.field("parent").type == pa.int64()
+    assert table.column("parent").to_pylist() == [None, None, 1, 2]
+    # A zero date is exported as NULL, as it is loaded
+    assert table.column("created").to_pylist() == [None, None, datetime.datetime(2024, 1, 1), None]
+    assert table.column("balance").to_pylist() == [None, None, decimal.Decimal("1.50"), None]
+    with open(tmp_path / "users" / "_manifest.json") as f:
+        assert json.load(f)["schema"][1] == {"name": "parent", "type": "int64"}
+
+
+def test_columns_without_a_catalog_type_are_inferred(tmp_path):
+    exporter = ParquetExporter(str(tmp_path), "events")
+    exporter.write_chunk(pd.DataFrame({"id": [1], "note": [None]}))
+    exporter.write_chunk(pd.DataFrame({"id": [2], "note": ["x"]}))
+    exporter.close()
+
+    table = pq.read_table(str(tmp_path / "events"))
+    assert table.schema.field("note").type == pa.string()
+    assert table.column("note").to_pylist() == [None, "x"]
+
+
+def test_partitions_by_month_with_a_partition_for_nulls(tmp_path):
+    exporter = ParquetExporter(str(tmp_path), "orders", partition_by="created:month")
+    exporter.write_chunk(pd.DataFrame({"id": [1, 2, 3], "created": ["2024-01-05", "2024-02-01", None]}))
+    exporter.write_chunk(pd.DataFrame({"id": [4], "created": ["2024-01-20"]}))
+    manifest = exporter.close()
+
+    assert [(f["path"], f["rows"]) for f in manifest["files"]] == [
+        ("created_month=2024-01/part-00000.parquet", 2),
+        ("created_month=2024-02/part-00000.parquet", 1),
+        ("created_month=__HIVE_DEFAULT_PARTITION__/part-00000.parquet", 1),
+    ]
+    january = pq.read_table(str(tmp_path / "orders" / "created_month=2024-01"))
+    # A derived key leaves the column in the data
+    assert january.column("created").to_pylist() == ["2024-01-05", "2024-01-20"]
+
+
+def test_files_roll_over_and_buffers_stay_bounded(tmp_path):
+    exporter = ParquetExporter(str(tmp_path), "logs", row_group_size=4, max_rows_per_file=10,
+                               max_buffered_rows=6)
+    for start in range(0, 25, 5):
+        exporter.write_chunk(pd.DataFrame({"id": range(start, start + 5)}))
+        assert sum(exporter._buffered_rows.values()) <= 6
+    manifest = exporter.close()
+
+    assert [(f["path"], f["rows"]) for f in manifest["files"]] == [
+        ("part-00000.parquet", 10), ("part-00001.parquet", 10), ("part-00002.parquet", 5)]
+    assert pq.read_table(str(tmp_path / "logs")).column("id").to_pylist() == list(range(25))
+
+
+def test_least_recently_used_file_is_closed_past_max_open_files(tmp_path):
+    exporter = ParquetExporter(str(tmp_path), "events", partition_by="kind", row_group_size=1, max_open_files=2)
+    exporter.write_chunk(pd.DataFrame({"id": [1, 2, 3], "kind": ["a", "b", "c"]}))
+    exporter.write_chunk(pd.DataFrame({"id": [4], "kind": ["a"]}))
+    assert len(exporter._open_files) == 2
+    manifest = exporter.close()
+
+    # a was closed for c and reopened as a new file
+    assert [f["path"] for f in manifest["files"]] == [
+        "kind=a/part-00000.parquet", "kind=a/part-00001.parquet", "kind=b/part-00000.parquet",
+        "kind=c/part-00000.parquet"]
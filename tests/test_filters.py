@@ -0,0 +1,64 @@
+import configparser
+
+import pytest
+
+from config.filters import RowFilters, with_filter
+
+
+def test_filter_propagation_names_each_table_once_per_subquery(layered_catalog):
+    resolved = RowFilters({"t0_0": "id > 10"}).resolve(layered_catalog)
+
+    # Inlining would repeat t0_0 once per path, 3 ** 9 times for the last level
+    deepest = resolved[("shop", "t9_0")]
+    assert deepest.count("FROM `shop`.`t0_0`") == 3
+    assert len(deepest) < 30000
+
+
+def test_filter_restricts_referencing_tables(shop_catalog):
+    filters = RowFilters({"users": "created_at >= '2020-01-01'"})
+    resolved = filters.resolve(shop_catalog)
+
+    assert resolved[("shop", "users")] == "(created_at >= '2020-01-01')"
+    assert resolved[("shop", "orders")] == (
+        "(`user_id` IS NULL OR (`user_id`) IN (WITH `k0` AS (SELECT `id` FROM `shop`.`users` "
+        "WHERE (created_at >= '2020-01-01')) SELECT `id` FROM `k0`))"
+    )
+    # orders is read with the rows of users it depends on, defined before it
+    assert resolved[("shop", "items")] == (
+        "(`order_id` IS NULL OR (`order_id`) IN (WITH "
+        "`k0` AS (SELECT `id` FROM `shop`.`users` WHERE (created_at >= '2020-01-01')), "
+        "`k1` AS (SELECT `id` FROM `shop`.`orders` WHERE (`user_id` IS NULL OR (`user_id`) IN (SELECT `id` FROM `k0`))) "
+        "SELECT `id` FROM `k1`))"
+    )
+    assert ("shop", "categories") not in resolved
+
+
+def test_validate_reports_unknown_tables_columns_and_comments(shop_catalog):
+    filters = RowFilters({
+        "users": "signup_date > NOW()",
+        "shop.orders": "user_id = 1; DROP TABLE users",
+        "missing": "id = 1",
+        "items": "order_id IN (SELECT id FROM orders)",
+    })
+    with pytest.raises(ValueError) as error:
+        filters.validate(shop_catalog)
+    message = str(error.value)
+    assert "users: unknown columns signup_date" in message
+    assert "shop.orders: comments and ';' are not allowed" in message
+    assert "missing: unknown table" in message
+    assert "items: unknown columns" in message
+
+
+def test_from_config_reads_patterns_raw():
+    maria_config = configparser.ConfigParser()
+    maria_config.read_string("[filters]\nusers = email LIKE '%@example.com'\norders =\n")
+    filters = RowFilters.from_config(maria_config)
+
+    assert filters.get("shop", "users") == "email LIKE '%@example.com'"
+    assert filters.get("shop", "orders") is None
+
+
+def test_filtered_reads_have_their_own_fingerprint():
+    assert with_filter("abc", None) == "abc"
+    assert with_filter(None, "id > 1") is None
+    assert with_filter("abc", "id > 1") not in ("abc", with_filter("abc", "id > 2"))
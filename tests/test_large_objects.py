@@ -0,0 +1,44 @@
+from core.large_objects import LargeObjectStreamer, large_object_columns
+from models.catalog import ColumnInfo, TableInfo
+
+
+def _table(avg_row_length=2 * 1024 ** 2):
+    return TableInfo("db", "files", avg_row_length=avg_row_length, primary_key=["id"], columns=[
+        ColumnInfo("id", "int", "int", nullable=False),
+        ColumnInfo("name", "varchar", "varchar(100)"),
+        ColumnInfo("body", "longblob", "longblob", nullable=False),
+    ])
+
+
+class _MariaDB:
+    """Serves rows in key order for the keyset queries of the streamer"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = []
+
+    def iter_rows(self, query, params=None):
+        self.queries.append((query, params))
+        limit = int(query.rsplit("LIMIT ", 1)[1])
+        after = params[0] if params else None
+        return iter([row for row in self.rows if after is None or row[0] > after][:limit])
+
+
+def test_large_object_columns_need_a_large_average_row():
+    assert large_object_columns(_table(), ["id", "name", "body"], 1024 ** 2) == ["body"]
+    assert large_object_columns(_table(avg_row_length=100), ["id", "name", "body"], 1024 ** 2) == []
+
+
+def test_batches_are_bounded_by_bytes_and_keep_every_column():
+    rows = [(i, f"file {i}", b"x" * 100) for i in range(1, 11)]
+    mariadb = _MariaDB(rows)
+    streamer = LargeObjectStreamer(mariadb, _table(), ["name", "body", "id"], max_in_flight=300, rows_per_fetch=4)
+
+    batches = list(streamer.batches())
+
+    assert [len(batch) for batch in batches] == [3, 3, 3, 1]
+    assert list(batches[0].columns) == ["name", "body", "id"]
+    assert [i for batch in batches for i in batch["id"]] == list(range(1, 11))
+    assert all(body == b"x" * 100 for batch in batches for body in batch["body"])
+    # Every query after the first resumes after the last key read
+    assert [params for _, params in mariadb.queries] == [None, (4,), (8,)]
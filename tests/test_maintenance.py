@@ -0,0 +1,72 @@
+import configparser
+import threading
+from types import SimpleNamespace
+
+import core.maintenance
+from core.maintenance import PostLoadMaintenance
+
+
+class _Postgres:
+    def __init__(self, failing=None):
+        self.failing = failing
+        self.connection = SimpleNamespace(autocommit=False)
+        self.queries = []
+        self.lock = threading.Lock()
+
+    def execute_query(self, query, params=None):
+        with self.lock:
+            self.queries.append((" ".join(query.split()), params))
+        if query == "SELECT current_schema()":
+            return [("public",)]
+        if query is core.maintenance.SIZES_QUERY:
+            return [("public", "users", 100), ("public", "orders", 300), ("public", "logs", None)]
+        if query is core.maintenance.SEQUENCES_QUERY:
+            return [("public", "orders", "id", "public.orders_id_seq", 1),
+                    ("public", "orders", "number", "public.orders_number_seq", 1000)]
+        if self.failing and query.startswith("ANALYZE") and self.failing in query:
+            raise RuntimeError("permission denied")
+        return None
+
+
+def _run(monkeypatch, maintenance, tables, failing=None):
+    postgres = _Postgres(failing)
+    monkeypatch.setattr(core.maintenance, "ThreadConnections", lambda config: SimpleNamespace(
+        postgres=lambda: postgres, close=lambda: None))
+    return maintenance.run(postgres, tables), postgres
+
+
+def test_sequences_are_synced_and_tables_analyzed_largest_first(monkeypatch):
+    results, postgres = _run(monkeypatch, PostLoadMaintenance(None, workers=1),
+                             [(None, "Users"), ("public", "orders"), (None, "missing")])
+
+    assert [(r.table, r.bytes) for r in results] == [("orders", 300), ("users", 100)]
+    assert results[0].sequences == ["public.orders_id_seq", "public.orders_number_seq"]
+    statements = [query for query, _ in postgres.queries[3:]]
+    assert statements == [
+        'SELECT setval(%s, COALESCE(m.c0 + 1, %s), false), setval(%s, COALESCE(m.c1 + 1, %s), false) '
+        'FROM (SELECT MAX("id") AS c0, MAX("number") AS c1 FROM "public"."orders") m',
+        'ANALYZE "public"."orders"',
+        'ANALYZE "public"."users"',
+    ]
+    assert postgres.queries[3][1] == ["public.orders_id_seq", 1, "public.orders_number_seq", 1000]
+    assert postgres.connection.autocommit
+
+
+def test_vacuum_replaces_analyze_and_errors_are_reported(monkeypatch):
+    maria_config = configparser.ConfigParser()
+    maria_config.read_string("[maintenance]\nvacuum = true\nsync_sequences = false\n")
+    maintenance = PostLoadMaintenance.from_config(None, maria_config)
+    results, postgres = _run(monkeypatch, maintenance, [(None, "users")])
+
+    assert [query for query, _ in postgres.queries[2:]] == ['VACUUM (FREEZE, ANALYZE) "public"."users"']
+    assert results[0].error is None
+
+    analyze = PostLoadMaintenance(None, sync_sequences=False)
+    results, _ = _run(monkeypatch, analyze, [(None, "users"), (None, "orders")], failing='"users"')
+    assert [(r.table, r.error) for r in results] == [("orders", None), ("users", "permission denied")]
+
+
+def test_nothing_to_do_runs_no_query():
+    maintenance = PostLoadMaintenance(None, analyze=False, sync_sequences=False)
+    assert not maintenance.enabled
+    assert maintenance.run(None, [(None, "users")]) == []
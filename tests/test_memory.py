@@ -0,0 +1,69 @@
+import configparser
+import threading
+import time
+
+import pandas as pd
+
+from core.memory import CHUNK_COPIES, MemoryGovernor
+
+
+def test_limit_from_config():
+    maria_config = configparser.ConfigParser()
+    maria_config.read_string("[memory]\nlimit = 512MB\nhigh_watermark = 0.5\n")
+    governor = MemoryGovernor.from_config(maria_config)
+    assert (governor.limit, governor.high_watermark) == (512 * 1024 ** 2, 0.5)
+
+    maria_config.set("memory", "limit", "off")
+    assert not MemoryGovernor.from_config(maria_config).enabled
+
+
+def test_producer_waits_until_others_release():
+    governor = MemoryGovernor(100)
+    first = governor.acquire(80)
+    acquired = threading.Event()
+
+    def producer():
+        governor.release(governor.acquire(40))
+        acquired.set()
+
+    thread = threading.Thread(target=producer)
+    thread.start()
+    time.sleep(0.1)
+    assert not acquired.is_set()
+
+    governor.release(first)
+    thread.join(timeout=5)
+    assert acquired.is_set()
+    assert (governor.waits, governor.peak, governor.in_flight) == (1, 80, 0)
+
+
+def test_chunk_larger_than_the_limit_goes_through_alone():
+    governor = MemoryGovernor(100)
+    held = governor.acquire(500)
+    assert held == 100 and governor.in_flight == 100
+    governor.release(held)
+
+
+def test_chunks_shrink_under_pressure():
+    governor = MemoryGovernor(1000, high_watermark=0.5, min_chunk_size=5)
+    # A quarter of the limit at 10 bytes a row
+    assert governor.chunk_rows(100, 10) == 25
+    governor.acquire(900)
+    assert governor.chunk_rows(100, 10) == 5
+    assert governor.shrunk_chunks == 2
+
+
+def test_stream_charges_measured_chunks_until_released():
+    governor = MemoryGovernor(10 * 1024 ** 2)
+    stream = governor.stream(1000, row_bytes=8)
+    chunks = [pd.DataFrame({"id": range(1000)}) for _ in range(3)]
+
+    charge = chunks[0].memory_usage(deep=True).sum() * CHUNK_COPIES
+    read = []
+    for df in stream.read(iter(chunks)):
+        read.append(df)
+        assert abs(governor.in_flight - charge * len(read)) <= len(read)
+    stream.release(read[0])
+    stream.close()
+
+    assert len(read) == 3 and governor.in_flight == 0
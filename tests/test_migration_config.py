@@ -0,0 +1,17 @@
+from models.migration import database_names
+
+
+def test_databases_are_ordered_by_number():
+    environ = {
+        "MARIADB_DATABASE10": "tenth",
+        "MARIADB_DATABASE2": "second",
+        "MARIADB_DATABASE1": "first",
+        "MARIADB_HOST": "localhost",
+    }
+    assert database_names(environ) == ["first", "second", "tenth"]
+
+
+def test_unnumbered_and_empty_variables():
+    environ = {"MARIADB_DATABASE_B": "b", "MARIADB_DATABASE3": "", "MARIADB_DATABASE1": "first",
+               "MARIADB_DATABASE_A": "a"}
+    assert database_names(environ) == ["first", "a", "b"]
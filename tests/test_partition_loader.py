@@ -0,0 +1,92 @@
+import pandas as pd
+import pytest
+
+import core.partition_loader
+from config.partitioning import PartitionSpec
+from config.schema_parser import SchemaParser
+from core.partition_loader import PartitionedTableLoader
+
+SECTION = {"partition_by": "range(created_at)", "partition_interval": "1 month",
+           "partition_start": "2024-01-01", "partition_end": "2024-03-01"}
+
+
+class _Postgres:
+    def __init__(self, existing):
+        self.existing = existing
+        self.queries = []
+        self.copies = []
+
+    def execute_query(self, query, params=None):
+        self.queries.append(" ".join(query.split()))
+        if "FROM pg_class" in self.queries[-1]:
+            return list(self.existing.items())
+        return None
+
+    def copy_dataframe(self, table, df):
+        self.copies.append((table, list(df["id"])))
+
+
+class _Connections:
+    """ThreadConnections sharing one fake PostgreSQL connection between threads"""
+
+    def __init__(self, postgres):
+        self._postgres = postgres
+
+    def postgres(self):
+        return self._postgres
+
+    def close(self):
+        pass
+
+
+def _loader(monkeypatch, existing=None):
+    postgres = _Postgres(existing or {})
+    monkeypatch.setattr(core.partition_loader, "ThreadConnections",
+                        lambda config, schema=None: _Connections(postgres))
+    spec = PartitionSpec.from_section("events", SECTION)
+    loader = PartitionedTableLoader(spec, SchemaParser.from_definitions({"events": {}}), None)
+    return loader, postgres
+
+
+def test_range_children_cover_the_bounds_with_a_default():
+    spec = PartitionSpec.from_section("events", SECTION)
+
+    assert [child.name for child in spec.children] == ["events_p2024_01", "events_p2024_02", "events_default"]
+    assert spec.bound_clause(spec.children[0]) == "FOR VALUES FROM ('2024-01-01 00:00:00') TO ('2024-02-01 00:00:00')"
+    parts = spec.route(pd.DataFrame({"created_at": ["2024-01-31", "2024-02-01", "2023-12-31", None]}))
+    assert {name: len(rows) for name, rows in parts.items()} == {
+        "events_p2024_01": 1, "events_p2024_02": 1, "events_default": 2}
+
+
+def test_list_children_and_invalid_settings():
+    spec = PartitionSpec.from_section("users", {"partition_by": "list(region)", "partition_default": "false",
+                                                "partition_values": "eu: de, fr\nus: us"})
+    assert spec.check_clause(spec.children[0]) == "\"region\" IS NOT NULL AND \"region\" IN ('de', 'fr')"
+    with pytest.raises(ValueError):
+        spec.route(pd.DataFrame({"region": ["jp"]}))
+    with pytest.raises(ValueError):
+        PartitionSpec.from_section("users", {"partition_by": "range(id)"})
+
+
+def test_children_are_prepared_loaded_and_attached(monkeypatch):
+    # p2024_01 was left detached by an interrupted run, p2024_02 is attached already
+    loader, postgres = _loader(monkeypatch, {"events_p2024_01": False, "events_p2024_02": True})
+
+    loader.prepare()
+    loader.write_chunk(pd.DataFrame({"id": [1, 2, 3], "created_at": ["2024-01-05", "2024-05-01", "2024-01-09"]}))
+    loader.finish()
+
+    assert 'TRUNCATE "events_p2024_01"' in postgres.queries
+    assert any(q.startswith('CREATE TABLE "events_default" (LIKE "events"') for q in postgres.queries)
+    assert not any("events_p2024_02" in q for q in postgres.queries)
+    assert sorted(postgres.copies) == [("events_default", [2]), ("events_p2024_01", [1, 3])]
+    assert loader.rows == {"events_p2024_01": 2, "events_default": 1}
+    # The CHECK lets the attach skip validation, and the default child is attached last
+    attaches = [q for q in postgres.queries if "ATTACH PARTITION" in q]
+    assert attaches == [
+        'ALTER TABLE "events" ATTACH PARTITION "events_p2024_01" '
+        "FOR VALUES FROM ('2024-01-01 00:00:00') TO ('2024-02-01 00:00:00')",
+        'ALTER TABLE "events" ATTACH PARTITION "events_default" DEFAULT',
+    ]
+    check = next(i for i, q in enumerate(postgres.queries) if '"events_p2024_01_bound" CHECK' in q)
+    assert check < postgres.queries.index(attaches[0])
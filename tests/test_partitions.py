@@ -0,0 +1,98 @@
+from contextlib import nullcontext
+
+import pandas as pd
+import pytest
+
+import core.migrator
+from config.catalog import SchemaCatalog
+from core.migrator import MigrationManager
+from models.catalog import ColumnInfo, PartitionInfo, TableInfo
+from models.migration import DatabaseConfig, MigrationConfig, PostgresConfig
+
+
+class _MariaDB:
+    def iter_table_chunks(self, table_name, columns, chunk_size, partition=None, where=None):
+        yield pd.DataFrame({"id": [int(partition[1:]) * 10 + i for i in range(3)]})
+
+
+class _Postgres:
+    def __init__(self):
+        self.loaded = []
+
+    def transaction(self):
+        return nullcontext()
+
+    def insert_data(self, table_name, df):
+        self.loaded.extend(df["id"])
+
+
+class _Connections:
+    """ThreadConnections handing every thread the same fakes"""
+
+    postgres = _Postgres()
+
+    def __init__(self, config, db_name, schema):
+        pass
+
+    def get(self):
+        return _MariaDB(), self.postgres
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(core.migrator, "ThreadConnections", _Connections)
+    _Connections.postgres = _Postgres()
+    (tmp_path / "maria_config.ini").write_text(
+        "[metrics]\ndisplay = false\njsonl =\nprometheus =\n\n[memory]\nlimit = off\n\n"
+        f"[download]\ndirectory = {tmp_path / 'exports'}\n")
+    config = MigrationConfig(
+        mariadb_config=DatabaseConfig(host="fake", user="fake", password="", database="shop"),
+        postgres_config=PostgresConfig(connection_string="fake"),
+        tables_to_export={}, columns_to_export={}, schema_definitions={}, type_conversions={},
+        uuid_config={}, constraints={}, mariadb_databases=["shop"],
+    )
+    manager = MigrationManager(config)
+    manager.catalog = SchemaCatalog(["shop"])
+    manager.catalog.add_table(TableInfo("shop", "events", columns=[ColumnInfo("id", "int", "int(11)")],
+                                        partitions=[PartitionInfo(f"p{i}", "RANGE", ordinal=i) for i in range(3)]))
+    return manager
+
+
+def test_partitions_are_checkpointed_and_exported(manager, tmp_path):
+    manager._process_table("events", ["id"], False, "shop")
+
+    assert sorted(_Connections.postgres.loaded) == [0, 1, 2, 10, 11, 12, 20, 21, 22]
+    assert manager.checkpoints.completed_partitions("shop", "events") == {}
+    assert (tmp_path / "exports" / "shop" / "events" / "_manifest.json").exists()
+
+
+def test_resumed_table_is_not_exported_over_the_previous_files(manager, tmp_path, capsys):
+    manager.checkpoints.complete_partition("shop", "events", "p0", 3)
+
+    manager._process_table("events", ["id"], False, "shop")
+
+    assert sorted(_Connections.postgres.loaded) == [10, 11, 12, 20, 21, 22]
+    assert "Skipping the Parquet export of events" in capsys.readouterr().out
+    assert not (tmp_path / "exports").exists()
+
+
+def test_interrupted_run_keeps_only_the_committed_partitions(manager, monkeypatch):
+    def failing(self, table_name, columns, chunk_size, partition=None, where=None):
+        if partition == "p1":
+            raise ConnectionError("lost connection")
+        yield pd.DataFrame({"id": [int(partition[1:]) * 10]})
+
+    iter_table_chunks = _MariaDB.iter_table_chunks
+    monkeypatch.setattr(_MariaDB, "iter_table_chunks", failing)
+    with pytest.raises(ConnectionError):
+        manager._process_table("events", ["id"], True, "shop")
+    assert set(manager.checkpoints.completed_partitions("shop", "events")) == {"p0", "p2"}
+
+    monkeypatch.setattr(_MariaDB, "iter_table_chunks", iter_table_chunks)
+    _Connections.postgres = _Postgres()
+    manager._process_table("events", ["id"], True, "shop")
+    assert _Connections.postgres.loaded == [10, 11, 12]
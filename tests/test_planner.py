@@ -0,0 +1,65 @@
+import configparser
+import json
+
+from core.planner import DEFAULT_THROUGHPUT, MigrationPlanner, TablePlan, ThroughputHistory
+
+
+class _Manager:
+    def __init__(self, plan=None):
+        self.maria_config = configparser.ConfigParser()
+        self.maria_config.read_dict({"plan": plan or {}})
+
+
+def _planner(**plan):
+    return MigrationPlanner(_Manager(plan), history=ThroughputHistory(None, None))
+
+
+def _table(name, seconds, memory=0):
+    return TablePlan("db", name, rows=1, bytes=1, seconds={"load": seconds}, memory=memory)
+
+
+def test_history_prefers_the_tables_own_rates(tmp_path):
+    path = tmp_path / "metrics.jsonl"
+    events = [
+        {"event": "chunk", "table": "db.users", "stage": "load", "rows": 100, "bytes": 1000, "seconds": 2.0},
+        {"event": "chunk", "table": "db.orders", "stage": "load", "rows": 100, "bytes": 3000, "seconds": 1.0},
+        {"event": "table", "table": "db.orders"},
+    ]
+    path.write_text("\n".join(json.dumps(e) for e in events) + "\nnot json\n")
+    probe = tmp_path / "probe.json"
+    probe.write_text(json.dumps({"recommended": {"rates": {"extract": 1000, "load": None}}}))
+
+    history = ThroughputHistory(str(path), str(probe)).load()
+
+    assert history.chunks == 2
+    assert history.seconds("load", "db.users", 0, 5000) == 10.0
+    # Tables never measured get the rate of every chunk measured
+    assert history.seconds("load", "db.items", 0, 4000) == 3.0
+    assert history.seconds("extract", "db.items", 0, 5000) == 5.0
+    assert history.seconds("transform", "db.items", 0, 4000) == 4000 / DEFAULT_THROUGHPUT["transform"]
+
+
+def test_chunk_size_keeps_a_chunk_within_chunk_memory():
+    planner = _planner(chunk_memory="64MB")
+    assert planner.recommended_chunk_size(64) == 260000
+    assert planner.recommended_chunk_size(1024 ** 2) == 10000
+    assert planner.recommended_chunk_size(1) == 1000000
+
+
+def test_simulated_units_wait_for_their_dependencies_and_a_worker():
+    units = [[("db", "a")], [("db", "b")], [("db", "c")]]
+    tables = {("db", "a"): _table("a", 10, 100), ("db", "b"): _table("b", 5, 50), ("db", "c"): _table("c", 1, 10)}
+
+    estimate = _planner().simulate(units, [set(), set(), {1}], tables, workers=2)
+
+    assert [(u["unit"], u["start"], u["end"]) for u in estimate.units] == [
+        (["db.a"], 0.0, 10.0), (["db.b"], 0.0, 5.0), (["db.c"], 5.0, 6.0)]
+    assert (estimate.elapsed, estimate.peak_memory) == (10.0, 150)
+
+
+def test_fewest_workers_near_the_fastest_within_the_memory_budget():
+    units = [[("db", name)] for name in "abcd"]
+    tables = {("db", name): _table(name, 10, 100) for name in "abcd"}
+
+    assert _planner()._recommend_workers(units, [set()] * 4, tables).workers == 4
+    assert _planner(memory_budget="250B")._recommend_workers(units, [set()] * 4, tables).workers == 2
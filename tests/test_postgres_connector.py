@@ -0,0 +1,104 @@
+import tracemalloc
+
+import pandas as pd
+import pytest
+
+from connectors.postgres_connector import CopyReader, PostgresConnector, encode_copy
+
+
+class _Cursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self.description = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params=None):
+        self.connection.log.append(query)
+
+    def copy_expert(self, query, file, size=8192):
+        if self.connection.fail_copy:
+            raise RuntimeError("copy failed")
+        data = "".join(iter(lambda: file.read(size), ""))
+        self.connection.log.append(f"copy {len(data.splitlines())}")
+
+
+class _Connection:
+    """Records what psycopg2 would have been asked to do"""
+    closed = False
+
+    def __init__(self, fail_copy=False):
+        self.log = []
+        self.fail_copy = fail_copy
+
+    def cursor(self):
+        return _Cursor(self)
+
+    def commit(self):
+        self.log.append("commit")
+
+    def rollback(self):
+        self.log.append("rollback")
+
+
+def _connector(connection):
+    postgres = PostgresConnector("fake")
+    postgres.connection = connection
+    return postgres
+
+
+def test_every_copy_commits_on_its_own():
+    connection = _Connection()
+    _connector(connection).insert_data("t", pd.DataFrame({"id": [1, 2, 3]}), batch_size=2)
+    assert connection.log == ["copy 2", "commit", "copy 1", "commit"]
+
+
+def test_transaction_commits_once_at_the_end():
+    connection = _Connection()
+    postgres = _connector(connection)
+    with postgres.transaction():
+        postgres.insert_data("t", pd.DataFrame({"id": [1, 2, 3]}), batch_size=2)
+        postgres.execute_query("SELECT 1")
+    assert connection.log == ["copy 2", "copy 1", "SELECT 1", "commit"]
+
+
+def test_transaction_rolls_back_everything_on_error():
+    connection = _Connection()
+    postgres = _connector(connection)
+    with pytest.raises(RuntimeError):
+        with postgres.transaction():
+            postgres.insert_data("t", pd.DataFrame({"id": [1, 2]}))
+            connection.fail_copy = True
+            postgres.insert_data("t", pd.DataFrame({"id": [3]}))
+    assert connection.log == ["copy 2", "rollback"]
+
+    # Later statements commit on their own again
+    postgres.execute_query("SELECT 1")
+    assert connection.log[-1] == "commit"
+
+
+def test_encode_copy_restores_integers_and_hex_encodes_bytes():
+    df = pd.DataFrame({"id": [1.0, None], "data": [b"\x01\xff", None]})
+    assert encode_copy(df).getvalue() == "1,\\x01ff\n\\N,\\N\n"
+
+
+def test_copy_data_is_encoded_a_slice_at_a_time():
+    # 20 MB of large values, of which only about one 1 MB slice is held encoded
+    df = pd.DataFrame({"id": range(200), "body": [bytes([i]) * 100000 for i in range(200)]})
+    reader = CopyReader(df, slice_bytes=1024 ** 2)
+
+    tracemalloc.start()
+    try:
+        base = tracemalloc.get_traced_memory()[0]
+        total = sum(len(data) for data in iter(lambda: reader.read(8192), ""))
+        peak = tracemalloc.get_traced_memory()[1] - base
+    finally:
+        tracemalloc.stop()
+
+    assert total == len(encode_copy(df).getvalue())
+    # Encoding a slice takes several times its size, the whole frame would take about 190 MB
+    assert peak < 16 * 1024 ** 2
@@ -0,0 +1,94 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from core.probe import ThroughputProbe
+from models.catalog import ColumnInfo, TableInfo
+
+TABLE = TableInfo("db", "files", rows=1000, avg_row_length=4 * 1024 ** 2, primary_key=["id"], columns=[
+    ColumnInfo("id", "int", "int"),
+    ColumnInfo("name", "varchar", "varchar(100)"),
+    ColumnInfo("body", "longblob", "longblob"),
+])
+
+
+class _MariaDB:
+    def __init__(self):
+        self.reads = []
+
+    def select_database(self, database):
+        pass
+
+    def iter_table_chunks(self, table_name, columns, chunk_size, limit=None):
+        self.reads.append(columns)
+        for start in range(0, limit, chunk_size):
+            yield pd.DataFrame({column: [f"{column} {i}" for i in range(start, start + chunk_size)]
+                                for column in columns})
+
+
+class _Manager:
+    def __init__(self):
+        self.mariadb = _MariaDB()
+
+    def _get_columns_to_export(self, table_name, db_name):
+        return ["id", "name", "body"]
+
+    def _large_object_setting(self, option, default):
+        return 1024 ** 2
+
+
+def test_sample_leaves_out_large_columns_and_stops_at_sample_bytes():
+    manager = _Manager()
+    probe = ThroughputProbe(manager, fetch_sizes=(100,), buffer_sizes=(100000,), sample_bytes=50000)
+
+    sample = probe.sample(TABLE)
+
+    assert manager.mariadb.reads == [["id", "name"]]
+    assert list(sample.columns) == ["id", "name"]
+    # Reading stops with the chunk that reaches sample_bytes
+    assert len(sample) < 1000 and len(sample) % 100 == 0
+    assert sample.iloc[:-100].memory_usage(deep=True).sum() < 50000
+
+
+class _Postgres:
+    def __init__(self):
+        self.threads = set()
+
+    def execute_query(self, query):
+        pass
+
+    def insert_data(self, table_name, df, batch_size=None):
+        self.threads.add(threading.get_ident())
+
+
+class _Connections:
+    """ThreadConnections counting the connections opened"""
+
+    def __init__(self):
+        self._local = threading.local()
+        self.opened = []
+
+    def postgres(self):
+        if not hasattr(self._local, "postgres"):
+            self._local.postgres = _Postgres()
+            self.opened.append(self._local.postgres)
+        return self._local.postgres
+
+
+def test_copy_measurements_reuse_the_writer_connections():
+    probe = ThroughputProbe(_Manager(), buffer_sizes=(10, 100), writers=(1, 2, 4, 8))
+    connections = _Connections()
+    sample = pd.DataFrame({"id": range(100)})
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        probe.open_writers(executor, connections)
+        writers = list(connections.opened)
+        assert len(writers) == 8
+        for buffer_rows in probe.buffer_sizes:
+            for count in probe.writers:
+                result = probe.copy(executor, connections, "scratch", sample, 10, buffer_rows, count)
+                assert result["rows"] == 100 * count
+
+    # Only the scratch connection of the calling thread was opened while timing
+    assert connections.opened[:8] == writers and len(connections.opened) == 9
@@ -0,0 +1,45 @@
+import pandas as pd
+import pytest
+
+from core.migrator import MigrationManager
+from models.migration import DatabaseConfig, MigrationConfig, PostgresConfig
+
+
+class _NoSource:
+    """MariaDB connection a replay must not use"""
+
+    def __getattr__(self, name):
+        raise AssertionError(f"MariaDB was used: {name}")
+
+
+class _Postgres:
+    def __init__(self):
+        self.loaded = []
+
+    def insert_data(self, table_name, df):
+        self.loaded.append((table_name, len(df)))
+
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "maria_config.ini").write_text(
+        "[metrics]\ndisplay = false\njsonl =\nprometheus =\n\n[memory]\nlimit = off\n")
+    config = MigrationConfig(
+        mariadb_config=DatabaseConfig(host="fake", user="fake", password="", database="shop"),
+        postgres_config=PostgresConfig(connection_string="fake"),
+        tables_to_export={}, columns_to_export={}, schema_definitions={}, type_conversions={},
+        uuid_config={}, constraints={}, mariadb_databases=["shop"],
+    )
+    manager = MigrationManager(config)
+    manager.mariadb = _NoSource()
+    manager.postgres = _Postgres()
+    return manager
+
+
+def test_replayed_chunks_are_loaded_without_the_source(manager):
+    entry = {"rows": 2, "bytes": 64, "avg_row_length": 16, "column_types": {"id": "int(11)"}}
+    manager._process_table("users", ["id"], True, "shop", iter([pd.DataFrame({"id": [1, 2]})]), cached=entry)
+
+    assert manager.postgres.loaded == [("users", 2)]
+    assert manager.metrics.tables["shop.users"].expected_rows == 2
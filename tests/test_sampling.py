@@ -0,0 +1,49 @@
+import pytest
+
+from config.sampling import ReferentialSampler, parse_sample_rate
+
+
+def test_parse_sample_rate():
+    assert parse_sample_rate("1%") == 0.01
+    assert parse_sample_rate("0.5") == 0.5
+    for value in ("0", "150%", "abc"):
+        with pytest.raises(ValueError):
+            parse_sample_rate(value)
+
+
+def test_sample_closes_over_references(shop_catalog):
+    cycles = {(("shop", "categories"), ("shop", "categories"))}
+    resolved = ReferentialSampler(0.01, seed=7).resolve(shop_catalog, {}, cycles)
+
+    # items is referenced by nothing, so it is the one sampled by hash
+    assert resolved[("shop", "items")] == "MOD(CRC32(CONCAT_WS('|', 7, `id`)), 1000000) < 10000"
+    assert resolved[("shop", "orders")] == (
+        "((`id`) IN (WITH `k0` AS (SELECT `order_id` FROM `shop`.`items` "
+        "WHERE MOD(CRC32(CONCAT_WS('|', 7, `id`)), 1000000) < 10000) SELECT `order_id` FROM `k0`))"
+    )
+    assert resolved[("shop", "users")].startswith(
+        "((`id`) IN (WITH `k0` AS (SELECT `order_id` FROM `shop`.`items` WHERE MOD(")
+    # A table in a cycle is read in full
+    assert ("shop", "categories") not in resolved
+
+
+def test_sample_keeps_row_filters(shop_catalog):
+    resolved = ReferentialSampler(0.5).resolve(shop_catalog, {("shop", "items"): "order_id > 10"}, set())
+    assert resolved[("shop", "items")] == "(order_id > 10) AND MOD(CRC32(CONCAT_WS('|', 0, `id`)), 1000000) < 500000"
+
+
+def test_sample_names_each_table_once_per_subquery(layered_catalog):
+    resolved = ReferentialSampler(0.01).resolve(layered_catalog, {}, set())
+
+    first = resolved[("shop", "t0_0")]
+    assert first.count("FROM `shop`.`t9_0`") == 3
+    assert len(first) < 30000
+
+
+def test_rows_referenced_from_a_cycle_are_all_kept(shop_catalog):
+    # orders and items referencing each other are read in full, and so are the users they reference
+    cycles = {(("shop", "items"), ("shop", "orders")), (("shop", "orders"), ("shop", "items"))}
+    resolved = ReferentialSampler(0.01).resolve(shop_catalog, {}, cycles)
+
+    assert resolved[("shop", "users")] == "((`id`) IN (SELECT `user_id` FROM `shop`.`orders`))"
+    assert ("shop", "orders") not in resolved and ("shop", "items") not in resolved
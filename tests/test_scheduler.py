@@ -0,0 +1,92 @@
+import threading
+
+import pytest
+
+from config.catalog import SchemaCatalog
+from config.table_sorter import TableSorter
+from core.migrator import MigrationManager
+from models.catalog import ForeignKeyInfo, TableInfo
+from models.migration import DatabaseConfig, MigrationConfig, PostgresConfig
+
+
+def _catalog(references):
+    catalog = SchemaCatalog(["db"])
+    for table, referenced in references.items():
+        catalog.add_table(TableInfo("db", table, foreign_keys=[
+            ForeignKeyInfo(f"fk_{table}_{parent}", "db", table, [f"{parent}_id"], "db", parent, ["id"])
+            for parent in referenced
+        ]))
+    return catalog
+
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    """A manager with 4 workers whose units are only recorded, not loaded"""
+    monkeypatch.chdir(tmp_path)
+
+    def create(references, migration=""):
+        (tmp_path / "maria_config.ini").write_text(
+            "[performance]\nworkers = 4\n\n[metrics]\ndisplay = false\njsonl =\nprometheus =\n\n"
+            f"[memory]\nlimit = off\n\n[migration]\n{migration}\n")
+        config = MigrationConfig(
+            mariadb_config=DatabaseConfig(host="fake", user="fake", password="", database="db"),
+            postgres_config=PostgresConfig(connection_string="fake"),
+            tables_to_export={}, columns_to_export={}, schema_definitions={}, type_conversions={},
+            uuid_config={}, constraints={}, mariadb_databases=["db"],
+        )
+        manager = MigrationManager(config)
+        manager.catalog = _catalog(references)
+        manager.loaded = []
+        lock = threading.Lock()
+
+        def load_unit(unit, no_download, connect):
+            with lock:
+                manager.loaded.append(tuple(unit))
+
+        monkeypatch.setattr(manager, "_load_unit", load_unit)
+        return manager
+
+    return create
+
+
+def _levels(manager):
+    sorter = TableSorter(None, None, manager.maria_config, manager.catalog)
+    return [[list(unit) for unit in level] for level in sorter.get_global_migration_levels(["db"])]
+
+
+def test_units_start_after_the_units_they_reference(manager):
+    manager = manager({"users": [], "orders": ["users"], "items": ["orders"], "tags": []})
+    manager._run_units(_levels(manager), no_download=True)
+
+    order = [unit[0][1] for unit in manager.loaded]
+    assert sorted(order) == ["items", "orders", "tags", "users"]
+    assert order.index("users") < order.index("orders") < order.index("items")
+
+
+def test_explicitly_ordered_table_inside_a_cycle(manager):
+    manager = manager({"a": ["b"], "b": ["a"], "c": [], "late": ["c"]},
+                      "force_early = a\nforce_late = late")
+    levels = _levels(manager)
+    assert levels[0] == [[("db", "a")]]
+
+    dependencies = manager._unit_dependencies(levels)
+    units = [unit for level in levels for unit in level]
+    index = {unit[0][1]: i for i, unit in enumerate(units)}
+    # The reference from a to b, which comes later, gives way to the explicit order
+    assert dependencies[index["a"]] == set()
+    assert dependencies[index["b"]] == {index["a"]}
+    assert dependencies[index["late"]] == {index["b"], index["c"]}
+
+    manager._run_units(levels, no_download=True)
+    order = [unit[0][1] for unit in manager.loaded]
+    assert sorted(order) == ["a", "b", "c", "late"]
+    assert order[0] == "a" and order[-1] == "late"
+
+
+def test_units_that_are_never_ready_are_reported(manager, monkeypatch):
+    manager = manager({"a": [], "b": [], "c": []})
+    monkeypatch.setattr(manager, "_unit_dependencies", lambda levels: [{1}, {0}, set()])
+
+    with pytest.raises(RuntimeError, match="db.a, db.b"):
+        manager._run_units([[[("db", "a")], [("db", "b")], [("db", "c")]]], no_download=True)
+    assert manager.loaded == [(("db", "c"),)]
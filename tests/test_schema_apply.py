@@ -0,0 +1,61 @@
+from config.schema_parser import SchemaParser
+from core.schema_apply import SchemaApplier, TargetState
+
+
+def _applier(definitions):
+    return SchemaApplier(None, SchemaParser.from_definitions(definitions))
+
+
+DEFINITIONS = {
+    "users": {"id": "BIGINT", "manager_id": "BIGINT", "email": "TEXT", "primary_key": "id",
+              "unique": "email", "indexes": "manager_id",
+              "foreign_keys": "\nmanager_id -> users(id)"},
+    "orders": {"id": "BIGINT PRIMARY KEY", "user_id": "BIGINT",
+               "foreign_keys": "\nuser_id -> users(id)"},
+}
+
+
+def test_empty_target_gets_everything():
+    plan = _applier(DEFINITIONS).plan(TargetState())
+    assert plan.tables == [
+        'CREATE TABLE "users" (\n    "id" BIGINT,\n    "manager_id" BIGINT,\n    "email" TEXT\n)',
+        'CREATE TABLE "orders" (\n    "id" BIGINT PRIMARY KEY,\n    "user_id" BIGINT\n)',
+    ]
+    assert plan.pre_load == plan.tables + ['ALTER TABLE "users" ADD PRIMARY KEY (id)']
+    # Indexes and foreign keys wait for the data, so COPY does not maintain them
+    # and a table can reference itself or a later table
+    assert plan.post_load == [
+        'ALTER TABLE "users" ADD UNIQUE (email)',
+        'CREATE INDEX "idx_users_manager_id" ON "users" (manager_id)',
+        'ALTER TABLE "users" ADD FOREIGN KEY (manager_id) REFERENCES users(id)',
+        'ALTER TABLE "orders" ADD FOREIGN KEY (user_id) REFERENCES users(id)',
+    ]
+
+
+def test_only_missing_objects_are_planned():
+    state = TargetState(
+        tables={"users", "orders"},
+        columns={"users": {"id", "manager_id"}, "orders": {"id", "user_id"}},
+        primary_keys={"users", "orders"},
+        constraints={
+            "users": {"unique(email)", "foreignkey(manager_id)referencesusers(id)"},
+            "orders": {"primarykey(id)"},
+        },
+        indexes={"idx_users_manager_id"},
+    )
+    plan = _applier(DEFINITIONS).plan(state)
+    assert plan.tables == ['ALTER TABLE "users" ADD COLUMN "email" TEXT']
+    assert plan.pre_load == plan.tables
+    assert plan.post_load == ['ALTER TABLE "orders" ADD FOREIGN KEY (user_id) REFERENCES users(id)']
+
+
+def test_indexes_are_built_after_the_load():
+    state = TargetState(tables={"users", "orders"},
+                        columns={"users": {"id", "manager_id", "email"}, "orders": {"id", "user_id"}},
+                        primary_keys={"users", "orders"})
+    plan = _applier(DEFINITIONS).plan(state)
+    assert plan.pre_load == []
+    assert plan.indexes == {"users": [
+        'ALTER TABLE "users" ADD UNIQUE (email)',
+        'CREATE INDEX "idx_users_manager_id" ON "users" (manager_id)',
+    ]}
@@ -0,0 +1,81 @@
+import configparser
+
+import pytest
+
+from config.selection import SelectionRules, glob_to_regex
+
+
+def _rules(sections):
+    maria_config = configparser.ConfigParser(allow_no_value=True)
+    maria_config.read_dict(sections)
+    return SelectionRules.from_config(maria_config)
+
+
+def test_glob_to_regex():
+    assert glob_to_regex("events_2019_*") == r"^events_2019_.*$"
+    assert glob_to_regex("log_[!0-9]?") == r"^log_[^0-9].$"
+
+
+def test_everything_selected_needs_no_predicate():
+    assert _rules({}).table_predicate() == ("", [])
+
+
+def test_exact_names_and_patterns():
+    rules = _rules({
+        "tables": {"events_2019_*": "exclude", "events_2019_keep": "include", "secrets": None},
+        "selection": {"exclude_tables": "tmp_*, re:^bak_"},
+    })
+    assert not rules.include_table("events_2019_01")
+    assert rules.include_table("events_2019_keep")
+    assert not rules.include_table("SECRETS")
+    assert not rules.include_table("tmp_import")
+    assert not rules.include_table("bak_users")
+    assert rules.include_table("users")
+
+    condition, params = rules.table_predicate()
+    assert condition == (
+        "AND (TABLE_NAME IN (%s) OR (TABLE_NAME NOT IN (%s) AND NOT "
+        "(TABLE_NAME LIKE %s OR TABLE_NAME LIKE %s OR TABLE_NAME REGEXP %s)))"
+    )
+    assert params == ["events_2019_keep", "secrets", "events\\_2019\\_%", "tmp\\_%", "^bak_"]
+
+
+def test_include_only_selection():
+    rules = _rules({
+        "export_settings": {"export_all_tables": "false"},
+        "selection": {"include_tables": "user*, log_[0-9]"},
+    })
+    assert rules.include_table("users")
+    assert not rules.include_table("orders")
+
+    condition, params = rules.table_predicate("t.TABLE_NAME")
+    assert condition == "AND ((t.TABLE_NAME LIKE %s OR t.TABLE_NAME REGEXP %s))"
+    assert params == ["user%", "^log_[0-9]$"]
+
+
+def test_nothing_selected():
+    rules = _rules({"export_settings": {"export_all_tables": "false"}})
+    assert rules.table_predicate() == ("AND (FALSE)", [])
+
+
+def test_invalid_regex_is_reported():
+    with pytest.raises(ValueError):
+        _rules({"selection": {"exclude_tables": "re:(unclosed"}})
+
+
+def test_column_rules_name_table_and_column():
+    rules = _rules({
+        "columns": {"users.password_hash": None, "*.legacy_*": "exclude"},
+        "selection": {"exclude_columns": "re:^audit\\..*_raw$"},
+    })
+    assert not rules.include_column("users", "password_hash")
+    assert not rules.include_column("orders", "legacy_total")
+    assert not rules.include_column("audit", "payload_raw")
+    assert rules.include_column("users", "email")
+
+
+def test_regex_takes_the_rest_of_its_line():
+    rules = _rules({"selection": {"exclude_tables": "tmp_*, re:^(bak|old)_.{2,}$\nscratch"}})
+    assert rules.tables.exclude.patterns == ["tmp_*", "re:^(bak|old)_.{2,}$", "scratch"]
+    assert not rules.include_table("old_users")
+    assert rules.include_table("old_")
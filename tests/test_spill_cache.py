@@ -0,0 +1,55 @@
+import pandas as pd
+
+from core.spill_cache import SpillCache
+
+
+def _spill(cache, table, fingerprint="v1", rows=3):
+    writer = cache.writer("shop", table, ["id", "name"], fingerprint, {"id": "int(11)"}, avg_row_length=20)
+    writer.write_chunk(pd.DataFrame({"id": range(rows), "name": [f"n{i}" for i in range(rows)]}))
+    writer.write_chunk(pd.DataFrame({"id": [rows], "name": [None]}))
+    writer.commit()
+    return cache.lookup("shop", table)
+
+
+def test_entries_replay_their_chunks_with_the_catalog_details(tmp_path):
+    cache = SpillCache(str(tmp_path))
+    entry = _spill(cache, "users")
+
+    assert (entry["rows"], entry["chunks"], entry["avg_row_length"]) == (4, 2, 20)
+    assert entry["column_types"] == {"id": "int(11)"}
+    chunks = list(cache.iter_chunks(entry))
+    assert [list(chunk["id"]) for chunk in chunks] == [[0, 1, 2], [3]]
+    assert chunks[1]["name"].isna().all()
+
+
+def test_lookup_needs_the_same_columns_and_fingerprint(tmp_path):
+    cache = SpillCache(str(tmp_path))
+    _spill(cache, "users", "v1")
+
+    assert cache.lookup("shop", "users", ["id", "name"], "v1") is not None
+    assert cache.lookup("shop", "users", ["id"], "v1") is None
+    assert cache.lookup("shop", "users", fingerprint="v2") is None
+
+
+def test_uncommitted_and_stale_entries_are_not_replayed(tmp_path):
+    cache = SpillCache(str(tmp_path))
+    _spill(cache, "users", "v1")
+    cache.writer("shop", "users", ["id", "name"], "v2").write_chunk(pd.DataFrame({"id": [1], "name": ["x"]}))
+    assert cache.lookup("shop", "users")["fingerprint"] == "v1"
+
+    # A new extraction replaces the older one
+    _spill(cache, "users", "v3")
+    assert [entry["fingerprint"] for entry in cache.entries()] == ["v3"]
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = SpillCache(str(tmp_path))
+    users = _spill(cache, "users")
+    orders = _spill(cache, "orders")
+    list(cache.iter_chunks(users))
+
+    # Room for two of the three entries, users was read after orders was written
+    cache.max_bytes = orders["bytes"] + users["bytes"]
+    _spill(cache, "items")
+
+    assert sorted(entry["table"] for entry in cache.entries()) == ["items", "users"]
@@ -0,0 +1,94 @@
+import configparser
+
+from config.catalog import SchemaCatalog
+from config.table_sorter import TableSorter
+from models.catalog import ForeignKeyInfo, TableInfo
+
+
+def _sorter(maria_config=None):
+    return TableSorter(None, None, maria_config or configparser.ConfigParser(allow_no_value=True))
+
+
+def _catalog(references):
+    """Catalog of one database "db", references mapping each table to the tables it references"""
+    catalog = SchemaCatalog(["db"])
+    for table, referenced in references.items():
+        catalog.add_table(TableInfo("db", table, foreign_keys=[
+            ForeignKeyInfo(f"fk_{table}_{parent}", "db", table, [f"{parent}_id"], "db", parent, ["id"])
+            for parent in referenced
+        ]))
+    return catalog
+
+
+def test_levels_follow_dependencies():
+    levels = _sorter()._topological_levels(
+        ["orders", "users", "items", "products"],
+        {"orders": {"users"}, "items": {"orders", "products"}, "users": set(), "products": set()},
+    )
+    assert levels == [[["products"], ["users"]], [["orders"]], [["items"]]]
+
+
+def test_cycle_is_one_unit_with_its_foreign_keys_deferred():
+    sorter = _sorter()
+    levels = sorter._topological_levels(
+        ["a", "b", "c", "d"],
+        {"a": {"b"}, "b": {"a"}, "c": {"a", "c"}, "d": set()},
+    )
+    assert levels == [[["a", "b"], ["d"]], [["c"]]]
+    assert sorter.deferred_foreign_keys == [("a", "b"), ("b", "a"), ("c", "c")]
+
+
+def test_deep_chain_is_not_limited_by_recursion():
+    tables = [f"t{i}" for i in range(5000)]
+    dependencies = {table: ({tables[i - 1]} if i else set()) for i, table in enumerate(tables)}
+    levels = _sorter()._topological_levels(tables, dependencies)
+    assert len(levels) == 5000
+    assert levels[-1] == [["t4999"]]
+
+
+def test_migration_levels_from_the_catalog(caplog):
+    sorter = _sorter()
+    sorter.catalog = _catalog({"users": [], "orders": ["users", "coupons"], "coupons": ["orders"]})
+
+    assert sorter.get_migration_levels("db") == [[["users"]], [["coupons", "orders"]]]
+    assert sorter.get_migration_order("db") == ["users", "coupons", "orders"]
+    assert "Circular dependency between tables coupons, orders" in caplog.text
+
+
+def test_large_cycle_warning_names_the_first_tables():
+    names = [f"t{i:02}" for i in range(12)]
+    sorter = _sorter()
+    with_logs = []
+    sorter.logger.warning = with_logs.append
+    sorter._topological_levels(names, {name: {names[i - 1]} for i, name in enumerate(names)})
+
+    assert with_logs == ["Circular dependency between tables " + ", ".join(names[:10]) + " and 2 more, "
+                         "loading them as one unit with their foreign keys deferred"]
+
+
+def test_global_levels_with_explicit_order():
+    maria_config = configparser.ConfigParser(allow_no_value=True)
+    maria_config.read_dict({"migration": {"force_early": "settings", "force_late": "db.audit"}})
+    sorter = _sorter(maria_config)
+    sorter.catalog = _catalog({"settings": [], "users": [], "orders": ["users"], "audit": ["users"]})
+
+    levels = sorter.get_global_migration_levels(["db"])
+    assert levels == [
+        [[("db", "settings")]],
+        [[("db", "users")]],
+        [[("db", "orders")]],
+        [[("db", "audit")]],
+    ]
+
+
+def test_global_levels_follow_foreign_keys_across_databases():
+    catalog = SchemaCatalog(["shop", "auth"])
+    catalog.add_table(TableInfo("auth", "users"))
+    catalog.add_table(TableInfo("shop", "orders", foreign_keys=[
+        ForeignKeyInfo("fk_orders_users", "shop", "orders", ["user_id"], "auth", "users", ["id"])]))
+    catalog.add_table(TableInfo("shop", "products"))
+    sorter = _sorter()
+    sorter.catalog = catalog
+
+    levels = sorter.get_global_migration_levels(["shop", "auth"])
+    assert levels == [[[("auth", "users")], [("shop", "products")]], [[("shop", "orders")]]]
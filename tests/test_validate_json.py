@@ -0,0 +1,51 @@
+import json
+
+import pandas as pd
+import pytest
+
+import core.data_processor as data_processor
+from core.data_processor import validate_json
+from core.rejects import RejectWriter
+
+VALUES = [
+    '{"a": 1}', '{"a": "x"}', '[1, 2]', '{"a": NaN}', '{"a": 1}{"b": 2}', "oops", "",
+    '{"a":\n1}', '{"a": "\\u0000b"}', None, b'{"b": "x"}', b"\xff", 5,
+]
+EXPECTED = [
+    '{"a": 1}', '{"a": "x"}', '[1, 2]', None, None, None, None,
+    '{"a":\n1}', '{"a": "b"}', None, '{"b": "x"}', None, None,
+]
+
+
+@pytest.fixture(params=["bulk", "per document"])
+def mode(request, monkeypatch):
+    if request.param == "per document":
+        monkeypatch.setattr(data_processor, "pa_json", None)
+    return request.param
+
+
+def test_invalid_documents_are_reported(mode):
+    documents, errors = validate_json(pd.Series(VALUES))
+    assert documents.tolist() == EXPECTED
+    assert [error is not None for error in errors] == [
+        expected is None and value is not None for value, expected in zip(VALUES, EXPECTED)]
+
+
+def test_text_columns_are_checked_in_bulk(mode):
+    values = pd.Series([json.dumps({"id": i, "tags": [i, "x"]}) for i in range(10000)] + ['{"id": 1,}'])
+    documents, errors = validate_json(values)
+    assert documents.tolist() == values.tolist()[:-1] + [None]
+    assert errors.notna().tolist() == [False] * 10000 + [True]
+
+
+def test_rejects_are_written_per_database(tmp_path):
+    writer = RejectWriter(str(tmp_path))
+    rows = pd.DataFrame({"id": [1], "payload": ["oops"]})
+    writer.write("shop", "orders", rows, ["payload"], ["invalid"])
+    writer.write("archive", "orders", rows, ["payload"], ["invalid"])
+
+    with open(tmp_path / "shop" / "orders.jsonl") as f:
+        line = json.loads(f.read())
+    assert line["database"] == "shop" and line["table"] == "orders" and line["row"] == {"id": 1, "payload": "oops"}
+    assert writer.counts == {("shop", "orders"): 1, ("archive", "orders"): 1}
+    assert writer.path("archive", "orders") == str(tmp_path / "archive" / "orders.jsonl")
@@ -0,0 +1,73 @@
+from decimal import Decimal
+
+import pandas as pd
+
+from core.verifier import MigrationVerifier, build_aggregate_queries, build_column_check
+
+
+class _Connector:
+    def __init__(self, row):
+        self.row = row
+        self.queries = []
+
+    def execute_query(self, query):
+        self.queries.append(query)
+        return self.row
+
+
+class _Manager:
+    config = None
+
+    def _target_schema(self, db_name):
+        return "shop"
+
+
+def _verifier(source_row, target_row):
+    verifier = MigrationVerifier(_Manager())
+    verifier._local.mariadb = _Connector(pd.DataFrame([source_row]))
+    verifier._local.postgres = _Connector([tuple(target_row)])
+    return verifier
+
+
+def test_column_checks_follow_the_type_mapping():
+    assert build_column_check("id", "int").source_text == "CAST(`id` AS CHAR)"
+    assert build_column_check("ratio", "double").float_values
+    assert build_column_check("active", "tinyint", "boolean").target_text == '"active"::text'
+    # Rewritten values and unknown conversions only get their counts compared
+    for check in (build_column_check("id", "int", uuid_mapped=True), build_column_check("doc", "json"),
+                  build_column_check("code", "int", "varchar")):
+        assert not (check.source_value or check.source_text)
+
+
+def test_aggregate_queries_compare_only_the_migrated_rows():
+    checks = [build_column_check("id", "int"), build_column_check("name", "varchar")]
+    metrics, source, target = build_aggregate_queries("`shop`.`users`", '"shop"."users"', checks, "id > 10")
+
+    assert metrics == [("*", "row_count"), ("id", "null_count"), ("id", "min"), ("id", "max"), ("id", "hash"),
+                       ("name", "null_count"), ("name", "hash")]
+    assert source.startswith("SELECT COUNT(*), COUNT(*) - COUNT(`id`), MIN(`id`)")
+    assert source.endswith("FROM `shop`.`users` WHERE id > 10")
+    assert target.endswith('FROM "shop"."users"')
+
+
+def test_matching_aggregates_pass():
+    checks = [build_column_check("id", "int"), build_column_check("ratio", "double")]
+    verifier = _verifier([3, 0, 1, 3, 12345, 0, 0.1, 0.3], [3, 0, 1, 3, Decimal(12345), 0, 0.1, 0.30000000001])
+
+    entry = verifier.verify_table("shop", "users", checks)
+
+    assert entry["status"] == "passed"
+    assert (entry["source_rows"], entry["target_rows"]) == (3, 3)
+    assert verifier._local.postgres.queries[0].endswith('FROM "shop"."users"')
+
+
+def test_mismatches_and_errors_are_reported():
+    checks = [build_column_check("id", "int")]
+    entry = _verifier([3, 0, 1, 3, 12345], [2, 0, 1, 3, 999]).verify_table("shop", "users", checks)
+
+    assert entry["status"] == "failed"
+    assert [(m["column"], m["metric"]) for m in entry["mismatches"]] == [("*", "row_count"), ("id", "hash")]
+
+    verifier = _verifier([3], [3])
+    verifier._local.postgres.execute_query = lambda query: 1 / 0
+    assert verifier.verify_table("shop", "users", checks)["status"] == "error"
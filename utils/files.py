@@ -0,0 +1,46 @@
+import json
+import os
+import re
+import tempfile
+from typing import Any
+
+_SIZE_UNITS = {"": 1, "B": 1, "KB": 1024, "MB": 1024 ** 2, "GB": 1024 ** 3, "TB": 1024 ** 4}
+
+
+def parse_size(value: str) -> int:
+    """
+    Parse a human readable size such as "512MB" or "20 GB" into bytes
+
+    Args:
+        value: Size string, a plain number is taken as bytes
+
+    Returns:
+        int: Size in bytes
+    """
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([KMGT]?B?)\s*", str(value).upper())
+    if not match:
+        raise ValueError(f"Invalid size: {value}")
+    number, unit = match.groups()
+    if unit and not unit.endswith("B"):
+        unit += "B"
+    return int(float(number) * _SIZE_UNITS[unit])
+
+
+def write_json_atomic(path: str, data: Any) -> None:
+    """
+    Write JSON to a file so readers never see a partially written file
+
+    Args:
+        path: Destination file
+        data: JSON-serializable data
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f, indent=2, default=str)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise